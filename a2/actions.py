@@ -21,7 +21,12 @@ Misha Schwartz, and Jaisie Sin
 
 This file contains the different actions that can be made by a Player.
 """
-import pygame
+try:
+    import pygame
+except ImportError:
+    # The actions can be used without pygame, by the headless engine, which
+    # has no keyboard.
+    pygame = None
 
 # Actions that can be performed in the game
 ROTATE_CLOCKWISE = ('rotate', 1)
@@ -66,16 +71,19 @@ ACTION_PENALTY = {
     PASS: 0
 }
 
-ACTION_KEY = {
-    ROTATE_CLOCKWISE: pygame.K_d,
-    ROTATE_COUNTER_CLOCKWISE: pygame.K_a,
-    SWAP_HORIZONTAL: pygame.K_q,
-    SWAP_VERTICAL: pygame.K_e,
-    SMASH: pygame.K_SPACE,
-    COMBINE: pygame.K_c,
-    PAINT: pygame.K_r,
-    PASS: pygame.K_TAB
-}
+if pygame is None:
+    ACTION_KEY = {}
+else:
+    ACTION_KEY = {
+        ROTATE_CLOCKWISE: pygame.K_d,
+        ROTATE_COUNTER_CLOCKWISE: pygame.K_a,
+        SWAP_HORIZONTAL: pygame.K_q,
+        SWAP_VERTICAL: pygame.K_e,
+        SMASH: pygame.K_SPACE,
+        COMBINE: pygame.K_c,
+        PAINT: pygame.K_r,
+        PASS: pygame.K_TAB
+    }
 
 # Create a dictionary that is ACTION_KEY inverted
 KEY_ACTION = {value: key for key, value in ACTION_KEY.items()}
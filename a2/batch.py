@@ -0,0 +1,414 @@
+"""CSC148 Assignment 2
+
+=== CSC148 Winter 2020 ===
+Department of Computer Science,
+University of Toronto
+
+This code is provided solely for the personal and private use of
+students taking the CSC148 course at the University of Toronto.
+Copying for purposes other than this use is expressly prohibited.
+All forms of distribution of this code, whether as given or with
+any changes, are expressly prohibited.
+
+Authors: Diane Horton, David Liu, Mario Badr, Sophia Huynh, Misha Schwartz,
+and Jaisie Sin
+
+All of the files in this directory and all subdirectories are:
+Copyright (c) Diane Horton, David Liu, Mario Badr, Sophia Huynh,
+Misha Schwartz, and Jaisie Sin.
+
+=== Module Description ===
+
+This file contains a batch of boards that are all played at once, for
+producing many more games than can be played one Block tree at a time.
+
+Every board in a batch has the same max_depth, and is stored as two grids of
+unit cells, indexed like goal._flatten by [board, column, row]: the index in
+COLOUR_LIST of each cell's colour, and the level of the leaf that covers each
+cell. The levels say how every board is subdivided, since a block at level
+<d> has children iff the cells it covers have levels greater than <d>.
+
+A move is done on every board of the batch at once, with a path for each
+board. Rotates, swaps, paints and combines move or change whole regions of
+the grids, so they are done with array operations; smashes are random, and
+are done one board at a time with Block.smash so that they draw the same
+numbers as a real game would.
+"""
+from __future__ import annotations
+from typing import List, Optional, Tuple
+import random
+
+import numpy as np
+
+from actions import ROTATE_CLOCKWISE, ROTATE_COUNTER_CLOCKWISE, \
+    SWAP_HORIZONTAL, SWAP_VERTICAL, SMASH, PAINT, COMBINE, PASS
+from block import Block, decode_board, encode_board, generate_board
+from player import ACTIONS
+from seeds import BOARD_STREAM, SMASH_STREAM, derive_seed, make_rng
+from settings import BOARD_SIZE, COLOUR_LIST
+
+# The deepest path that paths_region decodes; deeper paths are below every
+# block of a board.
+_MAX_PATH_DEPTH = 30
+
+
+class BoardBatch:
+    """A batch of boards with the same max_depth.
+
+    === Public Attributes ===
+    max_depth:
+        The max_depth of every board in this batch.
+    colours:
+        An array of shape (number of boards, side, side) holding the index in
+        COLOUR_LIST of the colour of each unit cell, where side is
+        2 ** max_depth.
+    levels:
+        An array of the same shape holding the level of the leaf that covers
+        each unit cell.
+    rngs:
+        The random.Random that each board's smashes are drawn from.
+
+    === Representation Invariants ===
+    - colours.shape == levels.shape == (len(rngs), 2 ** max_depth,
+                                        2 ** max_depth)
+    - every value in levels is between 0 and max_depth
+    - the cells covered by a leaf all have that leaf's level and colour
+    """
+    max_depth: int
+    colours: np.ndarray
+    levels: np.ndarray
+    rngs: List[random.Random]
+
+    def __init__(self, boards: List[Block],
+                 rngs: Optional[List[random.Random]] = None) -> None:
+        """Initialize this batch to hold a copy of each of <boards>, which
+        must be roots with the same max_depth, and to draw each board's
+        smashes from the matching rng in <rngs>.
+
+        If <rngs> is None, each board gets a new random.Random.
+        """
+        self.max_depth = boards[0].max_depth
+        side = 2 ** self.max_depth
+        self.colours = np.zeros((len(boards), side, side), np.int8)
+        self.levels = np.zeros((len(boards), side, side), np.int8)
+        if rngs is None:
+            rngs = [random.Random() for _ in boards]
+        self.rngs = rngs
+        for i in range(len(boards)):
+            assert boards[i].max_depth == self.max_depth
+            self._write_block(i, boards[i], 0, 0)
+
+    def __len__(self) -> int:
+        """Return the number of boards in this batch.
+        """
+        return len(self.rngs)
+
+    def _write_block(self, board: int, block: Block, col: int, row: int) \
+            -> None:
+        """Write the colours and levels of <block> and its descendants into
+        the grids of board <board>, with the upper left unit cell of <block>
+        at (<col>, <row>).
+        """
+        if not block.children:
+            side = 2 ** (self.max_depth - block.level)
+            self.colours[board, col:col + side, row:row + side] = \
+                COLOUR_LIST.index(block.colour)
+            self.levels[board, col:col + side, row:row + side] = block.level
+        else:
+            half = 2 ** (self.max_depth - block.level - 1)
+            self._write_block(board, block.children[0], col + half, row)
+            self._write_block(board, block.children[1], col, row)
+            self._write_block(board, block.children[2], col, row + half)
+            self._write_block(board, block.children[3], col + half,
+                              row + half)
+
+    def encoding(self, index: int) -> bytes:
+        """Return the encode_board encoding of board <index> of this batch.
+        """
+        colours = self.colours[index].tolist()
+        levels = self.levels[index].tolist()
+        symbols = []
+
+        def encode_helper(col: int, row: int, level: int) -> None:
+            """Append the symbols of the block at <level> whose upper left unit
+            cell is (<col>, <row>), and of its descendants, to symbols."""
+            if levels[col][row] == level:
+                symbols.append(colours[col][row])
+            else:
+                half = 2 ** (self.max_depth - level - 1)
+                symbols.append(4)
+                encode_helper(col + half, row, level + 1)
+                encode_helper(col, row, level + 1)
+                encode_helper(col, row + half, level + 1)
+                encode_helper(col + half, row + half, level + 1)
+
+        encode_helper(0, 0, 0)
+        if len(symbols) % 2 == 1:
+            symbols.append(15)
+        data = bytearray([self.max_depth])
+        for i in range(0, len(symbols), 2):
+            data.append((symbols[i] << 4) | symbols[i + 1])
+        return bytes(data)
+
+    def board(self, index: int, size: int = BOARD_SIZE) -> Block:
+        """Return a new Block of dimensions <size> by <size> that is equal to
+        board <index> of this batch.
+        """
+        return decode_board(self.encoding(index), size)
+
+    def regions(self, paths: np.ndarray) \
+            -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Return (depths, columns, rows) for the block at each of <paths>,
+        one path for each board of this batch.
+
+        depths[i] is the level of the block at paths[i], and (columns[i],
+        rows[i]) is the unit cell at its upper left corner, as for
+        moves.path_region. A path deeper than max_depth gets the region of
+        its ancestor at max_depth, and is below every block of the board.
+        """
+        paths = np.asarray(paths, np.int64)
+        depths = np.zeros(len(paths), np.int64)
+        rest = paths >> 2
+        for _ in range(_MAX_PATH_DEPTH):
+            if not rest.any():
+                break
+            depths += rest > 0
+            rest = rest >> 2
+        columns = np.zeros(len(paths), np.int64)
+        rows = np.zeros(len(paths), np.int64)
+        for level in range(1, self.max_depth + 1):
+            on_path = level <= depths
+            index = (paths >> np.maximum(2 * (depths - level), 0)) & 3
+            half = 2 ** (self.max_depth - level)
+            columns += on_path * half * ((index == 0) | (index == 3))
+            rows += on_path * half * (index >= 2)
+        return depths, columns, rows
+
+    def legal(self, action: Tuple[str, Optional[int]], paths: np.ndarray,
+              colours: np.ndarray) -> np.ndarray:
+        """Return an array saying, for each board of this batch, whether
+        <action> can be done on the block at the board's entry in <paths> by
+        a player whose goal is the colour at the board's entry in <colours>,
+        as for moves.is_legal.
+
+        <colours> holds indices into COLOUR_LIST.
+        """
+        depths, columns, rows = self.regions(paths)
+        boards = np.arange(len(self))
+        level = self.levels[boards, columns, rows]
+        exists = (depths <= self.max_depth) & (level >= depths)
+        if action in [ROTATE_CLOCKWISE, ROTATE_COUNTER_CLOCKWISE,
+                      SWAP_HORIZONTAL, SWAP_VERTICAL]:
+            return exists & (level > depths)
+        elif action == SMASH:
+            return exists & (level == depths) & (depths < self.max_depth)
+        elif action == PAINT:
+            return exists & (depths == self.max_depth) & \
+                (self.colours[boards, columns, rows] != colours)
+        elif action == COMBINE:
+            result = exists & (depths == self.max_depth - 1) & (level > depths)
+            majority = self._majorities(boards, columns, rows)[1]
+            return result & majority
+        else:
+            return exists & (action == PASS)
+
+    def apply(self, action: Tuple[str, Optional[int]], paths: np.ndarray,
+              colours: np.ndarray) -> np.ndarray:
+        """Do <action> on the block at each board's entry in <paths>, painting
+        with the colour at the board's entry in <colours> if it is a paint.
+
+        Return an array saying, for each board, whether the move was performed,
+        as for moves.apply_move. <colours> holds indices into COLOUR_LIST.
+        """
+        performed = self.legal(action, paths, colours)
+        if action == PASS or not performed.any():
+            return performed
+        depths, columns, rows = self.regions(paths)
+        boards = np.flatnonzero(performed)
+        depths = depths[boards]
+        columns = columns[boards]
+        rows = rows[boards]
+
+        if action == PAINT:
+            self.colours[boards, columns, rows] = \
+                np.asarray(colours)[boards]
+        elif action == COMBINE:
+            majority = self._majorities(boards, columns, rows)[0]
+            for d_col in range(2):
+                for d_row in range(2):
+                    self.colours[boards, columns + d_col, rows + d_row] = \
+                        majority
+                    self.levels[boards, columns + d_col, rows + d_row] = \
+                        self.max_depth - 1
+        elif action == SMASH:
+            for i in range(len(boards)):
+                depth = int(depths[i])
+                block = Block((0, 0), BOARD_SIZE, None, depth, self.max_depth)
+                block.smash(self.rngs[boards[i]])
+                self._write_block(int(boards[i]), block, int(columns[i]),
+                                  int(rows[i]))
+        else:
+            # Boards whose blocks are the same size are moved together.
+            for depth in np.unique(depths):
+                group = depths == depth
+                self._move_regions(action, boards[group], columns[group],
+                                   rows[group], 2 ** (self.max_depth - depth))
+        return performed
+
+    def _move_regions(self, action: Tuple[str, Optional[int]],
+                      boards: np.ndarray, columns: np.ndarray,
+                      rows: np.ndarray, side: int) -> None:
+        """Rotate or swap the block of each of <boards> whose upper left unit
+        cell is at its entry in <columns> and <rows>, and whose side is <side>
+        unit cells.
+
+        A rotate turns the block's cells a quarter turn. A horizontal swap
+        exchanges its left and right halves, and a vertical swap its top and
+        bottom halves, without mirroring either half.
+        """
+        span = np.arange(side)
+        index = (boards[:, None, None], (columns[:, None] + span)[:, :, None],
+                 (rows[:, None] + span)[:, None, :])
+        for grid in [self.colours, self.levels]:
+            cells = grid[index]
+            if action == ROTATE_CLOCKWISE:
+                cells = np.rot90(cells, 1, axes=(1, 2))
+            elif action == ROTATE_COUNTER_CLOCKWISE:
+                cells = np.rot90(cells, -1, axes=(1, 2))
+            elif action == SWAP_HORIZONTAL:
+                cells = np.roll(cells, side // 2, axis=1)
+            else:
+                cells = np.roll(cells, side // 2, axis=2)
+            grid[index] = cells
+
+    def _majorities(self, boards: np.ndarray, columns: np.ndarray,
+                    rows: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (colours, found) for the 2 by 2 unit cells of each of
+        <boards> whose upper left cell is at its entry in <columns> and
+        <rows>.
+
+        found[i] says whether those cells have a majority colour, as for
+        Block._majority_colour, and colours[i] is that colour's index in
+        COLOUR_LIST if they do.
+        """
+        columns = np.minimum(columns, self.colours.shape[1] - 2)
+        rows = np.minimum(rows, self.colours.shape[2] - 2)
+        counts = np.zeros((len(boards), len(COLOUR_LIST)), np.int64)
+        for d_col in range(2):
+            for d_row in range(2):
+                cell = self.colours[boards, columns + d_col, rows + d_row]
+                counts[np.arange(len(boards)), cell] += 1
+        best = counts.max(axis=1)
+        found = (counts == best[:, None]).sum(axis=1) == 1
+        return counts.argmax(axis=1), found
+
+    def perimeter_scores(self, colours: np.ndarray) -> np.ndarray:
+        """Return the score of a PerimeterGoal on each board of this batch,
+        where the goal's colour is the board's entry in <colours>, an index
+        into COLOUR_LIST.
+        """
+        match = self.colours == np.asarray(colours)[:, None, None]
+        if self.max_depth == 0:
+            # A single cell is counted on every edge twice over.
+            return match[:, 0, 0] * 6
+        return match[:, 0, :].sum(axis=1) + match[:, -1, :].sum(axis=1) + \
+            match[:, :, 0].sum(axis=1) + match[:, :, -1].sum(axis=1)
+
+    def blob_scores(self, colours: np.ndarray) -> np.ndarray:
+        """Return the score of a BlobGoal on each board of this batch, where
+        the goal's colour is the board's entry in <colours>, an index into
+        COLOUR_LIST.
+
+        Each cell of the goal's colour starts with a label of its own, and
+        every label then spreads to its neighbours of that colour, the largest
+        label winning, until no label changes. The cells that share a label
+        are then one blob.
+        """
+        num_boards, side = len(self), self.colours.shape[1]
+        match = self.colours == np.asarray(colours)[:, None, None]
+        cells = side * side
+        labels = np.where(match, np.arange(1, cells + 1).reshape(side, side),
+                          0)
+        while True:
+            spread = labels.copy()
+            np.maximum(spread[:, 1:], labels[:, :-1], out=spread[:, 1:])
+            np.maximum(spread[:, :-1], labels[:, 1:], out=spread[:, :-1])
+            np.maximum(spread[:, :, 1:], labels[:, :, :-1],
+                       out=spread[:, :, 1:])
+            np.maximum(spread[:, :, :-1], labels[:, :, 1:],
+                       out=spread[:, :, :-1])
+            spread *= match
+            if np.array_equal(spread, labels):
+                break
+            labels = spread
+
+        offsets = np.arange(num_boards)[:, None, None] * (cells + 1)
+        sizes = np.bincount((labels + offsets).ravel(),
+                            minlength=num_boards * (cells + 1))
+        sizes = sizes.reshape(num_boards, cells + 1)[:, 1:]
+        # BlobGoal scores a board that is all its colour as 4.
+        return np.where(match.all(axis=(1, 2)), 4, sizes.max(axis=1))
+
+    def random_paths(self, rng: np.random.Generator) -> np.ndarray:
+        """Return the path of a random block of each board of this batch, as
+        player.get_random_path finds them: a random level is drawn for each
+        board, and random children are taken from the root until that level
+        or a leaf is reached.
+        """
+        boards = np.arange(len(self))
+        targets = rng.integers(0, self.max_depth + 1, len(self))
+        paths = np.ones(len(self), np.int64)
+        columns = np.zeros(len(self), np.int64)
+        rows = np.zeros(len(self), np.int64)
+        for level in range(1, self.max_depth + 1):
+            down = (level <= targets) & \
+                (self.levels[boards, columns, rows] >= level)
+            index = rng.integers(0, 4, len(self))
+            half = 2 ** (self.max_depth - level)
+            paths = np.where(down, (paths << 2) | index, paths)
+            columns += down * half * ((index == 0) | (index == 3))
+            rows += down * half * (index >= 2)
+        return paths
+
+
+def generate_batch(num_boards: int, max_depth: int, seed: int) -> BoardBatch:
+    """Return a batch of <num_boards> random boards with <max_depth>.
+
+    Board <i> is the board of the game seeded by derive_seed(<seed>, 'batch',
+    <i>), and its smashes are drawn from that game's smash stream.
+    """
+    boards = []
+    rngs = []
+    for i in range(num_boards):
+        game_seed = derive_seed(seed, 'batch', i)
+        boards.append(generate_board(max_depth, BOARD_SIZE,
+                                     make_rng(game_seed, BOARD_STREAM)))
+        rngs.append(make_rng(game_seed, SMASH_STREAM))
+    return BoardBatch(boards, rngs)
+
+
+def play_random(batch: BoardBatch, colours: np.ndarray, num_moves: int,
+                rng: np.random.Generator) -> np.ndarray:
+    """Make <num_moves> random moves on every board of <batch>, painting each
+    board with its entry in <colours>, and return an array of shape
+    (<num_moves>, len(<batch>)) saying which moves were performed.
+
+    The boards move in lockstep: every board does the same action, drawn from
+    <rng>, on a block drawn for it by BoardBatch.random_paths. A board on
+    which the move cannot be done is left unchanged.
+    """
+    performed = np.zeros((num_moves, len(batch)), bool)
+    for i in range(num_moves):
+        action = ACTIONS[rng.integers(0, len(ACTIONS))]
+        performed[i] = batch.apply(action, batch.random_paths(rng), colours)
+    return performed
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(config={
+        'allowed-import-modules': [
+            'doctest', 'python_ta', 'random', 'typing', '__future__', 'numpy',
+            'actions', 'block', 'player', 'seeds', 'settings'
+        ]
+    })
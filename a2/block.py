@@ -29,10 +29,14 @@ import math
 from settings import colour_name, COLOUR_LIST
 
 
-def generate_board(max_depth: int, size: int) -> Block:
+def generate_board(max_depth: int, size: int,
+                   rng: Optional[random.Random] = None) -> Block:
     """Return a new game board with a depth of <max_depth> and dimensions of
     <size> by <size>.
 
+    The board's colours and structure are drawn from <rng>, or from the random
+    module if <rng> is None.
+
     >>> board = generate_board(3, 750)
     >>> board.max_depth
     3
@@ -41,12 +45,98 @@ def generate_board(max_depth: int, size: int) -> Block:
     >>> len(board.children) == 4
     True
     """
-    board = Block((0, 0), size, random.choice(COLOUR_LIST), 0, max_depth)
-    board.smash()
+    if rng is None:
+        rng = random
+    board = Block((0, 0), size, rng.choice(COLOUR_LIST), 0, max_depth)
+    board.smash(rng)
 
     return board
 
 
+def encode_board(board: Block) -> bytes:
+    """Return a compact encoding of the structure and colours of <board>.
+
+    The first byte is the max_depth of <board>. It is followed by one 4-bit
+    symbol per block, in the order of a preorder traversal, two symbols to a
+    byte: the index in COLOUR_LIST of a leaf's colour, or 4 for a block with
+    children. An odd number of symbols is padded with 15.
+
+    Two boards of the same size have the same encoding iff they are equal.
+
+    >>> board = Block((0, 0), 750, COLOUR_LIST[2], 0, 1)
+    >>> encode_board(board)
+    b'\\x01/'
+    """
+    symbols = []
+
+    def encode_helper(block: Block) -> None:
+        """Append the symbols of <block> and its descendants to symbols."""
+        if block.children:
+            symbols.append(4)
+            for child in block.children:
+                encode_helper(child)
+        else:
+            symbols.append(COLOUR_LIST.index(block.colour))
+
+    encode_helper(board)
+    if len(symbols) % 2 == 1:
+        symbols.append(15)
+
+    data = bytearray([board.max_depth])
+    for i in range(0, len(symbols), 2):
+        data.append((symbols[i] << 4) | symbols[i + 1])
+    return bytes(data)
+
+
+def decode_board(data: bytes, size: int) -> Block:
+    """Return the board of dimensions <size> by <size> that <data> is the
+    encode_board encoding of.
+
+    >>> board = generate_board(3, 750)
+    >>> decode_board(encode_board(board), 750) == board
+    True
+    """
+    board = Block((0, 0), size, None, 0, data[0])
+    decode_block(board, data)
+    return board
+
+
+def decode_block(block: Block, data: bytes) -> None:
+    """Give <block> the structure and colours of the block that <data> is the
+    encode_board encoding of.
+
+    The encoded block is taken to be at the level of <block>, and its
+    descendants are made at the levels and positions below <block>.
+
+    Precondition: <block> has no children.
+    """
+    symbols = []
+    for byte in data[1:]:
+        symbols.append(byte >> 4)
+        symbols.append(byte & 15)
+    next_symbol = [0]
+
+    def decode_helper(b: Block) -> None:
+        """Give <b> the colour or children of the next symbol."""
+        symbol = symbols[next_symbol[0]]
+        next_symbol[0] += 1
+        if symbol == 4:
+            b.colour = None
+            positions = b._children_positions()
+            child_size = b._child_size()
+            for position in positions:
+                child = Block(position, child_size, None, b.level + 1,
+                              b.max_depth)
+                child._version = b._version
+                b.children.append(child)
+            for child in b.children:
+                decode_helper(child)
+        else:
+            b.colour = COLOUR_LIST[symbol]
+
+    decode_helper(block)
+
+
 class Block:
     """A square Block in the Blocky game, represented as a tree.
 
@@ -92,12 +182,20 @@ class Block:
         - its colour is not None.
     - level <= max_depth
     """
+    # === Private Attributes ===
+    # _version:
+    #   A one-element list holding the number of changes made to the board
+    #   this Block belongs to. Blocks have no link to their parent, so every
+    #   Block of a board shares this same list, and a change anywhere in the
+    #   board can bump the count seen from its root. Blocks created by smash
+    #   and create_copy share the list of the Block they are created from.
     position: Tuple[int, int]
     size: int
     colour: Optional[Tuple[int, int, int]]
     level: int
     max_depth: int
     children: List[Block]
+    _version: List[int]
 
     def __init__(self, position: Tuple[int, int], size: int,
                  colour: Optional[Tuple[int, int, int]], level: int,
@@ -117,6 +215,7 @@ class Block:
         self.level = level
         self.max_depth = max_depth
         self.children = []
+        self._version = [0]
 
     def __str__(self) -> str:
         """Return this Block in a string format.
@@ -163,6 +262,30 @@ class Block:
 
             return True
 
+    def version(self) -> int:
+        """Return the number of changes made so far to the board this Block
+        belongs to.
+
+        Every successful smash, swap, rotate, paint and combine on any Block of
+        the board increases this number, so a board whose version is unchanged
+        has not changed.
+
+        >>> board = generate_board(1, 750)
+        >>> before = board.version()
+        >>> board.children[0].version() == before
+        True
+        >>> board.children[0].paint((0, 0, 0))
+        True
+        >>> board.version() > before
+        True
+        """
+        return self._version[0]
+
+    def _changed(self) -> None:
+        """Record that the board this Block belongs to has changed.
+        """
+        self._version[0] += 1
+
     def _child_size(self) -> int:
         """Return the size of this Block's children.
         """
@@ -201,10 +324,11 @@ class Block:
         """
         return self.level != self.max_depth and len(self.children) == 0
 
-    def smash_helper(self, l: int) -> None:
+    def smash_helper(self, l: int, rng: random.Random) -> None:
         """A helper method for the smash method. Same as an implementation for
         smash except it allows the recursion to check if it is the first time
-        the method is called, thus always smashing."""
+        the method is called, thus always smashing. Random numbers are drawn
+        from <rng>."""
 
         # Initial call. Always do this first. Then in subsequent recursive
         # calls use RNG to determine what will be done.
@@ -213,24 +337,25 @@ class Block:
             child_positions = self._children_positions()
             child_size = self._child_size()
             for i in child_positions:
-                randi = random.randint(0, 3)
+                randi = rng.randint(0, 3)
                 self.children.append(Block(i, child_size, COLOUR_LIST[randi]
                                            , self.level + 1, self.max_depth)
                                      )
             for child in self.children:
-                child.smash_helper(l + 1)
+                child._version = self._version
+                child.smash_helper(l + 1, rng)
 
         elif self.smashable():
-            rng_zero_one = random.random()
+            rng_zero_one = rng.random()
             sub_decider = math.exp(-0.25 * self.level)
             # If a block is not going to be subdivided, use a random integer
             # to pick a random colour from the colours list.
             if not rng_zero_one < sub_decider:
-                randi = random.randint(0, 3)
+                randi = rng.randint(0, 3)
                 new_colour = COLOUR_LIST[randi]
                 # Make sure the new colour is not already the current colour.
                 while new_colour == self.colour:
-                    randi = random.randint(0, 3)
+                    randi = rng.randint(0, 3)
                     new_colour = COLOUR_LIST[randi]
                 # Else change the colour of the block.
                 self.colour = new_colour
@@ -243,30 +368,37 @@ class Block:
                 child_positions = self._children_positions()
                 child_size = self._child_size()
                 for i in child_positions:
-                    randi = random.randint(0, 3)
+                    randi = rng.randint(0, 3)
                     self.children.append(Block(i, child_size, COLOUR_LIST[randi]
                                                , self.level + 1, self.max_depth)
                                          )
                 for child in self.children:
-                    child.smash_helper(l + 1)
+                    child._version = self._version
+                    child.smash_helper(l + 1, rng)
 
         else:
             pass
 
-    def smash(self) -> bool:
+    def smash(self, rng: Optional[random.Random] = None) -> bool:
         """Sub-divide this block so that it has four randomly generated
         children.
 
         If this Block's level is <max_depth>, do nothing. If this block has
         children, do nothing.
 
+        The new children are drawn from <rng>, or from the random module if
+        <rng> is None.
+
         Return True iff the smash was performed.
         """
 
         if not self.smashable():
             return False
         else:
-            self.smash_helper(0)
+            if rng is None:
+                rng = random
+            self.smash_helper(0, rng)
+            self._changed()
             return True
 
     def swap(self, direction: int) -> bool:
@@ -297,6 +429,7 @@ class Block:
             self.children[2] = self.children[3]
             self.children[0] = temp1
             self.children[3] = temp2
+            self._changed()
             return True
         else:
             block_children = self.children
@@ -314,6 +447,7 @@ class Block:
             self.children[1] = self.children[2]
             self.children[3] = temp1
             self.children[2] = temp2
+            self._changed()
             return True
 
     def rotate(self, direction: int) -> bool:
@@ -355,6 +489,7 @@ class Block:
             for child in self.children:
                 child.rotate(3)
 
+        self._changed()
         return True
 
     def paint(self, colour: Tuple[int, int, int]) -> bool:
@@ -368,10 +503,51 @@ class Block:
                 return False
             else:
                 self.colour = colour
+                self._changed()
                 return True
         else:
             return False
 
+    def _majority_colour(self) -> Optional[Tuple[int, int, int]]:
+        """Return the majority colour of this Block's children, or None if
+        there is no majority colour.
+
+        The majority colour is the colour with the most child blocks of that
+        colour. A tie does not constitute a majority (e.g., if there are two red
+        children and two blue children, then there is no majority colour).
+        """
+        majority = - 1
+        colour_to_occurence = {}
+        for colour in COLOUR_LIST:
+            colour_to_occurence[colour] = 0
+
+        for child in self.children:
+            colour_to_occurence[child.colour] += 1
+
+        for colour in colour_to_occurence:
+            if colour_to_occurence[colour] > majority:
+                majority = colour_to_occurence[colour]
+
+        num_majority = 0
+        for colour in colour_to_occurence:
+            if colour_to_occurence[colour] == majority:
+                num_majority += 1
+                majority_colour = colour
+
+        if num_majority > 1:
+            return None
+        else:
+            return majority_colour
+
+    def combinable(self) -> bool:
+        """Return True iff this block can be combined.
+
+        A block can be combined if it is at a level of max_depth - 1, has
+        children, and its children have a majority colour.
+        """
+        return self.level == self.max_depth - 1 and self.children != [] and \
+            self._majority_colour() is not None
+
     def combine(self) -> bool:
         """Turn this Block into a leaf based on the majority colour of its
         children.
@@ -389,45 +565,41 @@ class Block:
         if not self.level == self.max_depth - 1 or self.children == []:
             return False
         else:
-            majority = - 1
-            colour_to_occurence = {}
-            for colour in COLOUR_LIST:
-                colour_to_occurence[colour] = 0
-
-            for child in self.children:
-                colour_to_occurence[child.colour] += 1
+            majority_colour = self._majority_colour()
 
-            for colour in colour_to_occurence:
-                if colour_to_occurence[colour] > majority:
-                    majority = colour_to_occurence[colour]
-
-            num_majority = 0
-            for colour in colour_to_occurence:
-                if colour_to_occurence[colour] == majority:
-                    num_majority += 1
-                    majority_colour = colour
-
-            if num_majority > 1:
+            if majority_colour is None:
                 return False
             else:
                 self.children = []
                 self.colour = majority_colour
+                self._changed()
                 return True
 
     def create_copy(self) -> Block:
         """Return a new Block that is a deep copy of this Block.
 
         Remember that a deep copy has new blocks (not aliases) at every level.
+
+        The copy is a board of its own, so changes to it do not change the
+        version of this Block's board.
+        """
+        return self._create_copy([0])
+
+    def _create_copy(self, version: List[int]) -> Block:
+        """Return a new Block that is a deep copy of this Block, in which every
+        Block shares <version>.
         """
         if not self.children:
             new_block = Block(self.position, self.size, self.colour, self.level,
                               self.max_depth)
+            new_block._version = version
             return new_block
         else:
             base_block = Block(self.position, self.size, self.colour,
                                self.level, self.max_depth)
+            base_block._version = version
             for child in self.children:
-                base_block.children.append(child.create_copy())
+                base_block.children.append(child._create_copy(version))
 
             return base_block
 
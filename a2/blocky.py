@@ -20,18 +20,32 @@ Misha Schwartz, and Jaisie Sin
 === Module Description ===
 
 This file contains the different game states for the Blocky game.
+
+The data of a game and the rules for playing its turns are in the engine
+module; GameData is imported here so that it can still be used from this
+module.
 """
 
 from __future__ import annotations
 from typing import Dict, List, Optional, Tuple
+import sys
+import threading
+import time
 import pygame
 
-from actions import ACTION_MESSAGE, ROTATE_CLOCKWISE, ROTATE_COUNTER_CLOCKWISE,\
-    SWAP_HORIZONTAL, SWAP_VERTICAL, SMASH, PASS, PAINT, COMBINE, ACTION_PENALTY
+from actions import ACTION_MESSAGE
 from block import Block
-from player import Player
+from engine import GameData, winner
+from moves import ROOT_PATH, Move, block_at_path, child_path
+from player import ComputerPlayer, Player
 from renderer import Renderer
-from settings import ANIMATION_DURATION
+from settings import ANIMATION_DURATION, FRAME_RATE
+
+# The number of seconds a thread may run before Python switches to another one
+# while a computer player is thinking (see sys.setswitchinterval). The default
+# of 0.005 lets the worker hold up the frame that is drawn after every sleep
+# for long enough to miss 30 frames a second.
+THINKING_SWITCH_INTERVAL = 0.001
 
 
 def _block_to_squares(board: Block) -> List[Tuple[Tuple[int, int, int],
@@ -58,67 +72,195 @@ def _block_to_squares(board: Block) -> List[Tuple[Tuple[int, int, int],
         return b
 
 
-class GameData:
+class SquareCache:
+    """The squares to be drawn in order to render a board, as returned by
+    _block_to_squares, kept from one frame to the next.
+
+    The squares are kept in the order of a preorder traversal of the board, so
+    the squares of any block are a contiguous slice of them. They are only
+    found again when the board's version changes, and after a move only the
+    squares of the block that was moved are found again.
+
+    A list of squares that has been returned is never changed, so it can be
+    kept as a picture of the board at that time.
     """
-    A bundle of the data needed for a Blocky game.
+    # === Private Attributes ===
+    # _board:
+    #   The board whose squares are kept.
+    # _version:
+    #   The version of _board that _squares is for.
+    # _squares:
+    #   The squares of _board, in preorder.
+    # _leaves:
+    #   A dictionary mapping the path of every block of _board to the number
+    #   of leaves it has, which is 1 for a leaf.
+    _board: Block
+    _version: int
+    _squares: List[Tuple[Tuple[int, int, int], Tuple[int, int], int]]
+    _leaves: Dict[int, int]
+
+    def __init__(self, board: Block) -> None:
+        """Initialize this cache with the squares of <board>.
+        """
+        self._board = board
+        self._rebuild()
+
+    def _rebuild(self) -> None:
+        """Find all of the squares of the board again.
+        """
+        self._squares = []
+        self._leaves = {}
+        self._add_block(self._board, ROOT_PATH, self._squares)
+        self._version = self._board.version()
+
+    def _add_block(self, block: Block, path: int,
+                   squares: List[Tuple[Tuple[int, int, int], Tuple[int, int],
+                                       int]]) -> int:
+        """Append the squares of <block>, whose path is <path>, to <squares>,
+        record its number of leaves and those of its descendants, and return
+        its number of leaves.
+        """
+        if not block.children:
+            squares.append((block.colour, block.position, block.size))
+            count = 1
+        else:
+            count = 0
+            for i in range(4):
+                count += self._add_block(block.children[i],
+                                         child_path(path, i), squares)
+        self._leaves[path] = count
+        return count
+
+    def _forget_block(self, path: int) -> None:
+        """Forget the numbers of leaves of the descendants of the block at
+        <path>.
+        """
+        if self._leaves[path] > 1:
+            for i in range(4):
+                self._forget_block(child_path(path, i))
+                del self._leaves[child_path(path, i)]
+
+    def squares(self) -> List[Tuple[Tuple[int, int, int], Tuple[int, int],
+                                    int]]:
+        """Return the squares of the board, finding them again only if the
+        board has changed since they were last found.
+        """
+        if self._board.version() != self._version:
+            self._rebuild()
+        return self._squares
+
+    def block_changed(self, path: int) -> None:
+        """Update the squares of the board after a change to the block at
+        <path>, such as a move on it.
+
+        Only the squares of that block are found again. If the board has not
+        changed, nothing is done.
+
+        Precondition: no other block of the board has changed since the
+        squares were last found.
+        """
+        if self._board.version() == self._version:
+            return
+
+        # The block's squares start after the squares of every block before
+        # it in preorder: the earlier siblings of it and of its ancestors.
+        start = 0
+        ancestors = [ROOT_PATH]
+        for shift in range(path.bit_length() - 3, -1, -2):
+            ancestor = path >> shift
+            for i in range(ancestor & 3):
+                start += self._leaves[child_path(ancestor >> 2, i)]
+            ancestors.append(ancestor)
+        old_count = self._leaves[path]
+
+        self._forget_block(path)
+        squares = []
+        new_count = self._add_block(block_at_path(self._board, path), path,
+                                    squares)
+        self._squares = self._squares[:start] + squares + \
+            self._squares[start + old_count:]
+        for ancestor in ancestors[:-1]:
+            self._leaves[ancestor] += new_count - old_count
+        self._version = self._board.version()
+
+
+class MoveWorker:
+    """A thread on which a computer player generates its move on a copy of the
+    board, so that the game keeps drawing itself and handling events while the
+    player thinks.
 
     === Public Attributes ===
-    max_turns:
-        The maximum number of turns for the game.
-    board:
-        The Blocky board on which this game will be played.
-    players:
-        The entities that are playing this game.
-    smashes:
-        The number of smashes done by each player.
-    combines:
-        The number of combines done by each player.
-    paints:
-        The number of paints done by each player.
-
-    === Representation Invariants ===
-    - len(players) >= 1
+    player:
+        The player whose move is being generated.
+    start_time:
+        The value of time.perf_counter when the thread started.
     """
-    max_turns: int
-    board: Block
-    players: List[Player]
-    smashes: Dict[int, int]
-    combines: Dict[int, int]
-    paints: Dict[int, int]
-
-    def __init__(self, board: Block, players: List[Player]) -> None:
-        """Initialize the game data, saving a reference to <board> and
-        <players>.
-
-        Precondition:
-            - len(players) >= 1
+    # === Private Attributes ===
+    # _thread:
+    #   The thread that generates the move.
+    # _move:
+    #   The move that was generated, or None if there is none yet.
+    # _error:
+    #   The exception raised while generating the move, or None if there was
+    #   none.
+    player: ComputerPlayer
+    start_time: float
+    _thread: threading.Thread
+    _move: Optional[Move]
+    _error: Optional[BaseException]
+
+    def __init__(self, player: ComputerPlayer, board: Block) -> None:
+        """Initialize this worker, and start generating the move of <player>
+        on a copy of <board>.
+
+        <board> is copied so that the player never sees it change, and the
+        board that is drawn is never touched by the player.
+        """
+        self.player = player
+        self._move = None
+        self._error = None
+        self._thread = threading.Thread(target=self._run,
+                                        args=(board.create_copy(),),
+                                        daemon=True)
+        self.start_time = time.perf_counter()
+        self._thread.start()
+
+    def _run(self, board: Block) -> None:
+        """Generate the player's move on <board>.
         """
-        self.max_turns = 0
-        self.board = board
-        self.players = players
-
-        self.smashes = {}
-        self.combines = {}
-        self.paints = {}
-
-        # Start off all counts at 0
-        for player in players:
-            self.smashes[player.id] = 0
-            self.combines[player.id] = 0
-            self.paints[player.id] = 0
-
-    def calculate_score(self, player_id: int) -> Tuple[int, int]:
-        """Return a tuple containing first the <player_id>'s score based on
-        their goal in the game and second the deductions from their score based
-        on the actions they've taken.
+        try:
+            self._move = self.player.generate_move(board)
+        except BaseException as error:
+            self._error = error
+
+    def done(self) -> bool:
+        """Return True iff the move has been generated.
+        """
+        return not self._thread.is_alive()
+
+    def wait(self, timeout: float) -> bool:
+        """Wait for at most <timeout> seconds for the move to be generated,
+        and return True iff it has been.
         """
-        goal_score = self.players[player_id].goal.score(self.board)
+        self._thread.join(timeout)
+        return self.done()
 
-        penalty = self.smashes[player_id] * ACTION_PENALTY[SMASH] + \
-                  self.combines[player_id] * ACTION_PENALTY[COMBINE] + \
-                  self.paints[player_id] * ACTION_PENALTY[PAINT]
+    def elapsed(self) -> float:
+        """Return the number of seconds since the thread started.
+        """
+        return time.perf_counter() - self.start_time
+
+    def move(self) -> Optional[Move]:
+        """Return the move that was generated.
 
-        return goal_score, penalty
+        If the player raised an exception while generating it, raise that
+        exception here.
+
+        Precondition: self.done()
+        """
+        if self._error is not None:
+            raise self._error
+        return self._move
 
 
 class GameState:
@@ -147,114 +289,158 @@ class MainState(GameState):
     """A GameState that manages the moves made by different players in Blocky.
     """
     # === Private Attributes ===
-    # _turn:
-    #   The current turn.
     # _data:
-    #   A reference to the shared GameData.
-    # _current_player_index:
-    #   The index of the current player in GameData.players.
+    #   A reference to the shared GameData, which also keeps track of the
+    #   current turn and player.
     # _current_score:
     #   The score of the current player, including penalties.
-    _turn: int
+    # _squares:
+    #   The squares to be drawn in order to render the board.
+    # _worker:
+    #   The worker on which a computer player is generating its move, or None
+    #   if no computer player is thinking.
+    # _switch_interval:
+    #   The thread switch interval to restore once _worker is done. It is
+    #   only changed and restored on the thread that updates this state,
+    #   since it is shared by the whole process.
     _data: GameData
-    _current_player_index: int
     _current_score: int
+    _squares: SquareCache
+    _worker: Optional[MoveWorker]
+    _switch_interval: float
 
     def __init__(self, data: GameData) -> None:
         """Initialize this GameState.
         """
-        self._turn = 0
         self._data = data
-        self._current_player_index = 0
-
-        score, penalty = self._data.calculate_score(self._current_player().id)
-        self._current_score = score - penalty
+        self._squares = SquareCache(data.board)
+        self._worker = None
+        self._switch_interval = sys.getswitchinterval()
+        self._update_score()
 
     def _current_player(self) -> Player:
         """Return the player whose turn it is.
         """
-        return self._data.players[self._current_player_index]
+        return self._data.current_player()
 
-    def _update_player(self) -> None:
-        """Update the player whose turn it is.
+    def _update_score(self) -> None:
+        """Update the score of the player whose turn it is.
         """
-        self._current_player_index = (self._current_player_index + 1) % len(
-            self._data.players)
-
+        start = time.perf_counter()
         score, penalty = self._data.calculate_score(self._current_player().id)
         self._current_score = score - penalty
+        if self._data.stats is not None:
+            self._data.stats.add('calculate_score',
+                                 time.perf_counter() - start)
 
-        if self._current_player_index == 0:
-            self._turn += 1
-
-    def _do_move(self, move: Tuple[str, Optional[int], Block]) -> bool:
+    def _do_move(self, move: Move) -> bool:
         """Attempt to do the player's requested move.
         """
-        action = (move[0], move[1])
-        direction = move[1]
-        block = move[2]
-        player = self._current_player()
-        move_successful = False
-
-        if action in [ROTATE_CLOCKWISE, ROTATE_COUNTER_CLOCKWISE]:
-            move_successful = block.rotate(direction)
-        elif action in [SWAP_HORIZONTAL, SWAP_VERTICAL]:
-            move_successful = block.swap(direction)
-        elif action == SMASH:
-            move_successful = block.smash()
-            self._data.smashes[player.id] += int(move_successful)
-        elif action == PAINT:
-            move_successful = block.paint(self._current_player().goal.colour)
-            self._data.paints[player.id] += int(move_successful)
-        elif action == COMBINE:
-            move_successful = block.combine()
-            self._data.combines[player.id] += int(move_successful)
-        elif action == PASS:
-            # Do nothing
-            move_successful = True
-
+        start = time.perf_counter()
+        move_successful = self._data.do_move(move)
         if move_successful:
-            self._update_player()
-
+            self._squares.block_changed(move[2])
+        if self._data.stats is not None:
+            self._data.stats.add('do_move', time.perf_counter() - start)
+        if move_successful:
+            self._update_score()
         return move_successful
 
     def process_event(self, event: pygame.event.Event) -> None:
-        self._current_player().process_event(event)
+        # A player that is thinking on a worker is not sent events, since the
+        # worker may be changing the same attributes.
+        if self._worker is None:
+            self._current_player().process_event(event)
 
     def update(self) -> GameState:
-        if self._turn >= self._data.max_turns:
+        if self._data.is_over():
             return GameOverState(self._data)
 
-        # Ask the player to make a move
-        move = self._current_player().generate_move(self._data.board)
+        profiler = self._data.profiler
+        if self._worker is not None:
+            # A computer player is thinking; check whether it is done. A game
+            # that is fast-forwarded waits for up to a frame instead, so that
+            # the game loop does not take turns with the player.
+            if self._data.turbo:
+                done = self._worker.wait(1 / FRAME_RATE)
+            else:
+                done = self._worker.done()
+            if not done:
+                return self
+            sys.setswitchinterval(self._switch_interval)
+            player = self._worker.player
+            move = self._worker.move()
+            seconds = self._worker.elapsed()
+            self._worker = None
+        else:
+            # Ask the player to make a move
+            start = time.perf_counter()
+            player = self._data.start_move()
+            if isinstance(player, ComputerPlayer) and self._data.turbo:
+                player.proceed()
+            if isinstance(player, ComputerPlayer) and not player.waiting() \
+                    and (profiler is None or not profiler.active):
+                # Think on another thread, so that the game keeps running.
+                # A game that is being profiled thinks on this thread, since
+                # the profiler follows only one thread.
+                self._switch_interval = sys.getswitchinterval()
+                sys.setswitchinterval(THINKING_SWITCH_INTERVAL)
+                self._worker = MoveWorker(player, self._data.board)
+                return self
+            elif profiler is None:
+                move = player.generate_move(self._data.board)
+            else:
+                move = profiler.run(f'player {player.id}',
+                                    player.generate_move, self._data.board)
+            seconds = time.perf_counter() - start
+
+        if move is not None and self._data.stats is not None:
+            self._data.stats.add(f'generate_move player {player.id}', seconds)
 
         if move is None:
             # No move was made, stay in the current state
             return self
         else:
             # Save what the board looks like before the move
-            background = _block_to_squares(self._data.board)
+            background = self._squares.squares()
             # Also save the current player ID
             player_id = self._current_player().id
 
             # Do the move
-            if self._do_move(move):
-                # Animate the move that was just done
-                return AnimateMoveState(self, player_id, move, background)
-            else:
+            if not self._do_move(move):
                 # The move was not valid, let the player try again
                 return self
+            elif self._data.turbo:
+                # Go straight on to the next move, without animating this one
+                return self
+            else:
+                # Animate the move that was just done
+                return AnimateMoveState(self, player_id, move, background,
+                                        self._data.board)
 
     def render(self, renderer: Renderer) -> None:
-        renderer.draw_board(_block_to_squares(self._data.board))
+        start = time.perf_counter()
+        squares = self._squares.squares()
+        drawn = time.perf_counter()
+        renderer.draw_board(squares)
+        if self._data.stats is not None:
+            self._data.stats.add('block_to_squares', drawn - start)
+            self._data.stats.add('draw_board', time.perf_counter() - drawn)
 
         b = self._current_player().get_selected_block(self._data.board)
         if b is not None:
             renderer.highlight_block(b.position, b.size)
 
         p = self._current_player()
-        status = f'Turn {self._turn} | Player {p.id} | ' \
-                 f'Score {self._current_score} | {p.goal.description()}'
+        if self._worker is not None:
+            status = f'Turn {self._data.turn} | Player {p.id} is thinking' \
+                     f'{"." * (int(self._worker.elapsed() * 2) % 3 + 1):<3} ' \
+                     f'{self._worker.elapsed():.1f}s'
+        else:
+            status = f'Turn {self._data.turn} | Player {p.id} | ' \
+                     f'Score {self._current_score} | {p.goal.description()}'
+        if self._data.turbo:
+            status = f'>> {status}'
         renderer.draw_status(status)
 
 
@@ -269,25 +455,29 @@ class AnimateMoveState(GameState):
     #   The ID of the player whose move is being animated.
     # _move:
     #   The move being animated.
+    # _block:
+    #   The block that the move was done on.
     # _start_time:
     #   The time that the animation started.
     # _background:
     #   The board to display behind the animation.
     _parent: GameState
     _player_id: int
-    _move: Tuple[str, Optional[int], Block]
+    _move: Move
+    _block: Block
     _start_time: int
     _background: List[Tuple[Tuple[int, int, int], Tuple[int, int], int]]
 
-    def __init__(self, parent: GameState, player_id: int,
-                 move: Tuple[str, Optional[int], Block],
+    def __init__(self, parent: GameState, player_id: int, move: Move,
                  background: List[Tuple[Tuple[int, int, int], Tuple[int, int],
-                                        int]]) -> None:
-        """Initialize this GameState.
+                                        int]], board: Block) -> None:
+        """Initialize this GameState to animate <move>, which was just done on
+        <board>.
         """
         self._parent = parent
         self._player_id = player_id
         self._move = move
+        self._block = block_at_path(board, move[2])
         self._background = background
         self._start_time = pygame.time.get_ticks()
 
@@ -309,7 +499,7 @@ class AnimateMoveState(GameState):
         renderer.draw_board(self._background)
 
         # Draw an outline around the selected block
-        b = self._move[2]
+        b = self._block
         renderer.highlight_block(b.position, b.size)
 
         # Draw the image representing the move
@@ -329,18 +519,18 @@ class GameOverState(GameState):
     #   A list of tuples containing each player ID, goal score, and penalty
     # _winner:
     #   The ID of the winning player
+    # _cache_report:
+    #   A summary of how well the game's evaluation cache did.
     _scores: List[Tuple[int, int, int]]
     _winner: int
+    _cache_report: str
 
     def __init__(self, data: GameData) -> None:
         """Initialize this GameState.
         """
-        self._scores = []
-        for p in data.players:
-            goal_score, penalty = data.calculate_score(p.id)
-            self._scores.append((p.id, goal_score, penalty))
-
-        self._winner = max(self._scores, key=lambda item: item[1] - item[2])[0]
+        self._scores = data.final_scores()
+        self._winner = winner(self._scores)
+        self._cache_report = data.eval_cache.report()
 
     def process_event(self, event: pygame.event.Event) -> None:
         # Simply ignore the event
@@ -363,6 +553,9 @@ class GameOverState(GameState):
             y += renderer.text_height()
 
         renderer.print(f'Player {self._winner} wins!', x, y)
+        y += renderer.text_height()
+
+        renderer.print(self._cache_report, x, y)
 
 
 if __name__ == '__main__':
@@ -371,8 +564,9 @@ if __name__ == '__main__':
     python_ta.check_all(config={
         'allowed-io': ['run_game'],
         'allowed-import-modules': [
-            'doctest', 'python_ta', 'random', 'typing', 'pygame', '__future__',
-            'block', 'player', 'renderer', 'settings', 'actions'
+            'doctest', 'python_ta', 'sys', 'threading', 'time', 'typing',
+            'pygame', '__future__', 'block', 'engine', 'moves', 'player',
+            'renderer', 'settings', 'actions'
         ],
         'generated-members': 'pygame.*'
     })
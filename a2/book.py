@@ -0,0 +1,222 @@
+"""CSC148 Assignment 2
+
+=== CSC148 Winter 2020 ===
+Department of Computer Science,
+University of Toronto
+
+This code is provided solely for the personal and private use of
+students taking the CSC148 course at the University of Toronto.
+Copying for purposes other than this use is expressly prohibited.
+All forms of distribution of this code, whether as given or with
+any changes, are expressly prohibited.
+
+Authors: Diane Horton, David Liu, Mario Badr, Sophia Huynh, Misha Schwartz,
+and Jaisie Sin
+
+All of the files in this directory and all subdirectories are:
+Copyright (c) Diane Horton, David Liu, Mario Badr, Sophia Huynh,
+Misha Schwartz, and Jaisie Sin.
+
+=== Module Description ===
+
+This file contains the opening book: a table on disk of the best move found by
+an offline search for a board and a goal. Computer players look their board up
+in the book before searching, and only search if it is not there.
+
+The book is a file of fixed-size records sorted by key, so it can be memory
+mapped and binary searched without reading it all in. The file starts with the
+8-byte BOOK_MAGIC, followed by records of a 16-byte key and an 8-byte
+big-endian move packed by moves.pack_move. A key is the first 14 bytes of the
+sha256 digest of the board's canonical form (see the symmetry module), then the
+index of the goal's type in GOAL_TYPES, then the index of the goal's colour in
+COLOUR_LIST. The move is the move on the board whose encoding is the canonical
+form, so one record serves every rotation and reflection of a board.
+
+Use make_book.py to generate a book.
+"""
+from __future__ import annotations
+import hashlib
+import mmap
+import os
+from typing import BinaryIO, Dict, Optional, Tuple
+
+from block import Block, encode_board
+from goal import Goal
+from moves import Move, pack_move, unpack_move
+from settings import COLOUR_LIST
+from symmetry import canonical_encoding, inverse_symmetry, transform_move
+
+# The first bytes of every opening book file.
+BOOK_MAGIC = b'BLKYBK02'
+
+# The goal types, in the order used in keys.
+GOAL_TYPES = ['PerimeterGoal', 'BlobGoal']
+
+KEY_SIZE = 16
+RECORD_SIZE = KEY_SIZE + 8
+
+
+def table_key(position: bytes, goal: Goal) -> bytes:
+    """Return the key of <position> and <goal> in a table in the format of an
+    opening book, where <position> is any bytes that name a position.
+    """
+    digest = hashlib.sha256(position).digest()
+    return digest[:KEY_SIZE - 2] + \
+        bytes([GOAL_TYPES.index(type(goal).__name__),
+               COLOUR_LIST.index(goal.colour)])
+
+
+def book_key(board: Block, goal: Goal) -> bytes:
+    """Return the key of <board> and <goal> in an opening book.
+
+    >>> from block import generate_board
+    >>> from goal import BlobGoal
+    >>> len(book_key(generate_board(2, 750), BlobGoal(COLOUR_LIST[0])))
+    16
+    """
+    return table_key(canonical_encoding(encode_board(board))[0], goal)
+
+
+def book_entry(board: Block, goal: Goal, move: Move) -> Tuple[bytes, Move]:
+    """Return the key and the move to store in an opening book for <move> on
+    <board> for <goal>.
+    """
+    position, symmetry = canonical_encoding(encode_board(board))
+    return table_key(position, goal), transform_move(move, symmetry)
+
+
+def write_book(path: str, entries: Dict[bytes, Move]) -> None:
+    """Write an opening book with <entries>, a dictionary mapping a book_key
+    to the best move for that board and goal, to the file at <path>.
+
+    The book is written to a temporary file that then replaces <path>, so a
+    book that is being read is never seen half written.
+    """
+    temp_path = path + '.tmp'
+    with open(temp_path, 'wb') as book_file:
+        book_file.write(BOOK_MAGIC)
+        for key in sorted(entries):
+            book_file.write(key)
+            book_file.write(pack_move(entries[key]).to_bytes(8, 'big'))
+    os.replace(temp_path, path)
+
+
+def open_book(path: str) -> Optional[OpeningBook]:
+    """Return the opening book in the file at <path>, or None if there is no
+    such file or it is not an opening book.
+    """
+    try:
+        return OpeningBook(path)
+    except (OSError, ValueError):
+        return None
+
+
+class OpeningBook:
+    """An opening book, memory mapped from a file written by write_book.
+
+    === Public Attributes ===
+    path:
+        The file the book is read from.
+    hits:
+        The number of lookups that found a move.
+    misses:
+        The number of lookups that did not.
+    """
+    # === Private Attributes ===
+    # _file:
+    #   The open book file.
+    # _data:
+    #   The memory map of the whole book file.
+    path: str
+    hits: int
+    misses: int
+    _file: BinaryIO
+    _data: mmap.mmap
+
+    def __init__(self, path: str) -> None:
+        """Initialize this book from the file at <path>.
+
+        Raise ValueError if the file is not an opening book.
+        """
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._file = open(path, 'rb')
+        try:
+            self._data = mmap.mmap(self._file.fileno(), 0,
+                                   access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise
+        if self._data[:len(BOOK_MAGIC)] != BOOK_MAGIC or \
+                (len(self._data) - len(BOOK_MAGIC)) % RECORD_SIZE != 0:
+            self.close()
+            raise ValueError(f'{path} is not an opening book')
+
+    def __len__(self) -> int:
+        """Return the number of moves in this book.
+        """
+        return (len(self._data) - len(BOOK_MAGIC)) // RECORD_SIZE
+
+    def _key_at(self, index: int) -> bytes:
+        """Return the key of record <index>.
+        """
+        start = len(BOOK_MAGIC) + index * RECORD_SIZE
+        return self._data[start:start + KEY_SIZE]
+
+    def _move_at(self, index: int) -> Move:
+        """Return the move of record <index>.
+        """
+        start = len(BOOK_MAGIC) + index * RECORD_SIZE + KEY_SIZE
+        return unpack_move(int.from_bytes(self._data[start:start + 8], 'big'))
+
+    def lookup_key(self, key: bytes) -> Optional[Move]:
+        """Return the move stored under <key>, or None if there is none.
+        """
+        low = 0
+        high = len(self)
+        while low < high:
+            middle = (low + high) // 2
+            if self._key_at(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+
+        if low < len(self) and self._key_at(low) == key:
+            self.hits += 1
+            return self._move_at(low)
+        self.misses += 1
+        return None
+
+    def entries(self) -> Dict[bytes, Move]:
+        """Return a dictionary mapping each key in this book to its move.
+        """
+        return {self._key_at(index): self._move_at(index)
+                for index in range(len(self))}
+
+    def lookup(self, board: Block, goal: Goal) -> Optional[Move]:
+        """Return the best known move for <goal> on <board>, or None if this
+        book does not have one.
+        """
+        position, symmetry = canonical_encoding(encode_board(board))
+        move = self.lookup_key(table_key(position, goal))
+        if move is None:
+            return None
+        return transform_move(move, inverse_symmetry(symmetry))
+
+    def close(self) -> None:
+        """Close this book's file.
+        """
+        self._data.close()
+        self._file.close()
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(config={
+        'allowed-import-modules': [
+            'doctest', 'python_ta', 'typing', '__future__', 'hashlib', 'mmap',
+            'os', 'block', 'goal', 'moves', 'settings', 'symmetry'
+        ],
+        'allowed-io': ['write_book', 'OpeningBook.__init__']
+    })
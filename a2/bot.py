@@ -0,0 +1,99 @@
+"""CSC148 Assignment 2
+
+=== CSC148 Winter 2020 ===
+Department of Computer Science,
+University of Toronto
+
+This code is provided solely for the personal and private use of
+students taking the CSC148 course at the University of Toronto.
+Copying for purposes other than this use is expressly prohibited.
+All forms of distribution of this code, whether as given or with
+any changes, are expressly prohibited.
+
+Authors: Diane Horton, David Liu, Mario Badr, Sophia Huynh, Misha Schwartz,
+and Jaisie Sin
+
+All of the files in this directory and all subdirectories are:
+Copyright (c) Diane Horton, David Liu, Mario Badr, Sophia Huynh,
+Misha Schwartz, and Jaisie Sin.
+
+=== Module Description ===
+
+This file is a script that runs one of the computer players of the game as an
+engine, which speaks the engine protocol on its standard input and output (see
+the protocol module). It is given the player as a lineup gives it (see the
+tournament module), such as:
+
+    python bot.py smart:5
+
+and so can be played in a tournament as "engine:python bot.py smart:5", to
+compare playing in another process with playing in the same one. The engine
+keeps one player for each goal it is asked to play for, so that what a player
+remembers from one move to the next is kept. The time limits it is given are
+ignored, since the computer players search a fixed number of moves.
+"""
+from __future__ import annotations
+import argparse
+import random
+from typing import Dict, List, Optional, Tuple
+
+from block import Block
+from evaluation import goal_key
+from goal import Goal, PerimeterGoal
+from moves import Move
+from player import BeamPlayer, ComputerPlayer, RandomPlayer, SmartPlayer
+from protocol import run_engine
+from settings import COLOUR_LIST
+from tournament import parse_lineup
+
+
+def create_player(spec: str, goal: Goal) -> ComputerPlayer:
+    """Return the computer player named by <spec>, with <goal>.
+
+    Raise ValueError if <spec> does not name one random, smart or beam player.
+    """
+    num_random, smart_players, beam_players, _, names = parse_lineup(spec)
+    if len(names) != 1 or names[0].startswith('engine:'):
+        raise ValueError(f'{spec!r} is not a random, smart or beam player')
+    if num_random == 1:
+        return RandomPlayer(0, goal)
+    elif smart_players:
+        return SmartPlayer(0, goal, smart_players[0])
+    else:
+        return BeamPlayer(0, goal, *beam_players[0])
+
+
+def main(args: Optional[List[str]] = None) -> None:
+    """Run the engine described by the command line <args>.
+    """
+    parser = argparse.ArgumentParser(
+        description='Run a computer player as an engine.')
+    parser.add_argument('player',
+                        help='the player, such as random or smart:5')
+    parser.add_argument('--seed', type=int, default=None,
+                        help='the seed of the random choices of the player')
+    options = parser.parse_args(args)
+    try:
+        create_player(options.player, PerimeterGoal(COLOUR_LIST[0]))
+    except ValueError as error:
+        parser.error(str(error))
+
+    rng = random.Random(options.seed)
+    players: Dict[Tuple[str, Tuple[int, int, int]], ComputerPlayer] = {}
+
+    def choose_move(board: Block, goal: Goal, turns_left: Optional[int],
+                    move_time: Optional[float]) -> Move:
+        """Return the move of the player for <goal> on <board>."""
+        key = goal_key(goal)
+        if key not in players:
+            players[key] = create_player(options.player, goal)
+            players[key].rng = rng
+        player = players[key]
+        player.turns_left = turns_left
+        return player.choose_move(board)
+
+    run_engine(choose_move, f'bot {options.player}')
+
+
+if __name__ == '__main__':
+    main()
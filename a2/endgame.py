@@ -0,0 +1,237 @@
+"""CSC148 Assignment 2
+
+=== CSC148 Winter 2020 ===
+Department of Computer Science,
+University of Toronto
+
+This code is provided solely for the personal and private use of
+students taking the CSC148 course at the University of Toronto.
+Copying for purposes other than this use is expressly prohibited.
+All forms of distribution of this code, whether as given or with
+any changes, are expressly prohibited.
+
+Authors: Diane Horton, David Liu, Mario Badr, Sophia Huynh, Misha Schwartz,
+and Jaisie Sin
+
+All of the files in this directory and all subdirectories are:
+Copyright (c) Diane Horton, David Liu, Mario Badr, Sophia Huynh,
+Misha Schwartz, and Jaisie Sin.
+
+=== Module Description ===
+
+This file contains the endgame solver, which finds the best moves for a goal
+over the last few turns of a game on a small board.
+
+The value of a board with <n> turns left is the score for the goal after the
+best <n> moves, less their penalties. Smashes are left out, since their results
+are random, and the other players' moves are not known, so the solver plans as
+though the player were alone. A player re-solves on each of its turns, from the
+board the other players left it.
+
+The solver searches breadth first from the board for every board reachable in
+<n> moves, and then finds the values of the boards backwards, one turn at a
+time. Boards are named by their canonical form (see the symmetry module), so
+that a board reached in several ways, or a rotation or reflection of it, is
+only expanded and scored once. The moves the solver finds are stored as moves
+on the board whose encoding is the canonical form, and mapped back to the board
+it is given.
+
+Solutions can also be written to a table on disk in the format of an opening
+book (see the book module), keyed by endgame_key with moves on the canonical
+board. Use make_endgame.py to generate one.
+"""
+from __future__ import annotations
+import time
+from typing import Dict, List, Tuple
+
+from actions import ACTION_PENALTY, PASS, SMASH
+from block import Block, encode_board
+from book import table_key
+from goal import Goal
+from moves import Move, ROOT_PATH, apply_move, create_move, legal_moves
+from symmetry import canonical_encoding, inverse_symmetry, transform_move
+
+# The largest max_depth of a board that the solver is used for.
+ENDGAME_MAX_DEPTH = 2
+
+# The most turns left for which a player solves the endgame during a game,
+# when it is not in the player's table.
+ENDGAME_SOLVE_TURNS = 3
+
+
+def endgame_key(position: bytes, goal: Goal, turns_left: int) -> bytes:
+    """Return the key in an endgame table of the board whose canonical form is
+    <position>, for <goal> with <turns_left> turns left.
+    """
+    return table_key(position + bytes([turns_left]), goal)
+
+
+class EndgameSolver:
+    """A solver of endgames for one goal, which remembers the positions it
+    has solved that can still come up.
+
+    The turns left in a game only go down, so once the solver is asked about
+    fewer turns left than before, it forgets its solutions for more turns
+    left than that. A solver that is always asked about the same number of
+    turns left, as in make_endgame.py, remembers every position it solves.
+
+    === Public Attributes ===
+    goal:
+        The goal whose score is maximized.
+    states:
+        The number of boards that have been expanded and scored.
+    solve_time:
+        The total number of seconds spent solving.
+    """
+    # === Private Attributes ===
+    # _solutions:
+    #   A dictionary mapping the canonical form of a board and a number of
+    #   turns left to the value of that board and the best move on the board
+    #   whose encoding is the canonical form.
+    # _most_turns:
+    #   The most turns left of any solution in _solutions, or 0 if there are
+    #   none.
+    goal: Goal
+    states: int
+    solve_time: float
+    _solutions: Dict[Tuple[bytes, int], Tuple[int, Move]]
+    _most_turns: int
+
+    def __init__(self, goal: Goal) -> None:
+        """Initialize this solver for <goal>.
+        """
+        self.goal = goal
+        self.states = 0
+        self.solve_time = 0.0
+        self._solutions = {}
+        self._most_turns = 0
+
+    def __len__(self) -> int:
+        """Return the number of positions that this solver has solved.
+        """
+        return len(self._solutions)
+
+    def solve(self, board: Block, turns_left: int) -> Tuple[int, Move]:
+        """Return the value of <board> with <turns_left> turns left, and the
+        best move on it.
+
+        The best move is a pass if no sequence of moves beats the current
+        score. Of two moves with the same value, the one that comes first in
+        legal_moves on the canonical board is returned.
+
+        Solutions for more than <turns_left> turns left are forgotten.
+
+        Precondition: turns_left >= 1
+
+        This function does not mutate <board>.
+        """
+        if turns_left < self._most_turns:
+            self._solutions = {key: solution for key, solution
+                               in self._solutions.items()
+                               if key[1] <= turns_left}
+        self._most_turns = turns_left
+
+        start, symmetry = canonical_encoding(encode_board(board))
+        if (start, turns_left) not in self._solutions:
+            self._solve(board, start, symmetry, turns_left)
+
+        value, move = self._solutions[(start, turns_left)]
+        return value, transform_move(move, inverse_symmetry(symmetry))
+
+    def _solve(self, board: Block, start: bytes, symmetry: int,
+               turns_left: int) -> None:
+        """Solve the position of <board>, whose canonical form <start> is its
+        image under symmetry <symmetry>, with <turns_left> turns left, and
+        every position reachable from it with fewer turns left.
+        """
+        start_time = time.perf_counter()
+
+        # The boards found by the search, by canonical form, each with the
+        # symmetry that maps it to its canonical form; the fewest moves each
+        # was found after; and for each board that was expanded, the move on
+        # the canonical board, penalty and resulting board of each of its
+        # moves.
+        boards = {start: (board, symmetry)}
+        depths = {start: 0}
+        edges = {}
+        layer = [start]
+        for depth in range(turns_left):
+            next_layer = []
+            for key in layer:
+                edges[key] = self._expand(boards[key], boards, depths,
+                                          depth + 1, next_layer)
+            layer = next_layer
+        self.states += len(boards)
+
+        values = {key: self.goal.score(boards[key][0]) for key in boards}
+        for turns in range(1, turns_left + 1):
+            new_values = {}
+            for key in edges:
+                if depths[key] > turns_left - turns:
+                    continue
+                best_value = values[key]
+                best_move = create_move(PASS, ROOT_PATH)
+                for move, penalty, child in edges[key]:
+                    value = values[child] - penalty
+                    if value > best_value:
+                        best_value = value
+                        best_move = move
+                new_values[key] = best_value
+                self._solutions[(key, turns)] = (best_value, best_move)
+            values = new_values
+
+        self.solve_time += time.perf_counter() - start_time
+
+    def _expand(self, found: Tuple[Block, int],
+                boards: Dict[bytes, Tuple[Block, int]],
+                depths: Dict[bytes, int], depth: int,
+                next_layer: List[bytes]) -> List[Tuple[Move, int, bytes]]:
+        """Return the move, penalty and canonical form of the resulting board
+        of each move other than a smash or a pass on the board of <found>,
+        which is a board and the symmetry that maps it to its canonical form.
+        The moves are given as moves on the canonical board.
+
+        Each resulting board whose canonical form is not yet in <boards> is
+        added to it with its symmetry, to <depths> at <depth>, and to
+        <next_layer>.
+        """
+        board, symmetry = found
+        result = []
+        for move in legal_moves(board, self.goal.colour):
+            action = (move[0], move[1])
+            if action == SMASH:
+                continue
+            child = board.create_copy()
+            apply_move(child, move, self.goal.colour)
+            child_key, child_symmetry = canonical_encoding(
+                encode_board(child))
+            if child_key not in depths:
+                boards[child_key] = (child, child_symmetry)
+                depths[child_key] = depth
+                next_layer.append(child_key)
+            result.append((transform_move(move, symmetry),
+                           ACTION_PENALTY[action], child_key))
+        return result
+
+    def entries(self) -> Dict[bytes, Move]:
+        """Return a dictionary mapping the endgame_key of each position that
+        this solver has solved to its best move.
+        """
+        return {endgame_key(position, self.goal, turns): solution[1]
+                for (position, turns), solution in self._solutions.items()}
+
+    def report(self) -> str:
+        """Return a one-line summary of the work this solver has done.
+        """
+        return f'Endgame solver: {len(self)} positions solved, ' \
+               f'{self.states} boards searched in {self.solve_time:.2f}s'
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(config={
+        'allowed-import-modules': [
+            'doctest', 'python_ta', 'typing', '__future__', 'time', 'actions',
+            'block', 'book', 'goal', 'moves', 'symmetry'
+        ]
+    })
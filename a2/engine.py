@@ -0,0 +1,577 @@
+"""CSC148 Assignment 2
+
+=== CSC148 Winter 2020 ===
+Department of Computer Science,
+University of Toronto
+
+This code is provided solely for the personal and private use of
+students taking the CSC148 course at the University of Toronto.
+Copying for purposes other than this use is expressly prohibited.
+All forms of distribution of this code, whether as given or with
+any changes, are expressly prohibited.
+
+Authors: Diane Horton, David Liu, Mario Badr, Sophia Huynh, Misha Schwartz,
+and Jaisie Sin
+
+All of the files in this directory and all subdirectories are:
+Copyright (c) Diane Horton, David Liu, Mario Badr, Sophia Huynh,
+Misha Schwartz, and Jaisie Sin.
+
+=== Module Description ===
+
+This file contains the headless engine for the Blocky game: the data of a game
+and the rules for playing its turns, with no display, no events and no
+animations. It does not need pygame.
+
+The interactive game in blocky.py plays its turns through the engine too, so a
+game seed gives the same game, and the same scores, either way.
+
+A game can be saved to a checkpoint file and resumed from it later. The
+checkpoint starts with CHECKPOINT_MAGIC, and holds the turn, the state of
+every random.Random the game draws from, the board as encoded by
+encode_board, and each player's type, goal, counts of smashes, combines and
+paints, and search history (see SearchMemory). The caches are not kept, since
+they only save time, so a resumed game plays exactly the moves the original
+game would have played. All numbers are little-endian.
+"""
+from __future__ import annotations
+from typing import Dict, List, Optional, Tuple
+import os
+import random
+import struct
+import time
+
+from actions import SMASH, PASS, PAINT, COMBINE, ACTION_PENALTY
+from block import Block, decode_board, encode_board, generate_board
+from book import GOAL_TYPES, open_book
+from evaluation import EvaluationCache
+from goal import BlobGoal, PerimeterGoal
+from moves import MOVE_ACTIONS, Move, apply_move, block_at_path, path_region
+from player import BeamPlayer, ComputerPlayer, HumanPlayer, Player, \
+    RandomPlayer, SmartPlayer, create_players
+from profiling import StateProfiler
+from record import GameRecorder
+from seeds import BOARD_STREAM, SEED_LIMIT, SMASH_STREAM, make_rng
+from settings import BOARD_SIZE, COLOUR_LIST
+from stats import PhaseStats
+
+# The first bytes of every checkpoint file.
+CHECKPOINT_MAGIC = b'BLKYCKP1'
+
+# The player types, in the order used in checkpoints.
+PLAYER_TYPES = ['HumanPlayer', 'RandomPlayer', 'SmartPlayer', 'BeamPlayer']
+
+# Whether there is a seed, the seed, max_turns, turn, current_player_index,
+# checkpoint_every, and the number of players.
+_CHECKPOINT = struct.Struct('<BQIIIIB')
+# The Mersenne Twister state of a random.Random, whether it has a saved gauss
+# value, and that value.
+_RNG_STATE = struct.Struct('<625IBd')
+# A player's type, its difficulty or beam width and depth, the indices of its
+# goal's type and colour, its counts of smashes, combines and paints, and the
+# number of search history entries that follow.
+_PLAYER = struct.Struct('<BIIBBIIIH')
+# The index in MOVE_ACTIONS of an action, a level, and the history's gain.
+_HISTORY = struct.Struct('<BBd')
+# The length of the path of the game's record, the size of the record, and
+# its snapshot_every. The path follows.
+_RECORD = struct.Struct('<HQI')
+
+
+class GameData:
+    """
+    A bundle of the data needed for a Blocky game.
+
+    === Public Attributes ===
+    max_turns:
+        The maximum number of turns for the game.
+    board:
+        The Blocky board on which this game will be played.
+    players:
+        The entities that are playing this game.
+    scores:
+        The score for each player's goal on the board, by player ID. The
+        score for a local goal (see Goal.is_local) is kept up to date as moves
+        are done. The score for any other goal is only brought up to date by
+        calculate_score, so the whole board is scored at most once for each
+        time it changes, and not at all if the score is never asked for.
+    smashes:
+        The number of smashes done by each player.
+    combines:
+        The number of combines done by each player.
+    paints:
+        The number of paints done by each player.
+    eval_cache:
+        The evaluation cache shared by all of the players. It ages by one
+        generation every time the board changes.
+    seed:
+        The game seed that the board, the goals and the players were seeded
+        from, or None if they were not seeded.
+    rng:
+        The source of the outcomes of the smashes done on the board. The
+        players never draw from it.
+    turn:
+        The current turn. A turn is over once every player has moved.
+    current_player_index:
+        The index in players of the player whose move it is.
+    record:
+        The recorder that every move tried in this game is written to, or None
+        if the game is not recorded.
+    checkpoint_path:
+        The file that this game is saved to every checkpoint_every turns, or
+        None if it is not saved.
+    checkpoint_every:
+        The number of turns between checkpoints.
+    stats:
+        The timings of the phases of this game, or None if it is not being
+        timed.
+    profiler:
+        The profiler of the game states and players of this game, or None if
+        it cannot be profiled.
+    turbo:
+        Whether this game is being fast-forwarded, so that computer players
+        move without waiting for a click and their moves are not animated.
+
+    === Representation Invariants ===
+    - len(players) >= 1
+    - 0 <= current_player_index < len(players)
+    - checkpoint_every >= 1
+    """
+    max_turns: int
+    board: Block
+    players: List[Player]
+    scores: Dict[int, int]
+    smashes: Dict[int, int]
+    combines: Dict[int, int]
+    paints: Dict[int, int]
+    eval_cache: EvaluationCache
+    seed: Optional[int]
+    rng: random.Random
+    turn: int
+    current_player_index: int
+    record: Optional[GameRecorder]
+    checkpoint_path: Optional[str]
+    checkpoint_every: int
+    stats: Optional[PhaseStats]
+    profiler: Optional[StateProfiler]
+    turbo: bool
+    # === Private Attributes ===
+    # _scored_versions:
+    #   A dictionary mapping the ID of each player whose goal is not local to
+    #   the version of the board that its entry in scores is for.
+    _scored_versions: Dict[int, int]
+
+    def __init__(self, board: Block, players: List[Player],
+                 seed: Optional[int] = None) -> None:
+        """Initialize the game data, saving a reference to <board> and
+        <players>.
+
+        If <seed> is not None, it is the game seed, and the outcomes of smashes
+        are seeded from it.
+
+        Precondition:
+            - len(players) >= 1
+        """
+        self.max_turns = 0
+        self.board = board
+        self.players = players
+        self.turn = 0
+        self.current_player_index = 0
+        self.record = None
+        self.checkpoint_path = None
+        self.checkpoint_every = 10
+        self.stats = None
+        self.profiler = None
+        self.turbo = False
+
+        self.scores = {}
+        self._scored_versions = {}
+        self.smashes = {}
+        self.combines = {}
+        self.paints = {}
+        self.eval_cache = EvaluationCache()
+        self.seed = seed
+        if seed is None:
+            self.rng = random.Random()
+        else:
+            self.rng = make_rng(seed, SMASH_STREAM)
+
+        # Start off all counts at 0
+        for player in players:
+            self.scores[player.id] = player.goal.score(board)
+            if not player.goal.is_local():
+                self._scored_versions[player.id] = board.version()
+            self.smashes[player.id] = 0
+            self.combines[player.id] = 0
+            self.paints[player.id] = 0
+            player.cache = self.eval_cache
+
+    def calculate_score(self, player_id: int) -> Tuple[int, int]:
+        """Return a tuple containing first the <player_id>'s score based on
+        their goal in the game and second the deductions from their score based
+        on the actions they've taken.
+        """
+        if player_id in self._scored_versions and \
+                self._scored_versions[player_id] != self.board.version():
+            self.scores[player_id] = \
+                self.players[player_id].goal.score(self.board)
+            self._scored_versions[player_id] = self.board.version()
+        goal_score = self.scores[player_id]
+
+        return goal_score, self._penalty(player_id)
+
+    def _penalty(self, player_id: int) -> int:
+        """Return the deductions from <player_id>'s score based on the actions
+        they've taken.
+        """
+        return self.smashes[player_id] * ACTION_PENALTY[SMASH] + \
+            self.combines[player_id] * ACTION_PENALTY[COMBINE] + \
+            self.paints[player_id] * ACTION_PENALTY[PAINT]
+
+    def current_player(self) -> Player:
+        """Return the player whose move it is.
+        """
+        return self.players[self.current_player_index]
+
+    def is_over(self) -> bool:
+        """Return True iff every turn of this game has been played.
+        """
+        return self.turn >= self.max_turns
+
+    def start_move(self) -> Player:
+        """Return the player whose move it is, after telling them how many
+        turns they have left and their penalty so far.
+        """
+        player = self.current_player()
+        player.turns_left = self.max_turns - self.turn
+        player.penalty = self._penalty(player.id)
+        return player
+
+    def do_move(self, move: Move) -> bool:
+        """Attempt to do <move> for the player whose move it is.
+
+        Return True iff the move was performed, in which case it becomes the
+        next player's move.
+        """
+        action = (move[0], move[1])
+        player = self.current_player()
+
+        # A move only changes its block, so the score for a local goal changes
+        # by the change in what that block adds to it.
+        block = block_at_path(self.board, move[2])
+        local_scores = {}
+        if block is not None and action != PASS:
+            col, row, _ = path_region(move[2], self.board.max_depth)
+            for p in self.players:
+                if p.goal.is_local():
+                    local_scores[p.id] = p.goal.region_score(block, col, row)
+
+        move_successful = apply_move(self.board, move, player.goal.colour,
+                                     self.rng)
+
+        if action == SMASH:
+            self.smashes[player.id] += int(move_successful)
+        elif action == PAINT:
+            self.paints[player.id] += int(move_successful)
+        elif action == COMBINE:
+            self.combines[player.id] += int(move_successful)
+
+        if self.record is not None:
+            outcome = b''
+            if action == SMASH and move_successful:
+                outcome = encode_board(block_at_path(self.board, move[2]))
+            self.record.record_move(player.id, move, move_successful, outcome)
+
+        if move_successful:
+            if action != PASS:
+                self.eval_cache.advance()
+                for p in self.players:
+                    if p.id in local_scores:
+                        self.scores[p.id] += p.goal.region_score(
+                            block, col, row) - local_scores[p.id]
+            self.current_player_index = (self.current_player_index + 1) % \
+                len(self.players)
+            if self.current_player_index == 0:
+                self.turn += 1
+                if self.record is not None:
+                    self.record.record_turn(self.turn, self.board, [
+                        (self.smashes[p.id], self.combines[p.id],
+                         self.paints[p.id]) for p in self.players])
+                if self.checkpoint_path is not None and \
+                        self.turn % self.checkpoint_every == 0:
+                    self.save_checkpoint(self.checkpoint_path)
+                if self.is_over():
+                    self.close()
+
+        return move_successful
+
+    def close(self) -> None:
+        """Close the record of this game, if it is recorded.
+
+        This is done when the last turn of the game ends, and should be done
+        by anything that stops the game before then.
+        """
+        if self.record is not None:
+            self.record.close()
+
+    def save_checkpoint(self, path: str) -> None:
+        """Save everything needed to resume this game to the file at <path>.
+
+        The checkpoint is written to a temporary file that then replaces
+        <path>, so if saving is cut short the last checkpoint is still whole.
+
+        Raise ValueError if one of the players is not of a type in
+        PLAYER_TYPES, such as a SubprocessPlayer, whose engine cannot be saved.
+        """
+        for player in self.players:
+            if type(player).__name__ not in PLAYER_TYPES:
+                raise ValueError(f'Player {player.id} cannot be saved')
+        data = bytearray(CHECKPOINT_MAGIC)
+        data += _CHECKPOINT.pack(int(self.seed is not None), self.seed or 0,
+                                 self.max_turns, self.turn,
+                                 self.current_player_index,
+                                 self.checkpoint_every, len(self.players))
+        data += _pack_rng(self.rng)
+        for player in self.players:
+            memory = player.search_memory()
+            history = {} if memory is None else memory.history
+            if isinstance(player, SmartPlayer):
+                parameters = (player.difficulty, 0)
+            elif isinstance(player, BeamPlayer):
+                parameters = (player.width, player.depth)
+            else:
+                parameters = (0, 0)
+            data += _PLAYER.pack(
+                PLAYER_TYPES.index(type(player).__name__), *parameters,
+                GOAL_TYPES.index(type(player.goal).__name__),
+                COLOUR_LIST.index(player.goal.colour),
+                self.smashes[player.id], self.combines[player.id],
+                self.paints[player.id], len(history))
+            data += _pack_rng(player.rng)
+            for (action, level), gain in history.items():
+                data += _HISTORY.pack(MOVE_ACTIONS.index(action), level, gain)
+
+        board = encode_board(self.board)
+        data += len(board).to_bytes(4, 'little') + board
+        if self.record is None:
+            data += _RECORD.pack(0, 0, 0)
+        else:
+            record_path = self.record.path.encode('utf-8')
+            data += _RECORD.pack(len(record_path), self.record.size(),
+                                 self.record.snapshot_every) + record_path
+
+        temp_path = path + '.tmp'
+        with open(temp_path, 'wb') as checkpoint_file:
+            checkpoint_file.write(data)
+        os.replace(temp_path, path)
+
+    def final_scores(self) -> List[Tuple[int, int, int]]:
+        """Return the player ID, goal score and penalty of each player, in the
+        order of players.
+        """
+        scores = []
+        for player in self.players:
+            goal_score, penalty = self.calculate_score(player.id)
+            scores.append((player.id, goal_score, penalty))
+        return scores
+
+
+def _pack_rng(rng: random.Random) -> bytes:
+    """Return the state of <rng> packed for a checkpoint.
+    """
+    _, internal, gauss = rng.getstate()
+    return _RNG_STATE.pack(*internal, int(gauss is not None), gauss or 0.0)
+
+
+def _unpack_rng(rng: random.Random, data: bytes, offset: int) -> int:
+    """Set the state of <rng> to the state packed at <offset> in <data>, and
+    return the offset just after it.
+    """
+    values = _RNG_STATE.unpack_from(data, offset)
+    rng.setstate((3, values[:625], values[626] if values[625] else None))
+    return offset + _RNG_STATE.size
+
+
+def load_checkpoint(path: str, book_path: Optional[str] = None,
+                    endgame_path: Optional[str] = None) -> GameData:
+    """Return the game saved in the checkpoint at <path>, which plays on
+    exactly as the saved game would have.
+
+    <book_path> and <endgame_path> are as for setup_game. A game that was
+    recorded goes on being recorded to the same file.
+
+    Raise ValueError if the file is not a checkpoint.
+    """
+    with open(path, 'rb') as checkpoint_file:
+        data = checkpoint_file.read()
+    if data[:len(CHECKPOINT_MAGIC)] != CHECKPOINT_MAGIC:
+        raise ValueError(f'{path} is not a checkpoint')
+    offset = len(CHECKPOINT_MAGIC)
+    has_seed, seed, max_turns, turn, current_player_index, \
+        checkpoint_every, num_players = _CHECKPOINT.unpack_from(data, offset)
+    offset += _CHECKPOINT.size
+    smash_rng = random.Random()
+    offset = _unpack_rng(smash_rng, data, offset)
+
+    players = []
+    counts = []
+    for player_id in range(num_players):
+        player_type, first, second, goal_type, colour, smashes, combines, \
+            paints, history_size = _PLAYER.unpack_from(data, offset)
+        offset += _PLAYER.size
+        goal = [PerimeterGoal, BlobGoal][goal_type](COLOUR_LIST[colour])
+        if PLAYER_TYPES[player_type] == 'HumanPlayer':
+            player = HumanPlayer(player_id, goal)
+        elif PLAYER_TYPES[player_type] == 'RandomPlayer':
+            player = RandomPlayer(player_id, goal)
+        elif PLAYER_TYPES[player_type] == 'SmartPlayer':
+            player = SmartPlayer(player_id, goal, first)
+        else:
+            player = BeamPlayer(player_id, goal, first, second)
+        offset = _unpack_rng(player.rng, data, offset)
+        for _ in range(history_size):
+            action, level, gain = _HISTORY.unpack_from(data, offset)
+            offset += _HISTORY.size
+            player.search_memory().history[(MOVE_ACTIONS[action], level)] = \
+                gain
+        players.append(player)
+        counts.append((smashes, combines, paints))
+
+    length = int.from_bytes(data[offset:offset + 4], 'little')
+    board = decode_board(data[offset + 4:offset + 4 + length], BOARD_SIZE)
+    offset += 4 + length
+    path_length, record_size, snapshot_every = _RECORD.unpack_from(data,
+                                                                   offset)
+    offset += _RECORD.size
+    record_path = data[offset:offset + path_length].decode('utf-8')
+
+    _open_tables(players, book_path, endgame_path)
+    game = GameData(board, players, seed if has_seed else None)
+    game.rng = smash_rng
+    game.max_turns = max_turns
+    game.turn = turn
+    game.current_player_index = current_player_index
+    game.checkpoint_every = checkpoint_every
+    for player, (smashes, combines, paints) in zip(players, counts):
+        game.smashes[player.id] = smashes
+        game.combines[player.id] = combines
+        game.paints[player.id] = paints
+    if record_path:
+        game.record = GameRecorder(record_path, board, [], None,
+                                   snapshot_every, record_size)
+    return game
+
+
+def _open_tables(players: List[Player], book_path: Optional[str],
+                 endgame_path: Optional[str]) -> None:
+    """Give each of <players> the opening book at <book_path> and the endgame
+    table at <endgame_path>, where either path may be None.
+    """
+    if book_path is not None:
+        book = open_book(book_path)
+        for player in players:
+            player.book = book
+    if endgame_path is not None:
+        table = open_book(endgame_path)
+        for player in players:
+            player.endgame = table
+
+
+def winner(scores: List[Tuple[int, int, int]]) -> int:
+    """Return the ID of the winning player, given the <scores> returned by
+    GameData.final_scores. Of players with the same score, the first wins.
+    """
+    return max(scores, key=lambda item: item[1] - item[2])[0]
+
+
+def setup_game(max_depth: int, num_human: int, num_random: int,
+               smart_players: List[int],
+               beam_players: Optional[List[Tuple[int, int]]] = None,
+               seed: Optional[int] = None, book_path: Optional[str] = None,
+               endgame_path: Optional[str] = None,
+               record_path: Optional[str] = None,
+               engine_players: Optional[List[str]] = None) -> GameData:
+    """Return the data of a new game, as described in Game.__init__.
+
+    <engine_players> is a list of the commands of the engines of each
+    SubprocessPlayer in the game, who play after all the other players.
+
+    Raise ValueError if <seed> is not None and is not at least 0 and less than
+    SEED_LIMIT.
+    """
+    if seed is None:
+        seed = random.getrandbits(64)
+    elif not 0 <= seed < SEED_LIMIT:
+        raise ValueError(f'The seed must be at least 0 and less than '
+                         f'{SEED_LIMIT}')
+    board = generate_board(max_depth, BOARD_SIZE, make_rng(seed, BOARD_STREAM))
+    players = create_players(num_human, num_random, smart_players,
+                             beam_players, seed, engine_players)
+    _open_tables(players, book_path, endgame_path)
+
+    data = GameData(board, players, seed)
+    if record_path is not None:
+        data.record = GameRecorder(record_path, board,
+                                   [player.goal for player in players], seed)
+    return data
+
+
+def run_game(data: GameData, num_turns: int,
+             move_times: Optional[Dict[int, List[float]]] = None) \
+        -> List[Tuple[int, int, int]]:
+    """Play the game of <data> for <num_turns> turns as fast as possible, and
+    return its final scores as GameData.final_scores does.
+
+    If <move_times> is not None, the number of seconds each player took to
+    choose each of its moves is appended to the list for its ID. If the game
+    has stats, choosing and doing moves are timed in them too.
+
+    Raise ValueError if one of the players is not a ComputerPlayer.
+    """
+    for player in data.players:
+        if not isinstance(player, ComputerPlayer):
+            raise ValueError(f'Player {player.id} is not a computer player')
+
+    data.max_turns = num_turns
+    while not data.is_over():
+        player = data.start_move()
+        start = time.perf_counter()
+        move = player.choose_move(data.board)
+        chosen = time.perf_counter()
+        if move_times is not None:
+            move_times.setdefault(player.id, []).append(chosen - start)
+        # A move that cannot be done is tried again, as in the interactive
+        # game.
+        data.do_move(move)
+        if data.stats is not None:
+            data.stats.add(f'choose_move player {player.id}', chosen - start)
+            data.stats.add('do_move', time.perf_counter() - chosen)
+
+    return data.final_scores()
+
+
+def play_game(max_depth: int, num_random: int, smart_players: List[int],
+              num_turns: int,
+              beam_players: Optional[List[Tuple[int, int]]] = None,
+              seed: Optional[int] = None) -> List[Tuple[int, int, int]]:
+    """Play a whole game between computer players with no display, and return
+    its final scores as GameData.final_scores does.
+
+    The players are as described in Game.__init__, and the game gives the same
+    scores as a Game with the same arguments.
+    """
+    data = setup_game(max_depth, 0, num_random, smart_players, beam_players,
+                      seed)
+    return run_game(data, num_turns)
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(config={
+        'allowed-import-modules': [
+            'doctest', 'python_ta', 'os', 'random', 'struct', 'time', 'typing',
+            '__future__', 'actions', 'block', 'book', 'evaluation', 'goal',
+            'moves', 'player', 'profiling', 'record', 'seeds', 'settings',
+            'stats'
+        ]
+    })
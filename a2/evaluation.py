@@ -0,0 +1,329 @@
+"""CSC148 Assignment 2
+
+=== CSC148 Winter 2020 ===
+Department of Computer Science,
+University of Toronto
+
+This code is provided solely for the personal and private use of
+students taking the CSC148 course at the University of Toronto.
+Copying for purposes other than this use is expressly prohibited.
+All forms of distribution of this code, whether as given or with
+any changes, are expressly prohibited.
+
+Authors: Diane Horton, David Liu, Mario Badr, Sophia Huynh, Misha Schwartz,
+and Jaisie Sin
+
+All of the files in this directory and all subdirectories are:
+Copyright (c) Diane Horton, David Liu, Mario Badr, Sophia Huynh,
+Misha Schwartz, and Jaisie Sin.
+
+=== Module Description ===
+
+This file contains the cache of move results and scores that the computer
+players of a game share, and the memory that each computer player keeps from
+one turn to the next.
+"""
+from __future__ import annotations
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from actions import PAINT, SMASH
+from goal import Goal
+from moves import Move, pack_move
+from settings import COLOUR_LIST
+from symmetry import canonical_encoding, transform_move
+
+# The result stored for a move that could not be performed.
+ILLEGAL = b''
+
+
+def goal_key(goal: Goal) -> Tuple[str, Tuple[int, int, int]]:
+    """Return a key that is the same for any two goals that always give the
+    same score.
+    """
+    return type(goal).__name__, goal.colour
+
+
+class EvaluationCache:
+    """A cache of the boards that moves lead to and of the scores of boards,
+    shared by every computer player in a game.
+
+    Boards are named by their encode_board encoding. The result of a move is
+    the encoding of the board after doing the move on a board, or ILLEGAL if
+    the move could not be done. Smashes are random, so their results are
+    never stored.
+
+    Every board in a symmetry class (see the symmetry module) has the same
+    scores, so entries are stored under the class's canonical form, with moves
+    mapped to match. One entry then serves all 8 boards in the class. The
+    results that are returned are canonical forms too.
+
+    Entries age as the real board changes: each call to advance starts a new
+    generation, and entries that have not been used in the last <max_age>
+    generations are dropped.
+
+    === Public Attributes ===
+    max_age:
+        The number of generations an unused entry is kept for.
+    hits:
+        The number of lookups that found an entry.
+    misses:
+        The number of lookups that did not.
+
+    === Representation Invariants ===
+    - max_age >= 1
+    - 1 <= len(_results) == len(_scores) <= max_age
+    """
+    # === Private Attributes ===
+    # _results:
+    #   For each generation, newest first, a dictionary mapping a _move_key to
+    #   the canonical form of the result of that move.
+    # _scores:
+    #   For each generation, newest first, a dictionary mapping the canonical
+    #   form of a board and a goal_key to the score for that goal on that
+    #   board.
+    max_age: int
+    hits: int
+    misses: int
+    _results: List[Dict[Tuple[bytes, int, int], bytes]]
+    _scores: List[Dict[Tuple[bytes, Tuple[str, Tuple[int, int, int]]], int]]
+
+    def __init__(self, max_age: int = 2) -> None:
+        """Initialize this cache to keep unused entries for <max_age>
+        generations.
+        """
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self._results = [{}]
+        self._scores = [{}]
+
+    def _lookup(self, generations: List[Dict], key: object) -> object:
+        """Return the value for <key> in the newest of <generations> that has
+        one, or None if none does.
+
+        An entry found in an older generation is copied into the newest one, so
+        that it is kept for as long as it is being used.
+        """
+        for generation in generations:
+            if key in generation:
+                self.hits += 1
+                value = generation[key]
+                generations[0][key] = value
+                return value
+        self.misses += 1
+        return None
+
+    def _move_key(self, board: bytes, move: Move,
+                  colour: Tuple[int, int, int]) -> Tuple[bytes, int, int]:
+        """Return the key of the result of <move> on <board> by a player whose
+        goal has <colour>.
+
+        The key names the canonical form of <board>, and the move that does the
+        same thing on it as <move> does on <board>. Only paints depend on the
+        colour, so other moves share one key for every player.
+        """
+        board, symmetry = canonical_encoding(board)
+        move = transform_move(move, symmetry)
+        if (move[0], move[1]) == PAINT:
+            return board, pack_move(move), COLOUR_LIST.index(colour)
+        return board, pack_move(move), -1
+
+    def result(self, board: bytes, move: Move,
+               colour: Tuple[int, int, int]) -> Optional[bytes]:
+        """Return the canonical form of the stored result of <move> on <board>
+        by a player whose goal has <colour>, ILLEGAL if the move could not be
+        done, or None if there is no stored result.
+        """
+        return self._lookup(self._results, self._move_key(board, move, colour))
+
+    def store_result(self, board: bytes, move: Move,
+                     colour: Tuple[int, int, int], result: bytes) -> None:
+        """Store <result> as the result of <move> on <board> by a player whose
+        goal has <colour>.
+
+        Precondition: <move> is not a smash.
+        """
+        assert (move[0], move[1]) != SMASH
+        if result != ILLEGAL:
+            result = canonical_encoding(result)[0]
+        self._results[0][self._move_key(board, move, colour)] = result
+
+    def score(self, board: bytes, goal: Goal) -> Optional[int]:
+        """Return the stored score for <goal> on <board>, or None if there is
+        none.
+        """
+        return self._lookup(self._scores, (canonical_encoding(board)[0],
+                                           goal_key(goal)))
+
+    def store_score(self, board: bytes, goal: Goal, score: int) -> None:
+        """Store <score> as the score for <goal> on <board>.
+        """
+        self._scores[0][(canonical_encoding(board)[0], goal_key(goal))] = score
+
+    def advance(self) -> None:
+        """Start a new generation, dropping the entries that have now gone
+        unused for max_age generations.
+        """
+        self._results.insert(0, {})
+        self._scores.insert(0, {})
+        del self._results[self.max_age:]
+        del self._scores[self.max_age:]
+
+    def __len__(self) -> int:
+        """Return the number of entries in this cache, counting an entry once
+        for each generation that holds it.
+        """
+        return sum(len(generation) for generation in self._results) + \
+            sum(len(generation) for generation in self._scores)
+
+    def hit_rate(self) -> float:
+        """Return the fraction of lookups that found an entry, or 0.0 if there
+        have been no lookups.
+        """
+        lookups = self.hits + self.misses
+        if lookups == 0:
+            return 0.0
+        return self.hits / lookups
+
+    def report(self) -> str:
+        """Return a one-line summary of how well this cache has done.
+        """
+        return f'Evaluation cache: {self.hits} hits, {self.misses} misses ' \
+               f'({self.hit_rate():.0%})'
+
+
+class SearchMemory:
+    """What a computer player remembers of its searches from one turn to the
+    next.
+
+    The history table records, for each kind of move and level of block, how
+    much moves like that have raised the player's score. It is halved at the
+    start of every turn, so recent turns count the most, and entries that
+    fade to nothing are dropped.
+
+    The player's goal may be local (see Goal.is_local), in which case the
+    change a move makes to the score depends only on the block it acts on.
+    The memory then also stores that change against the move and the
+    encode_board encoding of the block. The change is still right on a later
+    turn as long as the block itself has not changed, even if the rest of
+    the board has. At most <capacity> changes are stored, and the least
+    recently used ones are dropped first.
+
+    === Public Attributes ===
+    capacity:
+        The most score changes that are stored at once.
+    history:
+        A dictionary mapping an action and a level to how much moves of that
+        action on blocks at that level have recently raised the score.
+    hits:
+        The number of lookups that found a stored score change.
+    misses:
+        The number of lookups that did not.
+
+    === Representation Invariants ===
+    - capacity >= 0
+    - len(_deltas) <= capacity
+    - every value in history is > 0
+    """
+    # === Private Attributes ===
+    # _deltas:
+    #   An ordered dictionary mapping a packed move to the encoding of the
+    #   block it acts on and the change it makes to the score, from least to
+    #   most recently used.
+    capacity: int
+    history: Dict[Tuple[Tuple[str, Optional[int]], int], float]
+    hits: int
+    misses: int
+    _deltas: OrderedDict
+
+    def __init__(self, capacity: int = 10000) -> None:
+        """Initialize this memory to store at most <capacity> score changes.
+        """
+        self.capacity = capacity
+        self.history = {}
+        self.hits = 0
+        self.misses = 0
+        self._deltas = OrderedDict()
+
+    def start_turn(self) -> None:
+        """Age the history table at the start of a new turn.
+        """
+        for key in list(self.history):
+            self.history[key] /= 2
+            if self.history[key] < 0.01:
+                del self.history[key]
+
+    def record(self, action: Tuple[str, Optional[int]], level: int,
+               gain: int) -> None:
+        """Record that a move of <action> on a block at <level> changed the
+        score by <gain>.
+        """
+        if gain > 0:
+            key = (action, level)
+            self.history[key] = self.history.get(key, 0.0) + gain
+
+    def priority(self, action: Tuple[str, Optional[int]], level: int) \
+            -> float:
+        """Return how much moves of <action> on blocks at <level> have recently
+        raised the score.
+        """
+        return self.history.get((action, level), 0.0)
+
+    def action_weight(self, action: Tuple[str, Optional[int]]) -> float:
+        """Return the weight with which moves of <action> should be sampled.
+
+        Every action keeps a weight of at least 1, so none is ever ruled out.
+        """
+        weight = 1.0
+        for key, gain in self.history.items():
+            if key[0] == action:
+                weight += gain
+        return weight
+
+    def level_weight(self, level: int) -> float:
+        """Return the weight with which blocks at <level> should be sampled.
+
+        Every level keeps a weight of at least 1, so none is ever ruled out.
+        """
+        weight = 1.0
+        for key, gain in self.history.items():
+            if key[1] == level:
+                weight += gain
+        return weight
+
+    def delta(self, packed_move: int, block: bytes) -> Optional[int]:
+        """Return the stored change to the score of <packed_move> on a block
+        whose encoding is <block>, or None if there is none.
+        """
+        if packed_move in self._deltas and \
+                self._deltas[packed_move][0] == block:
+            self.hits += 1
+            self._deltas.move_to_end(packed_move)
+            return self._deltas[packed_move][1]
+        self.misses += 1
+        return None
+
+    def store_delta(self, packed_move: int, block: bytes, delta: int) -> None:
+        """Store <delta> as the change to the score of <packed_move> on a block
+        whose encoding is <block>.
+        """
+        self._deltas[packed_move] = (block, delta)
+        self._deltas.move_to_end(packed_move)
+        while len(self._deltas) > self.capacity:
+            self._deltas.popitem(last=False)
+
+    def __len__(self) -> int:
+        """Return the number of score changes stored in this memory.
+        """
+        return len(self._deltas)
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(config={
+        'allowed-import-modules': [
+            'doctest', 'python_ta', 'typing', '__future__', 'collections',
+            'actions', 'goal', 'moves', 'settings', 'symmetry'
+        ]
+    })
@@ -24,16 +24,43 @@ Please use this as a starting point to check your work and write your own
 tests!
 """
 from typing import List, Optional, Tuple
+import asyncio
+import json
 import os
+import pstats
+import random
+import shlex
+import sys
 import pygame
 import pytest
 
-from block import Block
-from blocky import _block_to_squares
-from goal import BlobGoal, PerimeterGoal, _flatten
-from player import _get_block
+from actions import ACTION_PENALTY, PAINT
+from batch import BoardBatch
+from block import Block, encode_board, generate_board
+from book import book_entry, open_book, write_book
+from endgame import EndgameSolver, endgame_key
+from engine import load_checkpoint, play_game, run_game, setup_game
+from blocky import AnimateMoveState, GameOverState, MainState, SquareCache, \
+    THINKING_SWITCH_INTERVAL, _block_to_squares
+from evaluation import ILLEGAL, EvaluationCache, SearchMemory
+from goal import BlobGoal, Goal, PerimeterGoal, _flatten
+from load_test import load_test
+from moves import MOVE_ACTIONS, ROOT_PATH, apply_move, block_at_path, \
+    cell_path, is_legal, legal_moves, path_region
+from player import ACTIONS, BeamPlayer, HumanPlayer, SmartPlayer, \
+    SubprocessPlayer, _get_block, _locate, create_players, get_random_path
+from profiling import StateProfiler
+from protocol import format_move, format_position, parse_move, \
+    parse_position
+from record import GameReplay
 from renderer import Renderer
+from seeds import BOARD_STREAM, SEED_LIMIT, SMASH_STREAM, make_rng
+from server import GameServer
 from settings import COLOUR_LIST
+from stats import PhaseStats
+from symmetry import SYMMETRIES, canonical_encoding, transform_encoding, \
+    transform_move
+from tournament import main as run_tournament, wilson_interval
 
 
 def set_children(block: Block, colours: List[Optional[Tuple[int, int, int]]]) \
@@ -205,6 +232,24 @@ class TestRender:
         renderer.draw_board(_block_to_squares(board_16x16))
         renderer.save_to_file('your-rotate-1.png')
 
+    def test_square_cache(self) -> None:
+        """Test that a SquareCache that is told of each move keeps the same
+        squares as _block_to_squares, and never changes a list it returned.
+        """
+        rng = random.Random(148)
+        board = generate_board(4, 750, rng)
+        cache = SquareCache(board)
+        for _ in range(100):
+            action = rng.choice(ACTIONS)
+            path = get_random_path(board, rng.randint(0, 4), rng)
+            before = cache.squares()
+            copy = list(before)
+            if apply_move(board, (action[0], action[1], path), COLOUR_LIST[0],
+                          rng):
+                cache.block_changed(path)
+            assert cache.squares() == _block_to_squares(board)
+            assert before == copy
+
 
 class TestBlock:
     """A collection of methods that test the Block class.
@@ -250,6 +295,21 @@ class TestBlock:
         board_16x16.swap(0)
         assert board_16x16 == board_16x16_swap0
 
+    def test_version(self) -> None:
+        """Test that changing any block of a board changes the board's version,
+        and that a copy of a board has a version of its own.
+        """
+        board = Block((0, 0), 750, COLOUR_LIST[0], 0, 2)
+        board.smash()
+        before = board.version()
+        copy = board.create_copy()
+        copy.children[0].rotate(1)
+        assert board.version() == before
+
+        assert board.children[3].swap(0) or board.children[3].smash()
+        assert board.version() > before
+        assert board.children[3].version() == board.version()
+
     def test_rotate1(self, board_16x16, board_16x16_rotate1) -> None:
         """Test that the top-right block of reference board on level 1 can be
         correctly rotated clockwise.
@@ -283,6 +343,655 @@ class TestPlayer:
         assert _get_block(board_16x16, top_right, 2) == \
             board_16x16.children[0].children[0]
 
+    def test_get_block_below_leaf(self, board_16x16) -> None:
+        """Test that asking for a level below a leaf returns that leaf.
+        """
+        assert _get_block(board_16x16, (0, 0), 2) is board_16x16.children[1]
+
+    def test_selection_cache(self, board_16x16, monkeypatch) -> None:
+        """Test that the selected block is only looked up again when the mouse
+        moves to another cell, the level changes or the board changes.
+        """
+        mouse = [(10, 10)]
+        calls = []
+
+        def locate(block: Block, location: Tuple[int, int],
+                   level: int) -> Tuple[Optional[Block], int]:
+            calls.append(location)
+            return _locate(block, location, level)
+
+        monkeypatch.setattr(pygame.mouse, 'get_pos', lambda: mouse[0])
+        monkeypatch.setattr('player._locate', locate)
+        player = HumanPlayer(0, BlobGoal(COLOUR_LIST[0]))
+        player.process_event(pygame.event.Event(
+            pygame.KEYDOWN, {'key': pygame.K_s}))
+
+        assert player.get_selected_block(board_16x16) is \
+            board_16x16.children[1]
+        mouse[0] = (300, 300)
+        assert player.get_selected_block(board_16x16) is \
+            board_16x16.children[1]
+        assert len(calls) == 1
+
+        mouse[0] = (500, 10)
+        assert player.get_selected_block(board_16x16) is \
+            board_16x16.children[0]
+        assert len(calls) == 2
+
+        board_copy = board_16x16.create_copy()
+        assert player.get_selected_block(board_copy) is board_copy.children[0]
+        assert len(calls) == 3
+
+        assert board_copy.swap(0)
+        assert player.get_selected_block(board_copy) is board_copy.children[0]
+        assert len(calls) == 4
+
+    def test_seeded_game(self) -> None:
+        """Test that the same game seed reproduces a whole game, and that the
+        random choices of one player do not change those of another.
+        """
+        def play(seed: int) -> List[Tuple]:
+            """Play a short game seeded by <seed>, and return the board, goals
+            and moves made.
+            """
+            board = generate_board(3, 750, make_rng(seed, BOARD_STREAM))
+            players = create_players(0, 2, [3], seed=seed)
+            smash_rng = make_rng(seed, SMASH_STREAM)
+            moves = [encode_board(board)] + [p.goal.colour for p in players]
+            for _ in range(4):
+                for player in players:
+                    player._proceed = True
+                    move = player.generate_move(board)
+                    apply_move(board, move, player.goal.colour, smash_rng)
+                    moves.append((player.id, move))
+            return moves + [encode_board(board)]
+
+        assert play(148) == play(148)
+        assert play(148) != play(149)
+
+        players = create_players(0, 2, [], seed=148)
+        other_players = create_players(0, 2, [], seed=148)
+        players[0].rng.random()
+        assert players[1].rng.random() == other_players[1].rng.random()
+
+    def test_opening_book(self, board_16x16, tmp_path) -> None:
+        """Test that a player plays the move in its opening book, and searches
+        when the book has no move for its board.
+        """
+        goal = BlobGoal(COLOUR_LIST[1])
+        move = ('swap', 1, ROOT_PATH)
+        path = str(tmp_path / 'book.bin')
+        write_book(path, dict([book_entry(board_16x16, goal, move),
+                               book_entry(board_16x16,
+                                          BlobGoal(COLOUR_LIST[0]),
+                                          ('pass', None, ROOT_PATH))]))
+        book = open_book(path)
+        assert len(book) == 2
+        assert book.lookup(board_16x16, PerimeterGoal(COLOUR_LIST[1])) is None
+
+        player = SmartPlayer(0, goal, 1)
+        player.book = book
+        player._proceed = True
+        assert player.generate_move(board_16x16) == move
+        player._proceed = True
+        other_board = board_16x16.create_copy()
+        other_board.children[0].rotate(1)
+        assert player.generate_move(other_board) is not None
+        assert book.hits == 1 and book.misses == 2
+        book.close()
+
+        with open(path, 'wb') as book_file:
+            book_file.write(b'not a book')
+        assert open_book(path) is None
+        assert open_book(str(tmp_path / 'missing.bin')) is None
+
+
+class TestMoves:
+    """A collection of methods for testing the functions in the moves module.
+    """
+    def test_legal_moves(self, board_16x16) -> None:
+        """Test that every move legal_moves returns can be performed, and that
+        is_legal agrees.
+        """
+        moves = legal_moves(board_16x16, COLOUR_LIST[0])
+        assert ('rotate', 1, ROOT_PATH) in moves
+        for move in moves:
+            assert is_legal(board_16x16, move, COLOUR_LIST[0])
+            board_copy = board_16x16.create_copy()
+            assert apply_move(board_copy, move, COLOUR_LIST[0])
+
+    def test_beam_player(self, board_16x16) -> None:
+        """Test that a BeamPlayer chooses a move that can be performed, and
+        does not change the board while choosing it.
+        """
+        player = BeamPlayer(0, BlobGoal(COLOUR_LIST[1]), 3, 2)
+        player._proceed = True
+        board_copy = board_16x16.create_copy()
+        move = player.generate_move(board_16x16)
+        assert board_16x16 == board_copy
+        assert apply_move(board_16x16, move, COLOUR_LIST[1])
+
+    def test_smart_player_leaf_board(self) -> None:
+        """Test that a smart player still moves on a board that is a single
+        leaf, where the only legal move is a paint.
+        """
+        board = Block((0, 0), 750, COLOUR_LIST[1], 0, 0)
+        player = SmartPlayer(0, BlobGoal(COLOUR_LIST[0]), 5)
+        assert player.choose_move(board) == ('paint', None, ROOT_PATH)
+
+    def test_smart_player_pruning(self, monkeypatch) -> None:
+        """Test that skipping moves that cannot beat the best score so far does
+        not change the moves a SmartPlayer chooses, on its first turn or on
+        any later one.
+        """
+        for seed in range(20):
+            goal = [PerimeterGoal, BlobGoal][seed % 2](COLOUR_LIST[seed % 4])
+            chosen = []
+            for prune in [True, False]:
+                if not prune:
+                    monkeypatch.setattr(type(goal), 'delta_bound',
+                                        lambda *args: 750 ** 2)
+                board = generate_board(3, 750, random.Random(seed))
+                smash_rng = random.Random(seed)
+                player = SmartPlayer(0, goal, 10)
+                player.rng = random.Random(seed)
+                moves = []
+                for _ in range(10):
+                    moves.append(player.choose_move(board))
+                    apply_move(board, moves[-1], goal.colour, smash_rng)
+                chosen.append(moves)
+            monkeypatch.undo()
+            assert chosen[0] == chosen[1]
+
+
+class TestBoardBatch:
+    """A collection of methods for testing the BoardBatch class.
+    """
+    def test_same_as_blocks(self) -> None:
+        """Test that a batch does the same moves and gives the same scores as
+        the boards it was made from.
+        """
+        rng = random.Random(148)
+        boards = [generate_board(3, 750, random.Random(i)) for i in range(8)]
+        batch = BoardBatch([board.create_copy() for board in boards],
+                           [random.Random(i) for i in range(8)])
+        smash_rngs = [random.Random(i) for i in range(8)]
+        colours = [i % 4 for i in range(8)]
+        for _ in range(30):
+            action = rng.choice(ACTIONS)
+            paths = [get_random_path(board, rng.randint(0, 3), rng)
+                     for board in boards]
+            performed = batch.apply(action, paths, colours)
+            for i in range(8):
+                move = (action[0], action[1], paths[i])
+                assert performed[i] == apply_move(
+                    boards[i], move, COLOUR_LIST[colours[i]], smash_rngs[i])
+                assert batch.encoding(i) == encode_board(boards[i])
+
+            perimeter = batch.perimeter_scores(colours)
+            blob = batch.blob_scores(colours)
+            for i in range(8):
+                colour = COLOUR_LIST[colours[i]]
+                assert perimeter[i] == PerimeterGoal(colour).score(boards[i])
+                assert blob[i] == BlobGoal(colour).score(boards[i])
+
+
+class TestEndgameSolver:
+    """A collection of methods for testing the EndgameSolver class.
+    """
+    def test_solve(self, board_16x16, tmp_path) -> None:
+        """Test that the solver's value for one turn left is that of the best
+        single move, that more turns are never worth less, and that a player
+        plays the solver's move.
+        """
+        goal = BlobGoal(COLOUR_LIST[1])
+        best = goal.score(board_16x16)
+        for move in legal_moves(board_16x16, goal.colour):
+            if move[0] != 'smash':
+                board = board_16x16.create_copy()
+                apply_move(board, move, goal.colour)
+                penalty = int(move[0] in ['paint', 'combine'])
+                best = max(best, goal.score(board) - penalty)
+
+        solver = EndgameSolver(goal)
+        assert solver.solve(board_16x16, 1)[0] == best
+        value, move = solver.solve(board_16x16, 2)
+        assert value >= best
+        assert len(solver) >= 2
+
+        player = SmartPlayer(0, goal, 1)
+        player.turns_left = 2
+        player._proceed = True
+        assert player.generate_move(board_16x16) == move
+
+        path = str(tmp_path / 'endgame.bin')
+        write_book(path, solver.entries())
+        table = open_book(path)
+        position, symmetry = canonical_encoding(encode_board(board_16x16))
+        assert table.lookup_key(endgame_key(position, goal, 2)) == \
+            transform_move(move, symmetry)
+        table.close()
+
+        # Solutions for two turns left cannot come up once one turn is left.
+        entries = solver.entries()
+        apply_move(board_16x16, move, goal.colour)
+        solver.solve(board_16x16, 1)
+        assert len(solver) < len(entries)
+        assert set(solver.entries().items()) <= set(entries.items())
+        assert endgame_key(position, goal, 2) not in solver.entries()
+
+
+class TestEngine:
+    """A collection of methods for testing the headless engine.
+    """
+    def test_same_as_interactive(self) -> None:
+        """Test that the headless engine gives the same final scores as the
+        interactive game for the same seed.
+        """
+        data = setup_game(2, 0, 1, [4], [(2, 1)], seed=148)
+        data.max_turns = 5
+        state = MainState(data)
+        click = pygame.event.Event(pygame.MOUSEBUTTONDOWN, button=1,
+                                   pos=(0, 0))
+        while not isinstance(state, GameOverState):
+            state.process_event(click)
+            state = state.update()
+            if isinstance(state, AnimateMoveState):
+                state = state._parent
+
+        assert play_game(2, 1, [4], 5, [(2, 1)], seed=148) == \
+            data.final_scores()
+
+    def test_move_worker(self, renderer) -> None:
+        """Test that a computer player thinks on a worker while the game keeps
+        updating and rendering, and that its move is done once it is ready.
+        """
+        data = setup_game(3, 0, 0, [20], seed=148)
+        data.max_turns = 5
+        state = MainState(data)
+        board = encode_board(data.board)
+        state.process_event(pygame.event.Event(pygame.MOUSEBUTTONDOWN,
+                                               button=1, pos=(0, 0)))
+        interval = sys.getswitchinterval()
+        assert state.update() is state
+        assert state._worker is not None
+        assert sys.getswitchinterval() == THINKING_SWITCH_INTERVAL
+        state.render(renderer)
+        assert encode_board(data.board) == board
+
+        # A click while the player thinks is not for its next move.
+        state._worker._thread.join()
+        state.process_event(pygame.event.Event(pygame.MOUSEBUTTONDOWN,
+                                               button=1, pos=(0, 0)))
+        assert isinstance(state.update(), AnimateMoveState)
+        assert state._worker is None
+        assert sys.getswitchinterval() == interval
+        assert data.turn == 1
+        assert data.current_player().waiting()
+
+    def test_turbo(self) -> None:
+        """Test that a game that is fast-forwarded plays itself without
+        clicks or animations, and gives the same final scores.
+        """
+        data = setup_game(2, 0, 1, [4], [(2, 1)], seed=148)
+        data.max_turns = 5
+        data.turbo = True
+        state = MainState(data)
+        while not isinstance(state, GameOverState):
+            state = state.update()
+            assert not isinstance(state, AnimateMoveState)
+
+        assert play_game(2, 1, [4], 5, [(2, 1)], seed=148) == \
+            data.final_scores()
+
+    def test_record_replay(self, tmp_path) -> None:
+        """Test that the replay of a game's record gives the board at the
+        start of every turn, and the game's final scores.
+        """
+        path = str(tmp_path / 'game.rec')
+        data = setup_game(3, 0, 2, [2], seed=148, record_path=path)
+        data.record.snapshot_every = 3
+        data.max_turns = 10
+        boards = [encode_board(data.board)]
+        while not data.is_over():
+            player = data.start_move()
+            if data.do_move(player.choose_move(data.board)) and \
+                    data.current_player_index == 0:
+                boards.append(encode_board(data.board))
+        assert data.record._file.closed
+
+        replay = GameReplay(path)
+        assert replay.seed == 148
+        assert replay.num_turns == 10
+        for turn in range(11):
+            assert encode_board(replay.board_at(turn)) == boards[turn]
+        assert replay.scores_at(10) == data.final_scores()
+
+        with open(path, 'ab') as record_file:
+            record_file.write(b'X')
+        with pytest.raises(ValueError):
+            GameReplay(path)
+
+    def test_score_table(self, monkeypatch) -> None:
+        """Test that the scores kept by a game are the scores for the players'
+        goals on the board after every move, for both types of goal, and that
+        a goal that is not local is only scored when its score is asked for.
+        """
+        scored = []
+        score = BlobGoal.score
+        monkeypatch.setattr(BlobGoal, 'score',
+                            lambda goal, board: scored.append(goal) or
+                            score(goal, board))
+        for seed in [148, 151]:
+            data = setup_game(3, 0, 3, [], seed=seed)
+            data.max_turns = 20
+            while not data.is_over():
+                data.do_move(data.start_move().choose_move(data.board))
+                scored.clear()
+                for player in data.players:
+                    assert data.calculate_score(player.id)[0] == \
+                        score(player.goal, data.board)
+                    data.calculate_score(player.id)
+                assert len(scored) in [0, len(data.players)]
+
+    def test_stats(self, tmp_path) -> None:
+        """Test that a timed game times each player's moves, and that its
+        timings are written as JSON lines.
+        """
+        data = setup_game(2, 0, 2, [], seed=148)
+        data.stats = PhaseStats(window=5)
+        run_game(data, 10)
+        data.stats.count('games')
+
+        path = str(tmp_path / 'stats.jsonl')
+        data.stats.write(path, 'test')
+        with open(path) as stats_file:
+            lines = [json.loads(line) for line in stats_file]
+        phases = {line.get('phase'): line for line in lines}
+        assert phases['choose_move player 0']['count'] == 10
+        assert phases['do_move']['count'] == 20
+        assert phases['do_move']['p50'] <= phases['do_move']['max']
+        assert {'counter': 'games', 'value': 1, 'label': 'test',
+                'time': lines[-1]['time']} in lines
+
+    def test_profiler(self, tmp_path) -> None:
+        """Test that a call nested in a profiled call is charged to its own
+        key only, and that profiling writes a file for each key.
+        """
+        profiler = StateProfiler(str(tmp_path), use_tracemalloc=True)
+        board = generate_board(3, 750, random.Random(148))
+        profiler.run('MainState', _flatten, board)
+        profiler.start()
+        profiler.run('MainState', profiler.run, 'player 0', board.create_copy)
+        profiler.stop()
+        assert not profiler.active
+
+        names = sorted(os.listdir(str(tmp_path)))
+        assert names == ['MainState-allocations.txt', 'MainState.pstats',
+                         'MainState.snapshot', 'player-0-allocations.txt',
+                         'player-0.pstats', 'player-0.snapshot']
+        functions = {key[2] for key in pstats.Stats(
+            str(tmp_path / 'player-0.pstats')).stats}
+        assert 'create_copy' in functions
+        functions = {key[2] for key in pstats.Stats(
+            str(tmp_path / 'MainState.pstats')).stats}
+        assert 'create_copy' not in functions
+
+    def test_checkpoint_resume(self, tmp_path) -> None:
+        """Test that a game resumed from a checkpoint plays on exactly as the
+        game it was saved from.
+        """
+        path = str(tmp_path / 'game.ckp')
+        data = setup_game(3, 0, 1, [3], [(2, 2)], seed=148)
+        data.checkpoint_path = path
+        data.checkpoint_every = 4
+        scores = run_game(data, 6)
+
+        resumed = load_checkpoint(path)
+        assert resumed.turn == 4
+        assert run_game(resumed, 6) == scores
+        assert encode_board(resumed.board) == encode_board(data.board)
+
+    def test_seed_range(self, tmp_path) -> None:
+        """Test that a game seed that cannot be saved in a checkpoint is
+        rejected when the game is set up, and that the largest one is saved.
+        """
+        for seed in [-1, SEED_LIMIT]:
+            with pytest.raises(ValueError):
+                setup_game(2, 0, 2, [], seed=seed)
+
+        path = str(tmp_path / 'game.ckp')
+        data = setup_game(2, 0, 2, [], seed=SEED_LIMIT - 1)
+        data.save_checkpoint(path)
+        assert load_checkpoint(path).seed == SEED_LIMIT - 1
+
+    def test_tournament_resume(self, tmp_path) -> None:
+        """Test that a tournament only plays the games that are not already
+        in its output file, ignores a result that was cut off or is not a
+        result, and records a draw as a win for no one.
+        """
+        path = str(tmp_path / 'results.jsonl')
+        args = ['--lineup', 'random,random', '--max-depth', '2', '--turns',
+                '2', '--processes', '1', '--output', path]
+        first = run_tournament(args + ['--games', '2'])
+        with open(path, 'a') as result_file:
+            result_file.write('{"key": "2|rand\n{"key": "2|random')
+
+        second = run_tournament(args + ['--games', '3'])
+        assert second[:2] == first
+        assert len(second) == 3
+        with open(path) as result_file:
+            assert len(result_file.readlines()) == 4
+        for result in second:
+            totals = [score - penalty for score, penalty in
+                      zip(result['scores'], result['penalties'])]
+            if totals.count(max(totals)) > 1:
+                assert result['winner'] is None
+
+        low, high = wilson_interval(3, 3)
+        assert 0.4 < low < 1.0 == high
+
+
+class TestServer:
+    """A collection of methods for testing the game server and its load test.
+    """
+    def test_load_test(self) -> None:
+        """Test that bots playing many games at once on the server all finish
+        them, and keep boards that give the scores the server sends.
+        """
+        server = GameServer(2, 2, 3, seed=148)
+
+        async def run() -> List[dict]:
+            listener = await server.start_tcp('127.0.0.1', 0)
+            host, port = listener.sockets[0].getsockname()[:2]
+            reports = await load_test(
+                lambda: asyncio.open_connection(host, port), 20, seed=1)
+            listener.close()
+            return reports
+
+        reports = asyncio.run(run())
+        assert len(server.results) == 10
+        for report in reports:
+            assert len(report['latencies']) == 3
+            assert report['scores'] == server.results[report['game']]
+            for player_id, score, _ in report['scores']:
+                assert report['goals'][player_id].score(report['board']) == \
+                    score
+
+    def test_timeout(self, tmp_path) -> None:
+        """Test that a player that does not move passes once its time is up,
+        and that a move sent too late is ignored.
+        """
+        path = str(tmp_path / 'server.sock')
+        server = GameServer(2, 2, 2, move_timeout=0.05, seed=148)
+
+        async def idle_player() -> None:
+            """Connect, send a move too late, and wait for the game to end."""
+            reader, writer = await asyncio.open_unix_connection(path)
+            writer.write(b'{"move": -1, "action": "pass", "direction": null, '
+                         b'"path": 1}\n')
+            while await reader.readline():
+                pass
+
+        async def run() -> List[dict]:
+            listener = await server.start_unix(path)
+            results = await asyncio.gather(
+                idle_player(),
+                load_test(lambda: asyncio.open_unix_connection(path), 1))
+            listener.close()
+            return results[1]
+
+        reports = asyncio.run(run())
+        assert reports[0]['scores'] == server.results[0]
+        counters = {entry['counter']: entry['value']
+                    for entry in server.stats.summary() if 'counter' in entry}
+        assert counters['timeouts'] == 2
+        assert 'invalid moves' not in counters
+
+
+class TestProtocol:
+    """A collection of methods for testing the engine protocol and the
+    players that use it.
+    """
+    def test_position_and_moves(self) -> None:
+        """Test that positions and moves are read back as they were written.
+        """
+        board = generate_board(3, 750, random.Random(148))
+        goal = BlobGoal(COLOUR_LIST[3])
+        line = format_position(board, goal, 4, None)
+        read_board, read_goal, penalty, turns_left = parse_position(line)
+        assert read_board == board
+        assert isinstance(read_goal, BlobGoal)
+        assert read_goal.colour == goal.colour
+        assert (penalty, turns_left) == (4, None)
+        for action in MOVE_ACTIONS:
+            move = (action[0], action[1], 22)
+            assert parse_move(format_move(move)) == move
+        with pytest.raises(ValueError):
+            parse_move('bestmove spin 1 1')
+
+    def test_engine_game(self, monkeypatch) -> None:
+        """Test that a SubprocessPlayer plays a whole game with an engine,
+        which is told the player's penalty as the game keeps it.
+        """
+        bot = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                           'bot.py')
+        command = f'{shlex.quote(sys.executable)} {shlex.quote(bot)} random'
+        data = setup_game(2, 0, 1, [], seed=148, engine_players=[command])
+        data.paints[1] = 2
+        penalties = []
+
+        def position(board: Block, goal: Goal, penalty: int,
+                     turns_left: Optional[int]) -> str:
+            penalties.append((penalty, data.calculate_score(1)[1]))
+            return format_position(board, goal, penalty, turns_left)
+
+        monkeypatch.setattr('player.format_position', position)
+        scores = run_game(data, 6)
+        assert len(scores) == 2
+        assert data.players[1].failures == 0
+        assert len(penalties) == 6
+        assert all(sent == kept for sent, kept in penalties)
+        assert penalties[0][0] == 2 * ACTION_PENALTY[PAINT]
+
+    def test_engine_timeout(self, tmp_path) -> None:
+        """Test that a SubprocessPlayer passes when its engine does not reply
+        in time.
+        """
+        script = tmp_path / 'slow.py'
+        script.write_text('import sys\n'
+                          'for line in sys.stdin:\n'
+                          '    if line.strip() == "blocky":\n'
+                          '        print("blockyok", flush=True)\n')
+        command = f'{shlex.quote(sys.executable)} {shlex.quote(str(script))}'
+        player = SubprocessPlayer(0, PerimeterGoal(COLOUR_LIST[0]), command,
+                                  move_time=0.05)
+        board = generate_board(2, 750, random.Random(148))
+        assert player.choose_move(board) == ('pass', None, ROOT_PATH)
+        assert player.failures == 1
+
+    def test_missing_engine(self, monkeypatch) -> None:
+        """Test that a SubprocessPlayer only starts its engine when it first
+        moves, and passes if the engine cannot be started.
+        """
+        started = []
+
+        def engine_pool(command: str) -> None:
+            started.append(command)
+            raise OSError(f'{command} not found')
+
+        monkeypatch.setattr('player.get_engine_pool', engine_pool)
+        player = SubprocessPlayer(0, PerimeterGoal(COLOUR_LIST[0]),
+                                  'no-such-engine-binary')
+        assert started == []
+        board = generate_board(2, 750, random.Random(148))
+        assert player.choose_move(board) == ('pass', None, ROOT_PATH)
+        assert started == ['no-such-engine-binary']
+        assert player.failures == 1
+
+
+class TestEvaluationCache:
+    """A collection of methods for testing the EvaluationCache class.
+    """
+    def test_ageing(self, board_16x16) -> None:
+        """Test that entries are kept while they are used and dropped once they
+        have gone unused for max_age generations.
+        """
+        cache = EvaluationCache(2)
+        board = encode_board(board_16x16)
+        move = ('swap', 0, ROOT_PATH)
+        goal = BlobGoal(COLOUR_LIST[0])
+        result = canonical_encoding(encode_board(board_16x16.children[0]))[0]
+        cache.store_result(board, move, goal.colour, result)
+        cache.store_score(board, goal, 7)
+
+        cache.advance()
+        assert cache.result(board, move, goal.colour) == result
+        cache.advance()
+        assert cache.result(board, move, goal.colour) == result
+        assert cache.score(board, goal) is None
+        assert cache.hits == 2 and cache.misses == 1
+
+    def test_symmetry(self, board_16x16) -> None:
+        """Test that one entry serves every rotation and reflection of a
+        board.
+        """
+        cache = EvaluationCache()
+        goal = PerimeterGoal(COLOUR_LIST[1])
+        cache.store_score(encode_board(board_16x16), goal, 5)
+        cache.store_result(encode_board(board_16x16), ('swap', 0, ROOT_PATH),
+                           goal.colour, ILLEGAL)
+
+        for symmetry in range(len(SYMMETRIES)):
+            image = transform_encoding(encode_board(board_16x16), symmetry)
+            assert cache.score(image, goal) == 5
+            move = transform_move(('swap', 0, ROOT_PATH), symmetry)
+            assert cache.result(image, move, goal.colour) == ILLEGAL
+        assert len(cache) == 2
+
+    def test_search_memory(self) -> None:
+        """Test that a stored score change is only found for the same block,
+        that the least recently used change is dropped first, and that the
+        history fades from turn to turn.
+        """
+        memory = SearchMemory(2)
+        memory.store_delta(1, b'a', 3)
+        memory.store_delta(2, b'b', -1)
+        assert memory.delta(1, b'a') == 3
+        assert memory.delta(2, b'c') is None
+        memory.store_delta(3, b'c', 0)
+        assert len(memory) == 2
+        assert memory.delta(2, b'b') is None
+        assert memory.delta(1, b'a') == 3
+
+        memory.record(('rotate', 1), 1, 4)
+        memory.record(('rotate', 1), 1, -2)
+        assert memory.priority(('rotate', 1), 1) == 4
+        memory.start_turn()
+        assert memory.priority(('rotate', 1), 1) == 2
+        assert memory.action_weight(('rotate', 1)) == 3
+        assert memory.level_weight(0) == 1
+
 
 class TestGoal:
     """A collection of methods for testing the sub-classes of Goal.
@@ -302,6 +1011,15 @@ class TestGoal:
 
         assert result == flattened_board_16x16
 
+    def test_flatten_leaf_board(self) -> None:
+        """Test that flattening a board that is a single leaf gives
+        2 ** max_depth unit cells a side.
+        """
+        board = Block((0, 0), 750, COLOUR_LIST[1], 0, 2)
+        result = _flatten(board)
+
+        assert result == [[COLOUR_LIST[1]] * 4 for _ in range(4)]
+
     def test_blob_goal(self, board_16x16) -> None:
         correct_scores = [
             (COLOUR_LIST[0], 1),
@@ -328,6 +1046,35 @@ class TestGoal:
             goal = PerimeterGoal(colour)
             assert goal.score(board_16x16) == expected
 
+    def test_delta_bound(self, board_16x16) -> None:
+        """Test that no legal move increases a goal's score by more than the
+        goal's delta_bound for it.
+        """
+        for colour in COLOUR_LIST:
+            for goal in [PerimeterGoal(colour), BlobGoal(colour)]:
+                state = goal.prepare_bounds(board_16x16)
+                score = goal.score(board_16x16)
+                for move in legal_moves(board_16x16, colour):
+                    board_copy = board_16x16.create_copy()
+                    apply_move(board_copy, move, colour)
+                    bound = goal.delta_bound(state, (move[0], move[1]),
+                                             path_region(move[2], 2))
+                    assert goal.score(board_copy) - score <= bound
+
+    def test_paint_scores(self, board_16x16) -> None:
+        """Test that the score Goal.paint_scores predicts for each paint is the
+        score of the board after actually doing that paint.
+        """
+        board_16x16.children[1].smash()
+        for colour in COLOUR_LIST:
+            for goal in [PerimeterGoal(colour), BlobGoal(colour)]:
+                for col, row, score in goal.paint_scores(board_16x16):
+                    leaf = block_at_path(board_16x16, cell_path(col, row, 2))
+                    old_colour = leaf.colour
+                    assert leaf.paint(colour)
+                    assert goal.score(board_16x16) == score
+                    leaf.paint(old_colour)
+
 
 if __name__ == '__main__':
     pytest.main(['example_tests.py'])
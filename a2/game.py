@@ -25,14 +25,16 @@ Blocky game.
 At the bottom of the file, there are some function that you
 can call to try playing the game in several different configurations.
 """
-from typing import List
+from typing import List, Optional, Tuple
+import time
 import pygame
 
-from block import generate_board
 from blocky import GameData, GameState, MainState
-from player import create_players
+from engine import setup_game
+from profiling import StateProfiler, install_toggle_signal
 from renderer import Renderer
-from settings import BOARD_SIZE
+from settings import BOARD_SIZE, FRAME_RATE, TURBO_UPDATE_RATE
+from stats import PhaseStats, install_dump_signal
 
 
 class Game:
@@ -45,24 +47,76 @@ class Game:
     #   The data of the game that can be shared with other GameState objects.
     # _state:
     #   The current GameState.
+    # _stats_path:
+    #   The file that the timings of the game are written to, or None if the
+    #   game is not timed.
     _renderer: Renderer
     _data: GameData
     _state: GameState
+    _stats_path: Optional[str]
 
     def __init__(self, max_depth: int,
                  num_human: int,
                  num_random: int,
-                 smart_players: List[int]) -> None:
+                 smart_players: List[int],
+                 beam_players: Optional[List[Tuple[int, int]]] = None,
+                 seed: Optional[int] = None,
+                 book_path: Optional[str] = None,
+                 endgame_path: Optional[str] = None,
+                 record_path: Optional[str] = None,
+                 stats_path: Optional[str] = None,
+                 profile_dir: Optional[str] = None,
+                 profile_memory: bool = False) -> None:
         """Initialize this game, as described in the Assignment 2 handout.
 
+        <beam_players> is a list of the (width, depth) of each BeamPlayer in
+        the game, who play after all the other players.
+
+        <seed> is the game seed, from which the board, the goals, the smashes
+        and each player's random choices are all seeded. The same seed always
+        gives the same game, in any process. If <seed> is None, one is chosen
+        with the random module.
+
+        <book_path> is the file of the opening book that the computer players
+        look boards up in, if any, and <endgame_path> is the file of their
+        endgame table. A book or table that is missing or cannot be read is
+        ignored.
+
+        If <record_path> is not None, every move of the game is recorded in a
+        new file at that path, which record.GameReplay can replay.
+
+        If <stats_path> is not None, each phase of the game loop and each
+        player's moves are timed, and the timings are appended to that file as
+        JSON lines when the game loop ends, and whenever the process is sent
+        SIGUSR1 (see the stats module).
+
+        If <profile_dir> is not None, the game can be profiled while it runs:
+        pressing F9, or sending the process SIGUSR2, starts profiling the game
+        states and each player's moves with cProfile, and with tracemalloc too
+        if <profile_memory> is True. Doing so again stops profiling and writes
+        the statistics to <profile_dir>, as does the end of the game loop (see
+        the profiling module).
+
+        Pressing T fast-forwards the game, or stops fast-forwarding it. While
+        the game is fast-forwarded, computer players move without waiting for
+        a click, their moves are not animated, and the game is updated as
+        often as it can be but only drawn FRAME_RATE times a second.
+
         Precondition:
             2 <= max_depth <= 5
         """
-        board = generate_board(max_depth, BOARD_SIZE)
-        players = create_players(num_human, num_random, smart_players)
-
         self._renderer = Renderer(BOARD_SIZE)
-        self._data = GameData(board, players)
+        self._data = setup_game(max_depth, num_human, num_random,
+                                smart_players, beam_players, seed, book_path,
+                                endgame_path, record_path)
+        self._stats_path = stats_path
+        if stats_path is not None:
+            self._data.stats = PhaseStats()
+            install_dump_signal(self._data.stats, stats_path)
+        if profile_dir is not None:
+            self._data.profiler = StateProfiler(profile_dir,
+                                                use_tracemalloc=profile_memory)
+            install_toggle_signal(self._data.profiler)
         self._state = MainState(self._data)
 
     def run_game(self, num_turns: int) -> None:
@@ -70,27 +124,71 @@ class Game:
         """
         self._data.max_turns = num_turns
         clock = pygame.time.Clock()
+        stats = self._data.stats
+        profiler = self._data.profiler
+        last_frame = 0.0
 
         while True:
-            clock.tick(30)
+            if self._data.turbo:
+                clock.tick(TURBO_UPDATE_RATE)
+            else:
+                clock.tick(FRAME_RATE)
 
             # Process events
+            start = time.perf_counter()
             for e in pygame.event.get():
                 if e.type == pygame.QUIT:
+                    if stats is not None:
+                        stats.write(self._stats_path, 'game end')
+                    if profiler is not None and profiler.active:
+                        profiler.stop()
+                    self._data.close()
                     return
+                elif e.type == pygame.KEYDOWN and e.key == pygame.K_F9 and \
+                        profiler is not None:
+                    profiler.toggle()
+                elif e.type == pygame.KEYDOWN and e.key == pygame.K_t:
+                    self._data.turbo = not self._data.turbo
                 else:
                     self._state.process_event(e)
+            events = time.perf_counter()
 
             # Update the state of the game
-            self._state = self._state.update()
+            if profiler is None:
+                self._state = self._state.update()
+            else:
+                self._state = profiler.run(type(self._state).__name__,
+                                           self._state.update)
+            updated = time.perf_counter()
+
+            # A game that is fast-forwarded is only drawn once a frame
+            if self._data.turbo and updated - last_frame < 1 / FRAME_RATE:
+                if stats is not None:
+                    stats.count('skipped frames')
+                    stats.add('events', events - start)
+                    stats.add('update', updated - events)
+                continue
+            last_frame = updated
 
             # Render the new state of the game
             self._renderer.clear()
-            self._state.render(self._renderer)
+            if profiler is None:
+                self._state.render(self._renderer)
+            else:
+                profiler.run(type(self._state).__name__, self._state.render,
+                             self._renderer)
+            rendered = time.perf_counter()
 
             # Update the screen
             pygame.display.flip()
 
+            if stats is not None:
+                stats.count('frames')
+                stats.add('events', events - start)
+                stats.add('update', updated - events)
+                stats.add('render', rendered - updated)
+                stats.add('flip', time.perf_counter() - rendered)
+
 
 def create_auto_game() -> Game:
     """Run a game with two computer players of different "difficulty".
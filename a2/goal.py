@@ -24,27 +24,32 @@ This file contains the hierarchy of Goal classes.
 from __future__ import annotations
 import math
 import random
-from typing import List, Tuple
+from typing import List, Optional, Tuple
 from block import Block
+from moves import COLOUR_PRESERVING_ACTIONS
 from settings import colour_name, COLOUR_LIST
 
 
-def generate_goals(num_goals: int) -> List[Goal]:
+def generate_goals(num_goals: int,
+                   rng: Optional[random.Random] = None) -> List[Goal]:
     """Return a randomly generated list of goals with length num_goals.
 
     All elements of the list must be the same type of goal, but each goal
     must have a different randomly generated colour from COLOUR_LIST. No two
-    goals can have the same colour.
+    goals can have the same colour. The goals are drawn from <rng>, or from the
+    random module if <rng> is None.
 
     Precondition:
         - num_goals <= len(COLOUR_LIST)
     """
-    binary_goal_decider = random.randint(0, 1)
+    if rng is None:
+        rng = random
+    binary_goal_decider = rng.randint(0, 1)
     colour_index_list = []
     goal_list = []
 
     while len(colour_index_list) < num_goals:
-        randi = random.randint(0, len(COLOUR_LIST) - 1)
+        randi = rng.randint(0, len(COLOUR_LIST) - 1)
         if randi not in colour_index_list:
             colour_index_list.append(randi)
 
@@ -144,12 +149,39 @@ def _flatten(block: Block) -> List[List[Tuple[int, int, int]]]:
         return full_merge(sub_blocks[0], sub_blocks[1], sub_blocks[2],
                           sub_blocks[3])
 
-    if block.max_depth == 0:
-        return [[block.colour]]
+    if not block.children:
+        cells = 2 ** (block.max_depth - block.level)
+        return [[block.colour] * cells for _ in range(cells)]
     else:
         return flatten_helper(block)
 
 
+def _unit_leaves(block: Block) -> List[Tuple[Block, int, int]]:
+    """Return a list of (leaf, column, row) tuples, one for every leaf of
+    <block> that is at max_depth, i.e. one for every unit cell that can be
+    painted.
+
+    <column> and <row> index the leaf's unit cell in _flatten(<block>).
+    """
+    leaves = []
+
+    def unit_leaves_helper(b: Block, col: int, row: int) -> None:
+        """Append the unit-cell leaves of <b>, whose upper left unit cell is
+        at (<col>, <row>), to leaves."""
+        if not b.children:
+            if b.level == b.max_depth:
+                leaves.append((b, col, row))
+        else:
+            half = 2 ** (b.max_depth - b.level - 1)
+            unit_leaves_helper(b.children[0], col + half, row)
+            unit_leaves_helper(b.children[1], col, row)
+            unit_leaves_helper(b.children[2], col, row + half)
+            unit_leaves_helper(b.children[3], col + half, row + half)
+
+    unit_leaves_helper(block, 0, 0)
+    return leaves
+
+
 class Goal:
     """A player goal in the game of Blocky.
 
@@ -172,6 +204,98 @@ class Goal:
 
         The score is always greater than or equal to 0.
         """
+        return self._score_flat(_flatten(board))
+
+    def _score_flat(self, flat_board: List[List[Tuple[int, int, int]]]) \
+            -> int:
+        """Return the score for this goal on the board whose unit cells are
+        <flat_board>, as returned by _flatten.
+        """
+        raise NotImplementedError
+
+    def paint_scores(self, board: Block) -> List[Tuple[int, int, int]]:
+        """Return a list of (column, row, score) tuples, one for every leaf of
+        <board> that a paint in this goal's colour would change, where
+        (<column>, <row>) is the leaf's unit cell in _flatten(<board>) and
+        <score> is the score for this goal on <board> after painting that leaf.
+
+        The board is flattened once, and each leaf is then scored without
+        copying or re-flattening <board>.
+
+        This method does not mutate <board>.
+        """
+        flat_board = _flatten(board)
+        base = self._score_flat(flat_board)
+        state = self._prepare_paint(flat_board)
+
+        result = []
+        for leaf, col, row in _unit_leaves(board):
+            if leaf.colour != self.colour:
+                result.append((col, row, self._score_after_paint(
+                    flat_board, base, state, col, row)))
+        return result
+
+    def _prepare_paint(self, flat_board: List[List[Tuple[int, int, int]]]) \
+            -> object:
+        """Return whatever per-board state _score_after_paint needs in order to
+        score paints on <flat_board>.
+        """
+        return None
+
+    def _score_after_paint(self, flat_board: List[List[Tuple[int, int, int]]],
+                           base: int, state: object, col: int, row: int) \
+            -> int:
+        """Return the score for this goal on <flat_board> after the unit cell at
+        (<col>, <row>) is painted this goal's colour.
+
+        <base> is the score on <flat_board> itself and <state> was returned
+        by _prepare_paint(<flat_board>). <flat_board> is left unchanged.
+
+        This implementation paints the cell and rescores the whole board.
+        Subclasses override it with something faster where they can.
+        """
+        old_colour = flat_board[col][row]
+        flat_board[col][row] = self.colour
+        score = self._score_flat(flat_board)
+        flat_board[col][row] = old_colour
+        return score
+
+    def is_local(self) -> bool:
+        """Return True iff the change a move makes to the score for this goal
+        depends only on the block the move acts on and where that block is on
+        the board.
+        """
+        return False
+
+    def prepare_bounds(self, board: Block) -> object:
+        """Return whatever per-board state delta_bound needs in order to bound
+        the effect of moves on <board>.
+        """
+        raise NotImplementedError
+
+    def delta_bound(self, state: object, action: Tuple[str, Optional[int]],
+                    region: Tuple[int, int, int]) -> int:
+        """Return an upper bound on how much the score for this goal can
+        increase when <action> is done on the block of a board whose (column,
+        row, side) in unit cells is <region>.
+
+        <state> was returned by prepare_bounds for that board. The bound is
+        cheap to compute, and is meant for skipping moves that cannot beat a
+        score that is already known.
+        """
+        raise NotImplementedError
+
+    def region_score(self, block: Block, col: int, row: int) -> int:
+        """Return how much the unit cells of <block> add to the score for this
+        goal, where (<col>, <row>) is the upper left unit cell of <block> on
+        its board.
+
+        The score for a local goal (see is_local) is the sum of what the
+        blocks of any partition of the board add, so a move on <block> changes
+        the score by the change in this amount.
+
+        Precondition: self.is_local()
+        """
         raise NotImplementedError
 
     def description(self) -> str:
@@ -182,8 +306,9 @@ class Goal:
 
 class PerimeterGoal(Goal):
     """A perimeter goal."""
-    def score(self, board: Block) -> int:
-        board = _flatten(board)
+    def _score_flat(self, flat_board: List[List[Tuple[int, int, int]]]) \
+            -> int:
+        board = flat_board
         score = 0
         if self.colour in board[0]:
             score += board[0].count(self.colour)
@@ -208,6 +333,78 @@ class PerimeterGoal(Goal):
 
         return score
 
+    def _score_after_paint(self, flat_board: List[List[Tuple[int, int, int]]],
+                           base: int, state: object, col: int, row: int) \
+            -> int:
+        """Return the score for this goal on <flat_board> after the unit cell at
+        (<col>, <row>) is painted this goal's colour.
+
+        Painting only changes whether that one cell counts, so the new score is
+        <base> plus the number of board edges the cell lies on (two for a
+        corner).
+        """
+        n = len(flat_board)
+        if n == 1 or flat_board[col][row] == self.colour:
+            # A single cell is counted on every edge at once; let the full
+            # score deal with it.
+            return Goal._score_after_paint(self, flat_board, base, state, col,
+                                           row)
+        return base + (col == 0) + (col == n - 1) + (row == 0) + \
+            (row == n - 1)
+
+    def is_local(self) -> bool:
+        """Return True, since each unit cell counts for the same amount wherever
+        the rest of the board's colours are.
+        """
+        return True
+
+    def prepare_bounds(self, board: Block) -> int:
+        """Return the number of unit cells along a side of <board>.
+        """
+        return 2 ** (board.max_depth - board.level)
+
+    def delta_bound(self, state: object, action: Tuple[str, Optional[int]],
+                    region: Tuple[int, int, int]) -> int:
+        """Return an upper bound on how much the score for this goal can
+        increase when <action> is done on the block of a board whose (column,
+        row, side) in unit cells is <region>.
+
+        A move only changes the cells of its block, so the score can increase by
+        at most the number of times those cells are counted when they are on an
+        edge of the board. A block away from the edges cannot change the score.
+        """
+        n = state
+        col, row, side = region
+        if n == 1:
+            # A single cell is counted on every edge at once.
+            return 6
+        return side * ((col == 0) + (col + side == n) + (row == 0) +
+                       (row + side == n))
+
+    def region_score(self, block: Block, col: int, row: int) -> int:
+        """Return how much the unit cells of <block> add to the score for this
+        goal, where (<col>, <row>) is the upper left unit cell of <block> on
+        its board.
+
+        Each cell of this goal's colour adds the number of board edges it lies
+        on, so a block away from the edges adds nothing and is not looked at.
+        """
+        n = 2 ** block.max_depth
+        side = 2 ** (block.max_depth - block.level)
+        if n == 1:
+            # A single cell is counted on every edge at once.
+            return 6 * (block.colour == self.colour)
+        if 0 < col and col + side < n and 0 < row and row + side < n:
+            return 0
+        score = 0
+        flat_block = _flatten(block)
+        for i in range(side):
+            for j in range(side):
+                if flat_block[i][j] == self.colour:
+                    score += (col + i == 0) + (col + i == n - 1) + \
+                        (row + j == 0) + (row + j == n - 1)
+        return score
+
     def description(self) -> str:
 
         return 'Get as many {} blocks as you can on the edges of the board.'.\
@@ -216,9 +413,9 @@ class PerimeterGoal(Goal):
 
 class BlobGoal(Goal):
     """A blob goal."""
-    def score(self, board: Block) -> int:
+    def _score_flat(self, flat_board: List[List[Tuple[int, int, int]]]) \
+            -> int:
         scores = []
-        flat_board = _flatten(board)
         visited = []
         for j in range(len(flat_board)):
             visited.append([])
@@ -287,15 +484,94 @@ class BlobGoal(Goal):
         else:
             return 0
 
+    def _prepare_paint(self, flat_board: List[List[Tuple[int, int, int]]]) \
+            -> Tuple[List[List[int]], List[int], int]:
+        """Return (labels, sizes, others) for <flat_board>.
 
-
-
-
-
-
-
-
-
+        labels[i][j] is the index into <sizes> of the blob containing the cell
+        at column i and row j, or -1 if that cell is not this goal's colour.
+        sizes[k] is the number of cells in blob k. <others> is the number of
+        cells that are not this goal's colour.
+        """
+        n = len(flat_board)
+        labels = [[-1] * n for _ in range(n)]
+        sizes = []
+        others = 0
+        for i in range(n):
+            for j in range(n):
+                if flat_board[i][j] != self.colour:
+                    others += 1
+                elif labels[i][j] == -1:
+                    label = len(sizes)
+                    labels[i][j] = label
+                    size = 0
+                    stack = [(i, j)]
+                    while stack:
+                        x, y = stack.pop()
+                        size += 1
+                        for nx, ny in ((x + 1, y), (x - 1, y), (x, y + 1),
+                                       (x, y - 1)):
+                            if 0 <= nx < n and 0 <= ny < n and \
+                                    labels[nx][ny] == -1 and \
+                                    flat_board[nx][ny] == self.colour:
+                                labels[nx][ny] = label
+                                stack.append((nx, ny))
+                    sizes.append(size)
+        return labels, sizes, others
+
+    def _score_after_paint(self, flat_board: List[List[Tuple[int, int, int]]],
+                           base: int, state: object, col: int, row: int) \
+            -> int:
+        """Return the score for this goal on <flat_board> after the unit cell at
+        (<col>, <row>) is painted this goal's colour.
+
+        The painted cell joins the distinct blobs around it into one, so only
+        its four neighbours are looked at.
+        """
+        labels, sizes, others = state
+        if others == 1 or labels[col][row] != -1:
+            # Painting the last cell of another colour makes the board a single
+            # colour, which the full score treats specially.
+            return Goal._score_after_paint(self, flat_board, base, state, col,
+                                           row)
+        n = len(flat_board)
+        joined = set()
+        for x, y in ((col + 1, row), (col - 1, row), (col, row + 1),
+                     (col, row - 1)):
+            if 0 <= x < n and 0 <= y < n and labels[x][y] != -1:
+                joined.add(labels[x][y])
+        return max(base, 1 + sum(sizes[label] for label in joined))
+
+    def prepare_bounds(self, board: Block) -> Tuple[int, int, int]:
+        """Return (cells, colour_cells, score), where <cells> is the number of
+        unit cells along a side of <board>, <colour_cells> is the number of
+        them that are this goal's colour, and <score> is the score for this
+        goal on <board>.
+        """
+        flat_board = _flatten(board)
+        colour_cells = 0
+        for column in flat_board:
+            colour_cells += column.count(self.colour)
+        return len(flat_board), colour_cells, self._score_flat(flat_board)
+
+    def delta_bound(self, state: object, action: Tuple[str, Optional[int]],
+                    region: Tuple[int, int, int]) -> int:
+        """Return an upper bound on how much the score for this goal can
+        increase when <action> is done on the block of a board whose (column,
+        row, side) in unit cells is <region>.
+
+        A blob can be no bigger than the number of cells of this goal's colour.
+        A move that only moves cells around keeps that number, and any other
+        move can at most give every cell of its block this goal's colour.
+        """
+        n, colour_cells, score = state
+        side = region[2]
+        if action in COLOUR_PRESERVING_ACTIONS:
+            most = colour_cells
+        else:
+            most = min(n * n, colour_cells + side * side)
+        # A board of a single colour scores 4, whatever its size.
+        return max(most, 4) - score
 
     def description(self) -> str:
 
@@ -307,8 +583,8 @@ if __name__ == '__main__':
     import python_ta
     python_ta.check_all(config={
         'allowed-import-modules': [
-            'doctest', 'python_ta', 'random', 'typing', 'block', 'settings',
-            'math', '__future__'
+            'doctest', 'python_ta', 'random', 'typing', 'block', 'moves',
+            'settings', 'math', '__future__'
         ],
         'max-attributes': 15
     })
@@ -0,0 +1,236 @@
+"""CSC148 Assignment 2
+
+=== CSC148 Winter 2020 ===
+Department of Computer Science,
+University of Toronto
+
+This code is provided solely for the personal and private use of
+students taking the CSC148 course at the University of Toronto.
+Copying for purposes other than this use is expressly prohibited.
+All forms of distribution of this code, whether as given or with
+any changes, are expressly prohibited.
+
+Authors: Diane Horton, David Liu, Mario Badr, Sophia Huynh, Misha Schwartz,
+and Jaisie Sin
+
+All of the files in this directory and all subdirectories are:
+Copyright (c) Diane Horton, David Liu, Mario Badr, Sophia Huynh,
+Misha Schwartz, and Jaisie Sin.
+
+=== Module Description ===
+
+This file is a script that tests a game server (see the server module) under
+load, by connecting many bots to it at once. Each bot plays one game, making
+random moves that can be done on its own copy of the board, which it keeps up
+to date from the moves the server sends. For example:
+
+    python load_test.py --serve --bots 400 --players 2 --turns 20
+
+plays 200 games between 400 bots on a server started in the same process on
+localhost, and reports the number of moves played a second and percentiles of
+the time from a bot sending a move to seeing it done. Without --serve, the
+bots connect to a server that is already running, which must have a number of
+players in each game that divides the number of bots.
+"""
+from __future__ import annotations
+import argparse
+import asyncio
+import json
+import random
+import time
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+from actions import SMASH, PASS
+from block import Block, decode_block, decode_board
+from book import GOAL_TYPES
+from goal import BlobGoal, PerimeterGoal
+from moves import ROOT_PATH, Move, apply_move, block_at_path, create_move, \
+    legal_moves
+from seeds import derive_seed
+from server import GameServer
+from settings import BOARD_SIZE, COLOUR_LIST
+from stats import PhaseStats
+
+# The name of the random stream that the bots' random streams are derived
+# from.
+LOAD_TEST_STREAM = 'load test'
+
+Connect = Callable[[], Awaitable[Tuple[asyncio.StreamReader,
+                                       asyncio.StreamWriter]]]
+
+
+def choose_bot_move(board: Block, colour: Tuple[int, int, int],
+                    rng: random.Random) -> Move:
+    """Return a random move that can be done on <board> by a player whose
+    goal has <colour>, or a pass if there is none.
+    """
+    moves = legal_moves(board, colour)
+    if not moves:
+        return create_move(PASS, ROOT_PATH)
+    return rng.choice(moves)
+
+
+async def play_bot(reader: asyncio.StreamReader,
+                   writer: asyncio.StreamWriter, rng: random.Random,
+                   think_time: float = 0.0) -> dict:
+    """Play one game on a server as a bot, over <reader> and <writer>, and
+    return a report of it.
+
+    The bot makes random moves drawn from <rng>, after thinking for up to
+    <think_time> seconds. The report has the game number, the bot's player
+    ID, every player's goal, the final scores and winner sent by the server,
+    the bot's copy of the board at the end of the game, and the number of
+    seconds from sending each move to seeing it done.
+
+    Raise ConnectionError if the server closes the connection before the game
+    is over.
+    """
+    board = None
+    goals = []
+    report = {'latencies': []}
+    sent = None
+    while True:
+        line = await reader.readline()
+        if not line:
+            raise ConnectionError('The server closed the connection before '
+                                  'the game was over')
+        message = json.loads(line)
+
+        if message['type'] == 'start':
+            board = decode_board(bytes.fromhex(message['board']), BOARD_SIZE)
+            goals = [[PerimeterGoal, BlobGoal][GOAL_TYPES.index(name)](
+                COLOUR_LIST[colour]) for name, colour in message['goals']]
+            report['game'] = message['game']
+            report['player'] = message['player']
+            report['goals'] = goals
+        elif message['type'] == 'your_move':
+            if think_time > 0:
+                await asyncio.sleep(rng.uniform(0, think_time))
+            move = choose_bot_move(board, goals[report['player']].colour, rng)
+            writer.write(json.dumps({
+                'move': message['move'], 'action': move[0],
+                'direction': move[1], 'path': move[2]}).encode() + b'\n')
+            await writer.drain()
+            sent = time.perf_counter()
+        elif message['type'] == 'move':
+            player_id = message['player']
+            move = tuple(message['move'])
+            if (move[0], move[1]) == SMASH:
+                decode_block(block_at_path(board, move[2]),
+                             bytes.fromhex(message['outcome']))
+            else:
+                apply_move(board, move, goals[player_id].colour)
+            if player_id == report['player'] and sent is not None:
+                report['latencies'].append(time.perf_counter() - sent)
+                sent = None
+        elif message['type'] == 'end':
+            writer.close()
+            report['scores'] = [tuple(score) for score in message['scores']]
+            report['winner'] = message['winner']
+            report['board'] = board
+            return report
+
+
+async def load_test(connect: Connect, num_bots: int, seed: int = 0,
+                    think_time: float = 0.0) -> List[dict]:
+    """Connect <num_bots> bots to a server with <connect>, play their games
+    at once, and return each bot's report as play_bot gives it.
+
+    Each bot's moves are drawn from a random stream derived from <seed>.
+    """
+    async def run_bot(index: int) -> dict:
+        """Connect bot <index> and play its game."""
+        reader, writer = await connect()
+        rng = random.Random(derive_seed(seed, LOAD_TEST_STREAM, index))
+        return await play_bot(reader, writer, rng, think_time)
+
+    return list(await asyncio.gather(*[run_bot(i) for i in range(num_bots)]))
+
+
+async def _run(options: argparse.Namespace) -> Tuple[List[dict], float]:
+    """Run the load test described by <options>, and return the bots' reports
+    and the number of seconds it took.
+    """
+    listener = None
+    host, port = options.host, options.port
+    if options.serve:
+        server = GameServer(options.players, options.max_depth,
+                            options.turns, options.timeout, options.seed)
+        listener = await server.start_tcp('127.0.0.1', 0)
+        host, port = listener.sockets[0].getsockname()[:2]
+
+    if options.unix is not None and not options.serve:
+        async def connect() -> Tuple[asyncio.StreamReader,
+                                     asyncio.StreamWriter]:
+            """Connect to the server's Unix socket."""
+            return await asyncio.open_unix_connection(options.unix)
+    else:
+        async def connect() -> Tuple[asyncio.StreamReader,
+                                     asyncio.StreamWriter]:
+            """Connect to the server's host and port."""
+            return await asyncio.open_connection(host, port)
+
+    start = time.perf_counter()
+    reports = await load_test(connect, options.bots, options.seed,
+                              options.think)
+    elapsed = time.perf_counter() - start
+    if listener is not None:
+        listener.close()
+        await listener.wait_closed()
+    return reports, elapsed
+
+
+def main(args: Optional[List[str]] = None) -> List[dict]:
+    """Run the load test described by the command line <args>, print its
+    report, and return the bots' reports as play_bot gives them.
+    """
+    parser = argparse.ArgumentParser(description='Load test a game server.')
+    parser.add_argument('--host', default='127.0.0.1',
+                        help='the address of the server')
+    parser.add_argument('--port', type=int, default=14800,
+                        help='the port of the server')
+    parser.add_argument('--unix', default=None,
+                        help='the Unix socket of the server, if it has one')
+    parser.add_argument('--bots', type=int, default=200,
+                        help='the number of bots to connect')
+    parser.add_argument('--think', type=float, default=0.0,
+                        help='the most seconds a bot thinks before moving')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='the seed that the random streams are derived '
+                             'from')
+    parser.add_argument('--serve', action='store_true',
+                        help='start a server on localhost in this process')
+    parser.add_argument('--players', type=int, default=2,
+                        help='the number of players in each game, with '
+                             '--serve')
+    parser.add_argument('--max-depth', type=int, default=3,
+                        help='the max_depth of the boards, with --serve')
+    parser.add_argument('--turns', type=int, default=10,
+                        help='the number of turns in each game, with --serve')
+    parser.add_argument('--timeout', type=float, default=5.0,
+                        help='the number of seconds a player has to move, '
+                             'with --serve')
+    options = parser.parse_args(args)
+    if options.serve and options.bots % options.players != 0:
+        parser.error('the number of players in a game must divide the '
+                     'number of bots')
+
+    reports, elapsed = asyncio.run(_run(options))
+
+    stats = PhaseStats(window=sum(len(r['latencies']) for r in reports) + 1)
+    for report in reports:
+        for latency in report['latencies']:
+            stats.add('move latency', latency)
+    moves = stats.summary()[0]['count'] if reports else 0
+    games = len({report['game'] for report in reports})
+    print(f'{len(reports)} bots played {games} games and {moves} moves in '
+          f'{elapsed:.2f}s ({moves / elapsed:.0f} moves/s)')
+    if moves:
+        print(f'Move latency: p50 {stats.percentile("move latency", 50):.4f}s'
+              f', p90 {stats.percentile("move latency", 90):.4f}s, '
+              f'p99 {stats.percentile("move latency", 99):.4f}s')
+    return reports
+
+
+if __name__ == '__main__':
+    main()
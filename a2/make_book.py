@@ -0,0 +1,111 @@
+"""CSC148 Assignment 2
+
+=== CSC148 Winter 2020 ===
+Department of Computer Science,
+University of Toronto
+
+This code is provided solely for the personal and private use of
+students taking the CSC148 course at the University of Toronto.
+Copying for purposes other than this use is expressly prohibited.
+All forms of distribution of this code, whether as given or with
+any changes, are expressly prohibited.
+
+Authors: Diane Horton, David Liu, Mario Badr, Sophia Huynh, Misha Schwartz,
+and Jaisie Sin
+
+All of the files in this directory and all subdirectories are:
+Copyright (c) Diane Horton, David Liu, Mario Badr, Sophia Huynh,
+Misha Schwartz, and Jaisie Sin.
+
+=== Module Description ===
+
+This file is a script that generates an opening book (see the book module) by
+searching the starting boards of a range of game seeds offline.
+
+A game started with one of those seeds, with the same max_depth, begins on a
+board that is in the book, so its computer players do not search on their
+first turn. For example:
+
+    python make_book.py --first-seed 0 --seeds 1000 --output opening_book.bin
+
+and then Game(..., seed=<a seed from 0 to 999>,
+book_path='opening_book.bin').
+
+If the output file is already a book, its moves are kept, and a move found
+again replaces the old one.
+"""
+import argparse
+from typing import Dict, List, Optional
+
+from block import generate_board
+from book import book_entry, open_book, write_book
+from evaluation import EvaluationCache
+from goal import BlobGoal, PerimeterGoal
+from moves import Move
+from player import BeamPlayer
+from seeds import BOARD_STREAM, make_rng
+from settings import BOARD_SIZE, COLOUR_LIST
+
+# The name of the random stream that the offline search draws from.
+BOOK_STREAM = 'book'
+
+
+def search_seed(seed: int, max_depth: int, width: int, depth: int,
+                cache: EvaluationCache) -> Dict[bytes, Move]:
+    """Return the book entries for the starting board of the game seeded by
+    <seed>: one for each goal type and colour.
+
+    The moves are found by a BeamPlayer with the given <width> and <depth>.
+    """
+    board = generate_board(max_depth, BOARD_SIZE, make_rng(seed, BOARD_STREAM))
+    entries = {}
+    for goal_type in [PerimeterGoal, BlobGoal]:
+        for colour in COLOUR_LIST:
+            goal = goal_type(colour)
+            player = BeamPlayer(0, goal, width, depth)
+            player.rng = make_rng(seed, BOOK_STREAM, goal_type.__name__,
+                                  COLOUR_LIST.index(colour))
+            player.cache = cache
+            player._proceed = True
+            key, move = book_entry(board, goal, player.generate_move(board))
+            entries[key] = move
+    return entries
+
+
+def main(args: Optional[List[str]] = None) -> None:
+    """Generate an opening book as described by the command line <args>.
+    """
+    parser = argparse.ArgumentParser(description='Generate an opening book.')
+    parser.add_argument('--first-seed', type=int, default=0,
+                        help='the first game seed to search')
+    parser.add_argument('--seeds', type=int, default=100,
+                        help='the number of game seeds to search')
+    parser.add_argument('--max-depth', type=int, default=3,
+                        help='the max_depth of the boards')
+    parser.add_argument('--width', type=int, default=4,
+                        help='the beam width of the search')
+    parser.add_argument('--depth', type=int, default=2,
+                        help='the number of moves the search looks ahead')
+    parser.add_argument('--output', default='opening_book.bin',
+                        help='the book file to write')
+    options = parser.parse_args(args)
+
+    entries = {}
+    old_book = open_book(options.output)
+    if old_book is not None:
+        entries.update(old_book.entries())
+        old_book.close()
+
+    cache = EvaluationCache()
+    for seed in range(options.first_seed,
+                      options.first_seed + options.seeds):
+        entries.update(search_seed(seed, options.max_depth, options.width,
+                                   options.depth, cache))
+        cache.advance()
+
+    write_book(options.output, entries)
+    print(f'Wrote {len(entries)} moves to {options.output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""CSC148 Assignment 2
+
+=== CSC148 Winter 2020 ===
+Department of Computer Science,
+University of Toronto
+
+This code is provided solely for the personal and private use of
+students taking the CSC148 course at the University of Toronto.
+Copying for purposes other than this use is expressly prohibited.
+All forms of distribution of this code, whether as given or with
+any changes, are expressly prohibited.
+
+Authors: Diane Horton, David Liu, Mario Badr, Sophia Huynh, Misha Schwartz,
+and Jaisie Sin
+
+All of the files in this directory and all subdirectories are:
+Copyright (c) Diane Horton, David Liu, Mario Badr, Sophia Huynh,
+Misha Schwartz, and Jaisie Sin.
+
+=== Module Description ===
+
+This file is a script that generates an endgame table (see the endgame module)
+by solving, for every goal, the starting boards of a range of game seeds with
+max_depth ENDGAME_MAX_DEPTH. Every board that the solver reaches is added to
+the table, not just the starting boards. For example:
+
+    python make_endgame.py --seeds 100 --turns 4 --output endgame.bin
+
+and then Game(2, ..., endgame_path='endgame.bin').
+
+If the output file is already a table, its moves are kept. The time spent
+solving and the size of the table are reported at the end.
+"""
+import argparse
+import os
+from typing import List, Optional
+
+from block import generate_board
+from book import open_book, write_book
+from endgame import ENDGAME_MAX_DEPTH, EndgameSolver
+from goal import BlobGoal, PerimeterGoal
+from seeds import BOARD_STREAM, make_rng
+from settings import BOARD_SIZE, COLOUR_LIST
+
+
+def main(args: Optional[List[str]] = None) -> None:
+    """Generate an endgame table as described by the command line <args>.
+    """
+    parser = argparse.ArgumentParser(description='Generate an endgame table.')
+    parser.add_argument('--first-seed', type=int, default=0,
+                        help='the first game seed to solve')
+    parser.add_argument('--seeds', type=int, default=10,
+                        help='the number of game seeds to solve')
+    parser.add_argument('--turns', type=int, default=3,
+                        help='the most turns left to solve for')
+    parser.add_argument('--output', default='endgame.bin',
+                        help='the table file to write')
+    options = parser.parse_args(args)
+
+    entries = {}
+    old_table = open_book(options.output)
+    if old_table is not None:
+        entries.update(old_table.entries())
+        old_table.close()
+
+    goals = [goal_type(colour) for goal_type in [PerimeterGoal, BlobGoal]
+             for colour in COLOUR_LIST]
+    solvers = [EndgameSolver(goal) for goal in goals]
+    for seed in range(options.first_seed,
+                      options.first_seed + options.seeds):
+        board = generate_board(ENDGAME_MAX_DEPTH, BOARD_SIZE,
+                               make_rng(seed, BOARD_STREAM))
+        for solver in solvers:
+            solver.solve(board, options.turns)
+
+    for solver in solvers:
+        entries.update(solver.entries())
+    write_book(options.output, entries)
+
+    solve_time = sum(solver.solve_time for solver in solvers)
+    states = sum(solver.states for solver in solvers)
+    print(f'Searched {states} boards in {solve_time:.2f}s')
+    print(f'Wrote {len(entries)} moves to {options.output} '
+          f'({os.path.getsize(options.output)} bytes)')
+
+
+if __name__ == '__main__':
+    main()
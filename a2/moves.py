@@ -0,0 +1,252 @@
+"""CSC148 Assignment 2
+
+=== CSC148 Winter 2020 ===
+Department of Computer Science,
+University of Toronto
+
+This code is provided solely for the personal and private use of
+students taking the CSC148 course at the University of Toronto.
+Copying for purposes other than this use is expressly prohibited.
+All forms of distribution of this code, whether as given or with
+any changes, are expressly prohibited.
+
+Authors: Diane Horton, David Liu, Mario Badr, Sophia Huynh, Misha Schwartz,
+and Jaisie Sin
+
+All of the files in this directory and all subdirectories are:
+Copyright (c) Diane Horton, David Liu, Mario Badr, Sophia Huynh,
+Misha Schwartz, and Jaisie Sin.
+
+=== Module Description ===
+
+This file contains the moves that players make, and the paths that moves use
+to name the block they act on.
+
+A path names a block by the child indices taken to reach it from the root of
+the board, packed into an int: the root is ROOT_PATH, and the path to child
+<i> of the block at <path> is (path << 2) | i. Since a path does not refer to
+any particular Block object, the same move can be done on any copy of a board.
+
+A move is a tuple of an action name, an optional direction and a path, such as
+('rotate', 1, ROOT_PATH).
+"""
+from __future__ import annotations
+import random
+from typing import List, Optional, Tuple
+
+from block import Block
+from actions import ROTATE_CLOCKWISE, ROTATE_COUNTER_CLOCKWISE, \
+    SWAP_HORIZONTAL, SWAP_VERTICAL, SMASH, PASS, PAINT, COMBINE
+
+Move = Tuple[str, Optional[int], int]
+
+# The path of the root of a board.
+ROOT_PATH = 1
+
+# The actions that only move a block's unit cells around, without changing
+# their colours.
+COLOUR_PRESERVING_ACTIONS = [ROTATE_CLOCKWISE, ROTATE_COUNTER_CLOCKWISE,
+                             SWAP_HORIZONTAL, SWAP_VERTICAL]
+
+# Every action, in the order used to pack a move into an int.
+MOVE_ACTIONS = [ROTATE_CLOCKWISE, ROTATE_COUNTER_CLOCKWISE, SWAP_HORIZONTAL,
+                SWAP_VERTICAL, SMASH, PAINT, COMBINE, PASS]
+
+# The child index of the quadrant that is (right, bottom) of its parent's
+# centre, indexed by [bottom][right].
+QUADRANT_INDEX = [[1, 0], [2, 3]]
+
+
+def child_path(path: int, index: int) -> int:
+    """Return the path of child <index> of the block at <path>.
+
+    >>> path_indices(child_path(child_path(ROOT_PATH, 3), 0))
+    [3, 0]
+    """
+    return (path << 2) | index
+
+
+def path_depth(path: int) -> int:
+    """Return the level of the block at <path>.
+
+    >>> path_depth(ROOT_PATH)
+    0
+    >>> path_depth(child_path(ROOT_PATH, 2))
+    1
+    """
+    return (path.bit_length() - 1) >> 1
+
+
+def path_indices(path: int) -> List[int]:
+    """Return the child indices taken from the root to reach <path>, in order.
+    """
+    indices = []
+    for shift in range(2 * path_depth(path) - 2, -1, -2):
+        indices.append((path >> shift) & 3)
+    return indices
+
+
+def cell_path(col: int, row: int, max_depth: int) -> int:
+    """Return the path of the unit cell at column <col> and row <row> of a
+    board with <max_depth>, as indexed by goal._flatten.
+
+    >>> cell_path(0, 0, 1) == child_path(ROOT_PATH, 1)
+    True
+    """
+    path = ROOT_PATH
+    for shift in range(max_depth - 1, -1, -1):
+        bottom = (row >> shift) & 1
+        right = (col >> shift) & 1
+        path = child_path(path, QUADRANT_INDEX[bottom][right])
+    return path
+
+
+def path_region(path: int, max_depth: int) -> Tuple[int, int, int]:
+    """Return (column, row, side) for the block at <path> on a board with
+    <max_depth>, where (<column>, <row>) is the block's upper left unit cell,
+    as indexed by goal._flatten, and <side> is its size in unit cells.
+
+    >>> path_region(ROOT_PATH, 2)
+    (0, 0, 4)
+    >>> path_region(child_path(child_path(ROOT_PATH, 3), 0), 2)
+    (3, 2, 1)
+    """
+    col = 0
+    row = 0
+    side = 2 ** max_depth
+    for index in path_indices(path):
+        side //= 2
+        if index in [0, 3]:
+            col += side
+        if index in [2, 3]:
+            row += side
+    return col, row, side
+
+
+def block_at_path(board: Block, path: int) -> Optional[Block]:
+    """Return the block of <board> at <path>, or None if <path> goes below a
+    leaf of <board>.
+    """
+    block = board
+    for index in path_indices(path):
+        if not block.children:
+            return None
+        block = block.children[index]
+    return block
+
+
+def create_move(action: Tuple[str, Optional[int]], path: int) -> Move:
+    """Return the move that does <action> on the block at <path>.
+    """
+    return action[0], action[1], path
+
+
+def pack_move(move: Move) -> int:
+    """Return <move> packed into a single non-negative int.
+
+    >>> unpack_move(pack_move(('swap', 1, 22)))
+    ('swap', 1, 22)
+    """
+    return (move[2] << 3) | MOVE_ACTIONS.index((move[0], move[1]))
+
+
+def unpack_move(packed: int) -> Move:
+    """Return the move that pack_move packed into <packed>.
+    """
+    return create_move(MOVE_ACTIONS[packed & 7], packed >> 3)
+
+
+def is_legal(board: Block, move: Move, colour: Tuple[int, int, int]) -> bool:
+    """Return True iff apply_move(<board>, <move>, <colour>) would perform
+    <move>.
+
+    This function does not mutate <board>.
+    """
+    action = (move[0], move[1])
+    block = block_at_path(board, move[2])
+
+    if block is None:
+        return False
+    elif action in [ROTATE_CLOCKWISE, ROTATE_COUNTER_CLOCKWISE, SWAP_HORIZONTAL,
+                    SWAP_VERTICAL]:
+        return block.children != []
+    elif action == SMASH:
+        return block.smashable()
+    elif action == PAINT:
+        return not block.children and block.level == block.max_depth and \
+            block.colour != colour
+    elif action == COMBINE:
+        return block.combinable()
+    else:
+        return action == PASS
+
+
+def legal_moves(board: Block, colour: Tuple[int, int, int]) -> List[Move]:
+    """Return every move other than PASS that can be performed on <board> by a
+    player whose goal has <colour>.
+
+    The moves are in a fixed order: blocks are visited parent first, then
+    children in order, and each block's moves follow the order of
+    MOVE_ACTIONS.
+
+    This function does not mutate <board>.
+    """
+    moves = []
+
+    def legal_moves_helper(block: Block, path: int) -> None:
+        """Append the legal moves on <block>, whose path is <path>, and on its
+        descendants to moves.
+        """
+        if block.children:
+            for action in [ROTATE_CLOCKWISE, ROTATE_COUNTER_CLOCKWISE,
+                           SWAP_HORIZONTAL, SWAP_VERTICAL]:
+                moves.append(create_move(action, path))
+            if block.combinable():
+                moves.append(create_move(COMBINE, path))
+            for i in range(len(block.children)):
+                legal_moves_helper(block.children[i], child_path(path, i))
+        elif block.smashable():
+            moves.append(create_move(SMASH, path))
+        elif block.level == block.max_depth and block.colour != colour:
+            moves.append(create_move(PAINT, path))
+
+    legal_moves_helper(board, ROOT_PATH)
+    return moves
+
+
+def apply_move(board: Block, move: Move, colour: Tuple[int, int, int],
+               rng: Optional[random.Random] = None) -> bool:
+    """Do <move> on <board>, painting with <colour> if it is a paint, and
+    drawing from <rng> if it is a smash (see Block.smash).
+
+    Return True iff the move was performed. A move whose path is not on
+    <board> is not performed.
+    """
+    action = (move[0], move[1])
+    block = block_at_path(board, move[2])
+
+    if block is None:
+        return False
+    elif action in [ROTATE_CLOCKWISE, ROTATE_COUNTER_CLOCKWISE]:
+        return block.rotate(move[1])
+    elif action in [SWAP_HORIZONTAL, SWAP_VERTICAL]:
+        return block.swap(move[1])
+    elif action == SMASH:
+        return block.smash(rng)
+    elif action == PAINT:
+        return block.paint(colour)
+    elif action == COMBINE:
+        return block.combine()
+    else:
+        # A pass always succeeds and does nothing.
+        return action == PASS
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(config={
+        'allowed-import-modules': [
+            'doctest', 'python_ta', 'random', 'typing', '__future__', 'block',
+            'actions'
+        ]
+    })
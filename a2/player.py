@@ -24,39 +24,77 @@ This file contains the hierarchy of player classes.
 from __future__ import annotations
 from typing import List, Optional, Tuple
 import random
-import pygame
-
-from block import Block
+try:
+    import pygame
+except ImportError:
+    # Computer players can be used without pygame, by the headless engine.
+    pygame = None
+
+from block import Block, decode_board, encode_board
+from book import OpeningBook
+from endgame import ENDGAME_MAX_DEPTH, ENDGAME_SOLVE_TURNS, EndgameSolver, \
+    endgame_key
+from evaluation import ILLEGAL, EvaluationCache, SearchMemory
 from goal import Goal, generate_goals
+from moves import Move, QUADRANT_INDEX, ROOT_PATH, apply_move, block_at_path, \
+    cell_path, child_path, create_move, is_legal, legal_moves, pack_move, \
+    path_depth, path_region
+from protocol import ENGINE_MOVE_TIME, format_position, get_engine_pool
+from seeds import GOALS_STREAM, PLAYER_STREAM, make_rng
+from symmetry import canonical_encoding, inverse_symmetry, transform_move
 
 from actions import KEY_ACTION, ROTATE_CLOCKWISE, ROTATE_COUNTER_CLOCKWISE, \
-    SWAP_HORIZONTAL, SWAP_VERTICAL, SMASH, PASS, PAINT, COMBINE
+    SWAP_HORIZONTAL, SWAP_VERTICAL, SMASH, PASS, PAINT, COMBINE, ACTION_PENALTY
 
 # Num moves = 7 0 - 6
 ACTIONS = [ROTATE_CLOCKWISE, ROTATE_COUNTER_CLOCKWISE, SWAP_HORIZONTAL,
            SWAP_VERTICAL, SMASH, PAINT, COMBINE]
 SMART_ACTIONS = [ROTATE_CLOCKWISE, ROTATE_COUNTER_CLOCKWISE, SWAP_HORIZONTAL,
                  SWAP_VERTICAL, SMASH, PAINT, COMBINE, PASS]
+# The indices into ACTIONS that SmartPlayer samples. Paints are not sampled
+# since every paint is scored at once by Goal.paint_scores.
+SAMPLED_ACTIONS = [i for i in range(len(ACTIONS)) if ACTIONS[i] != PAINT]
 
 
-def create_players(num_human: int, num_random: int, smart_players: List[int]) \
+def create_players(num_human: int, num_random: int, smart_players: List[int],
+                   beam_players: Optional[List[Tuple[int, int]]] = None,
+                   seed: Optional[int] = None,
+                   engine_players: Optional[List[str]] = None) \
         -> List[Player]:
     """Return a new list of Player objects.
 
     <num_human> is the number of human player, <num_random> is the number of
     random players, and <smart_players> is a list of difficulty levels for each
-    SmartPlayer that is to be created.
+    SmartPlayer that is to be created. <beam_players> is a list of the
+    (width, depth) of each BeamPlayer that is to be created.
 
     The list should contain <num_human> HumanPlayer objects first, then
     <num_random> RandomPlayer objects, then the same number of SmartPlayer
-    objects as the length of <smart_players>. The difficulty levels in
-    <smart_players> should be applied to each SmartPlayer object, in order.
+    objects as the length of <smart_players>, then the same number of
+    BeamPlayer objects as the length of <beam_players>. The difficulty levels in
+    <smart_players> should be applied to each SmartPlayer object, in order,
+    and likewise for the widths and depths in <beam_players>.
+
+    If <seed> is not None, it is the game seed: the goals and each player's
+    rng are seeded from it, so the same seed always gives the same players.
+
+    <engine_players> is a list of the commands of the engines of each
+    SubprocessPlayer that is to be created, after all the other players.
     """
+    if beam_players is None:
+        beam_players = []
+    if engine_players is None:
+        engine_players = []
 
     player_list = []
 
-    overall_num_players = num_human + num_random + len(smart_players)
-    goals = generate_goals(overall_num_players)
+    overall_num_players = num_human + num_random + len(smart_players) + \
+        len(beam_players) + len(engine_players)
+    if seed is None:
+        goals = generate_goals(overall_num_players)
+    else:
+        goals = generate_goals(overall_num_players,
+                               make_rng(seed, GOALS_STREAM))
     id_list = list(range(overall_num_players))
 
     for human_index in range(num_human):
@@ -74,9 +112,109 @@ def create_players(num_human: int, num_random: int, smart_players: List[int]) \
                                              smart_index],
                                        smart_players[smart_index]))
 
+    for width, depth in beam_players:
+        index = len(player_list)
+        player_list.append(BeamPlayer(id_list[index], goals[index], width,
+                                      depth))
+
+    for command in engine_players:
+        index = len(player_list)
+        player_list.append(SubprocessPlayer(id_list[index], goals[index],
+                                            command))
+
+    if seed is not None:
+        for player in player_list:
+            player.rng = make_rng(seed, PLAYER_STREAM, player.id)
+
     return player_list
 
 
+def _level_sizes(size: int, levels: int) -> Tuple[int, ...]:
+    """Return the sizes of a block of <size> and of its descendants at each of
+    the <levels> levels below it, in order from the block itself down.
+    """
+    if (size, levels) not in _LEVEL_SIZES:
+        sizes = [size]
+        for _ in range(levels):
+            sizes.append(round(sizes[-1] / 2.0))
+        _LEVEL_SIZES[(size, levels)] = tuple(sizes)
+    return _LEVEL_SIZES[(size, levels)]
+
+
+# The results of _level_sizes, which are the same for every board of a given
+# size and depth.
+_LEVEL_SIZES = {}
+
+
+def _locate(block: Block, location: Tuple[int, int], level: int) -> \
+        Tuple[Optional[Block], int]:
+    """Return the Block that _get_block(<block>, <location>, <level>) returns,
+    and its path from <block>.
+
+    At each level, the child that could include <location> is picked by
+    comparing <location> to the centre of the current block. Only that child
+    is then checked, since block sizes are rounded and a child may not lie
+    entirely inside its parent.
+    """
+    x, y = block.position
+    sizes = _level_sizes(block.size, block.max_depth - block.level)
+    path = ROOT_PATH
+    depth = 0
+
+    while level > 0 and block.children:
+        depth += 1
+        child_size = sizes[depth]
+        right = location[0] >= x + child_size
+        bottom = location[1] >= y + child_size
+        if right:
+            x += child_size
+        if bottom:
+            y += child_size
+        # Left and top but not bottom and right.
+        if not (x <= location[0] < x + child_size and
+                y <= location[1] < y + child_size):
+            return None, path
+
+        index = QUADRANT_INDEX[bottom][right]
+        block = block.children[index]
+        path = child_path(path, index)
+        level -= 1
+
+    return block, path
+
+
+def _cell_at(block: Block, location: Tuple[int, int], level: int) -> \
+        Tuple[int, int, int]:
+    """Return the (column, row, depth) of the cell that <location> is in when
+    <block> is divided into a grid of cells at <level>.
+
+    The cell is found with the same comparisons as _locate, but without
+    looking at the children of <block>. <depth> is less than <level> if
+    <location> falls outside a cell at <depth> + 1. Locations with the same
+    cell are located to the same block by _locate on any board with the
+    same size, position and max_depth as <block>.
+    """
+    x, y = block.position
+    sizes = _level_sizes(block.size, block.max_depth - block.level)
+    column, row = 0, 0
+
+    for depth in range(1, min(level, len(sizes) - 1) + 1):
+        child_size = sizes[depth]
+        right = location[0] >= x + child_size
+        bottom = location[1] >= y + child_size
+        if right:
+            x += child_size
+        if bottom:
+            y += child_size
+        if not (x <= location[0] < x + child_size and
+                y <= location[1] < y + child_size):
+            return column, row, depth - 1
+        column = column * 2 + right
+        row = row * 2 + bottom
+
+    return column, row, min(level, len(sizes) - 1)
+
+
 def _get_block(block: Block, location: Tuple[int, int], level: int) -> \
         Optional[Block]:
     """Return the Block within <block> that is at <level> and includes
@@ -95,46 +233,159 @@ def _get_block(block: Block, location: Tuple[int, int], level: int) -> \
     Preconditions:
         - 0 <= level <= max_depth
     """
+    return _locate(block, location, level)[0]
 
-    child_size = block._child_size()
-    child_positions = block._children_positions()
-    block_children = block.children
 
-    if level == 0:
-        return block
-    else:
-        # Left and top but not bottom and right.
-        for i in range(len(block_children)):
-            if child_positions[i][0] <= location[0] < (child_positions[i][0]
-                                                       + child_size) \
-                    and (child_positions[i][1]) <= location[1] < \
-                    child_positions[i][1] + child_size:
-                if level == 1:
-                    return block_children[i]
-                else:
-                    return _get_block(block_children[i], location, level - 1)
+def get_random_path(block: Block, random_block_level: int,
+                    rng: random.Random) -> int:
+    """Return the path of a random block within <block>, which must be the root
+    of its board.
 
-    return None
+    The block is found by choosing a random child from <rng> at each level,
+    stopping at <random_block_level> or at a leaf, whichever comes first.
+    """
+    path = ROOT_PATH
+    while block.level < random_block_level and block.children:
+        rc = rng.randint(0, 3)
+        block = block.children[rc]
+        path = child_path(path, rc)
 
+    return path
 
-def get_random_block(block: Block, random_block_level: int, random_child: int) \
-        -> Block:
-    """Returns a random block contained within block."""
-    rc = random.randint(0, 3)
 
-    if block.max_depth == 0 or random_block_level == 0 or not block.children:
-        return block
-    elif block.level == random_block_level:
-        for c in range(len(block.children)):
-            if c == random_child:
-                return block.children[c]
-    else:
-        return get_random_block(block.children[rc],
-                                random_block_level, random_child)
+def _score(goal: Goal, board: Block, cache: Optional[EvaluationCache],
+           board_key: Optional[bytes] = None) -> int:
+    """Return the score for <goal> on <board>, looking it up in and adding it
+    to <cache> unless <cache> is None.
+
+    <board_key> is encode_board(<board>), if it is already known.
+    """
+    if cache is None:
+        return goal.score(board)
+
+    if board_key is None:
+        board_key = encode_board(board)
+    score = cache.score(board_key, goal)
+    if score is None:
+        score = goal.score(board)
+        cache.store_score(board_key, goal, score)
+    return score
+
 
+def _score_move(goal: Goal, board: Block, move: Move,
+                cache: Optional[EvaluationCache],
+                board_key: Optional[bytes],
+                rng: Optional[random.Random] = None) -> Optional[int]:
+    """Return the score for <goal> after doing <move> on a copy of <board>, or
+    None if <move> cannot be done on <board>. A smash draws from <rng>.
+
+    Unless <cache> is None, the move's result and the score are looked up in
+    and added to <cache>, where <board_key> is encode_board(<board>).
+
+    This function does not mutate <board>.
+    """
+    if cache is None or (move[0], move[1]) == SMASH:
+        board_copy = board.create_copy()
+        if not apply_move(board_copy, move, goal.colour, rng):
+            return None
+        return goal.score(board_copy)
+
+    board_copy = None
+    result = cache.result(board_key, move, goal.colour)
+    if result is None:
+        board_copy = board.create_copy()
+        if apply_move(board_copy, move, goal.colour):
+            result = encode_board(board_copy)
+        else:
+            result = ILLEGAL
+        cache.store_result(board_key, move, goal.colour, result)
+
+    if result == ILLEGAL:
+        return None
+
+    score = cache.score(result, goal)
+    if score is None:
+        if board_copy is None:
+            board_copy = decode_board(result, board.size)
+        score = goal.score(board_copy)
+        cache.store_score(result, goal, score)
+    return score
+
+
+def _score_with_memory(goal: Goal, board: Block, move: Move,
+                       board_score: int, memory: SearchMemory,
+                       cache: Optional[EvaluationCache],
+                       board_key: Optional[bytes],
+                       rng: Optional[random.Random] = None) -> int:
+    """Return the score for <goal> after doing <move> on a copy of <board>,
+    whose score for <goal> is <board_score>. A smash draws from <rng>.
+
+    If <goal> is local, the change the move makes to the score is looked up in
+    and added to <memory>, so a move on a block that has not changed since an
+    earlier turn is not scored again. Otherwise this is _score_move.
+
+    Precondition: <move> can be done on <board>.
+    """
+    if not goal.is_local() or (move[0], move[1]) == SMASH:
+        return _score_move(goal, board, move, cache, board_key, rng)
+
+    packed = pack_move(move)
+    block = encode_board(block_at_path(board, move[2]))
+    delta = memory.delta(packed, block)
+    if delta is None:
+        score = _score_move(goal, board, move, cache, board_key)
+        memory.store_delta(packed, block, score - board_score)
+        return score
+    return board_score + delta
+
+
+def _book_move(book: Optional[OpeningBook], board: Block, goal: Goal) \
+        -> Optional[Move]:
+    """Return the move that <book> has for <goal> on <board>, or None if
+    <book> is None, has no move for them, or has a move that cannot be done on
+    <board>.
+    """
+    if book is None:
+        return None
+    move = book.lookup(board, goal)
+    if move is None or not _playable(board, move, goal.colour):
+        return None
+    return move
+
+
+def _endgame_move(table: Optional[OpeningBook], solver: EndgameSolver,
+                  board: Block, turns_left: Optional[int]) -> Optional[Move]:
+    """Return the best move for the goal of <solver> on <board> with
+    <turns_left> turns left, or None if this is not an endgame that can be
+    played perfectly.
+
+    The move is looked up in the endgame <table> if there is one, and is
+    otherwise found by <solver> if there are few enough turns left.
+    """
+    if turns_left is None or turns_left < 1 or \
+            board.max_depth > ENDGAME_MAX_DEPTH:
+        return None
+
+    goal = solver.goal
+    if table is not None:
+        position, symmetry = canonical_encoding(encode_board(board))
+        move = table.lookup_key(endgame_key(position, goal, turns_left))
+        if move is not None:
+            move = transform_move(move, inverse_symmetry(symmetry))
+            if _playable(board, move, goal.colour):
+                return move
+
+    if turns_left <= ENDGAME_SOLVE_TURNS:
+        return solver.solve(board, turns_left)[1]
     return None
 
 
+def _playable(board: Block, move: Move, colour: Tuple[int, int, int]) -> bool:
+    """Return True iff <move> is a pass, or can be done on <board> by a player
+    whose goal has <colour>.
+    """
+    return (move[0], move[1]) == PASS or is_legal(board, move, colour)
+
 
 class Player:
     """A player in the Blocky game.
@@ -146,15 +397,52 @@ class Player:
         This player's number.
     goal:
         This player's assigned goal for the game.
+    cache:
+        The evaluation cache shared by the computer players of this player's
+        game, or None if there is none.
+    rng:
+        The source of every random choice this player makes, including the
+        outcomes of the smashes it tries out while choosing a move. No other
+        player draws from it.
+    book:
+        The opening book that this player looks boards up in before searching,
+        or None if there is none.
+    endgame:
+        The endgame table that this player looks boards up in before searching,
+        or None if there is none.
+    turns_left:
+        The number of turns this player has left in the game, counting the
+        current one, or None if the player has not been told.
+    penalty:
+        The penalty of the moves this player has done so far in the game, or
+        None if the player has not been told.
     """
     id: int
     goal: Goal
+    cache: Optional[EvaluationCache]
+    rng: random.Random
+    book: Optional[OpeningBook]
+    endgame: Optional[OpeningBook]
+    turns_left: Optional[int]
+    penalty: Optional[int]
 
     def __init__(self, player_id: int, goal: Goal) -> None:
         """Initialize this Player.
         """
         self.goal = goal
         self.id = player_id
+        self.cache = None
+        self.rng = random.Random()
+        self.book = None
+        self.endgame = None
+        self.turns_left = None
+        self.penalty = None
+
+    def search_memory(self) -> Optional[SearchMemory]:
+        """Return what this player remembers of its searches from one turn to
+        the next, or None if it does not search.
+        """
+        return None
 
     def get_selected_block(self, board: Block) -> Optional[Block]:
         """Return the block that is currently selected by the player.
@@ -168,23 +456,22 @@ class Player:
         """
         raise NotImplementedError
 
-    def generate_move(self, board: Block) -> \
-            Optional[Tuple[str, Optional[int], Block]]:
+    def generate_move(self, board: Block) -> Optional[Move]:
         """Return a potential move to make on the game board.
 
         The move is a tuple consisting of a string, an optional integer, and
-        a block. The string indicates the move being made (i.e., rotate, swap,
+        a path. The string indicates the move being made (i.e., rotate, swap,
         or smash). The integer indicates the direction (i.e., for rotate and
-        swap). And the block indicates which block is being acted on.
+        swap). And the path names the block being acted on, as described in
+        the moves module.
 
         Return None if no move can be made, yet.
         """
         raise NotImplementedError
 
 
-def _create_move(action: Tuple[str, Optional[int]], block: Block) -> \
-        Tuple[str, Optional[int], Block]:
-    return action[0], action[1], block
+def _create_move(action: Tuple[str, Optional[int]], path: int) -> Move:
+    return create_move(action, path)
 
 
 class HumanPlayer(Player):
@@ -195,11 +482,24 @@ class HumanPlayer(Player):
     #     The level of the Block that the user selected most recently.
     # _desired_action:
     #     The most recent action that the user is attempting to do.
+    # _selection_board:
+    #     The board that _selection was found on, or None if nothing has been
+    #     selected yet.
+    # _selection_key:
+    #     The cell under the mouse at _level, as returned by _cell_at, and the
+    #     version of _selection_board that _selection was found for, or None
+    #     if nothing has been selected yet.
+    # _selection:
+    #     The selected block and its path, as returned by _locate, or None if
+    #     nothing has been selected yet.
     #
     # == Representation Invariants concerning the private attributes ==
     #     _level >= 0
     _level: int
     _desired_action: Optional[Tuple[str, Optional[int]]]
+    _selection_board: Optional[Block]
+    _selection_key: Optional[Tuple[Tuple[int, int, int], int]]
+    _selection: Optional[Tuple[Optional[Block], int]]
 
     def __init__(self, player_id: int, goal: Goal) -> None:
         """Initialize this HumanPlayer with the given <renderer>, <player_id>
@@ -211,6 +511,26 @@ class HumanPlayer(Player):
         # and _selected_block to None.
         self._level = 0
         self._desired_action = None
+        self._selection_board = None
+        self._selection_key = None
+        self._selection = None
+
+    def _select(self, board: Block) -> Tuple[Optional[Block], int]:
+        """Return the block that is currently selected by the player, or None,
+        and its path.
+
+        The selection is only looked up again once the mouse has moved to
+        another cell at the player's desired level, or <board> has changed
+        since the last call.
+        """
+        location = pygame.mouse.get_pos()
+        key = (_cell_at(board, location, self._level), board.version())
+        if board is not self._selection_board or key != self._selection_key:
+            self._selection = _locate(board, location, self._level)
+            self._selection_board = board
+            self._selection_key = key
+
+        return self._selection
 
     def get_selected_block(self, board: Block) -> Optional[Block]:
         """Return the block that is currently selected by the player based on
@@ -218,10 +538,7 @@ class HumanPlayer(Player):
 
         If no block is selected by the player, return None.
         """
-        mouse_pos = pygame.mouse.get_pos()
-        block = _get_block(board, mouse_pos, self._level)
-
-        return block
+        return self._select(board)[0]
 
     def process_event(self, event: pygame.event.Event) -> None:
         """Respond to the relevant keyboard events made by the player based on
@@ -238,38 +555,41 @@ class HumanPlayer(Player):
                 self._level += 1
                 self._desired_action = None
 
-    def generate_move(self, board: Block) -> \
-            Optional[Tuple[str, Optional[int], Block]]:
+    def generate_move(self, board: Block) -> Optional[Move]:
         """Return the move that the player would like to perform. The move may
         not be valid.
 
         Return None if the player is not currently selecting a block.
         """
-        block = self.get_selected_block(board)
+        block, path = self._select(board)
 
         if block is None or self._desired_action is None:
             return None
         else:
-            move = _create_move(self._desired_action, block)
+            move = _create_move(self._desired_action, path)
 
             self._desired_action = None
             return move
 
 
-class RandomPlayer(Player):
+class ComputerPlayer(Player):
+    """A player whose moves are chosen by the computer.
+
+    In the interactive game, a computer player waits for a click before
+    making each move. Elsewhere, such as in the headless engine, choose_move
+    is called directly.
     """
     # === Private Attributes ===
     # _proceed:
     #   True when the player should make a move, False when the player should
     #   wait.
     _proceed: bool
-    """
-    _proceed: bool
 
     def __init__(self, player_id: int, goal: Goal) -> None:
-        # TODO: Implement Me
-        self._proceed = False
+        """Initialize this ComputerPlayer.
+        """
         Player.__init__(self, player_id, goal)
+        self._proceed = False
 
     def get_selected_block(self, board: Block) -> Optional[Block]:
         return None
@@ -278,102 +598,86 @@ class RandomPlayer(Player):
         if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
             self._proceed = True
 
-    def generate_move(self, board: Block) ->\
-            Optional[Tuple[str, Optional[int], Block]]:
-        """Return a valid, randomly generated move.
+    def proceed(self) -> None:
+        """Tell this player to make its move the next time generate_move is
+        called, as a click would.
+        """
+        self._proceed = True
 
-        A valid move is a move other than PASS that can be successfully
-        performed on the <board>.
+    def waiting(self) -> bool:
+        """Return True iff this player is waiting to be told to proceed, so
+        that generate_move would return None.
+        """
+        return not self._proceed
+
+    def generate_move(self, board: Block) -> Optional[Move]:
+        """Return the move chosen by choose_move, or None if this player has
+        not yet been told to proceed.
 
         This function does not mutate <board>.
         """
         if not self._proceed:
             return None  # Do not remove
-        else:
-            can_make_move = False
-            while not can_make_move:
-
-                desired_action_index = random.randint(0, len(ACTIONS) - 1)
-                # Create a copy of the board.
-                board_copy = board.create_copy()
-                max_depth = board.max_depth
-                random_block_level = random.randint(0, max_depth)
-                random_child = random.randint(0, 3)
-                random_block = get_random_block \
-                    (board_copy, random_block_level, random_child)
-
-                if desired_action_index == 0:
-                    if random_block.rotate(1):
-                        actual_block = _get_block(board, random_block.position,
-                                                  random_block.level)
-                        move = _create_move(ACTIONS[0], actual_block)
-                        can_make_move = True
-                elif desired_action_index == 1:
-                    if random_block.rotate(3):
-                        actual_block = _get_block(board, random_block.position,
-                                                  random_block.level)
-                        move = _create_move(ACTIONS[1], actual_block)
-                        can_make_move = True
-                elif desired_action_index == 2:
-                    if random_block.swap(0):
-                        actual_block = _get_block(board, random_block.position,
-                                                  random_block.level)
-                        move = _create_move(ACTIONS[2], actual_block)
-                        can_make_move = True
-                elif desired_action_index == 3:
-                    if random_block.swap(1):
-                        actual_block = _get_block(board, random_block.position,
-                                                  random_block.level)
-                        move = _create_move(ACTIONS[3], actual_block)
-                        can_make_move = True
-                elif desired_action_index == 4:
-                    if random_block.smash():
-                        actual_block = _get_block(board, random_block.position,
-                                                  random_block.level)
-                        move = _create_move(ACTIONS[4], actual_block)
-                        can_make_move = True
-                elif desired_action_index == 5:
-                    if random_block.paint(self.goal.colour):
-                        actual_block = _get_block(board, random_block.position,
-                                                  random_block.level)
-                        move = _create_move(ACTIONS[5], actual_block)
-                        can_make_move = True
-                elif desired_action_index == 6:
-                    if random_block.combine():
-                        actual_block = _get_block(board, random_block.position,
-                                                  random_block.level)
-                        move = _create_move(ACTIONS[6], actual_block)
-                        can_make_move = True
 
+        move = self.choose_move(board)
         self._proceed = False  # Must set to False before returning!
         return move
 
+    def choose_move(self, board: Block) -> Move:
+        """Return the move this player makes on <board>, without waiting to be
+        told to proceed.
+
+        This function does not mutate <board>.
+        """
+        raise NotImplementedError
+
+
+class RandomPlayer(ComputerPlayer):
+    """A computer player that makes random valid moves.
+    """
+    def choose_move(self, board: Block) -> Move:
+        """Return a valid, randomly generated move.
+
+        A valid move is a move other than PASS that can be successfully
+        performed on the <board>.
+
+        This function does not mutate <board>.
+        """
+        can_make_move = False
+        while not can_make_move:
+            desired_action_index = self.rng.randint(0, len(ACTIONS) - 1)
+            random_block_level = self.rng.randint(0, board.max_depth)
+            move = _create_move(ACTIONS[desired_action_index],
+                                get_random_path(board, random_block_level,
+                                                self.rng))
+
+            # Check that the move is valid without doing it.
+            can_make_move = is_legal(board, move, self.goal.colour)
+
+        return move
+
 
-class SmartPlayer(Player):
+class SmartPlayer(ComputerPlayer):
     """
     # === Private Attributes ===
-    # _proceed:
-    #   True when the player should make a move, False when the player should
-    #   wait.
-    _proceed: bool
+    # _memory:
+    #   What this player remembers of its searches on earlier turns.
+    # _solver:
+    #   The solver of this player's endgames.
     """
-    _proceed: bool
     difficulty: int
+    _memory: SearchMemory
+    _solver: EndgameSolver
     def __init__(self, player_id: int, goal: Goal, difficulty: int) -> None:
-        # TODO: Implement Me
-        self._proceed = False
-        Player.__init__(self, player_id, goal)
+        ComputerPlayer.__init__(self, player_id, goal)
         self.difficulty = difficulty
+        self._memory = SearchMemory()
+        self._solver = EndgameSolver(goal)
 
-    def get_selected_block(self, board: Block) -> Optional[Block]:
-        return None
-
-    def process_event(self, event: pygame.event.Event) -> None:
-        if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
-            self._proceed = True
+    def search_memory(self) -> Optional[SearchMemory]:
+        return self._memory
 
-    def generate_move(self, board: Block) ->\
-            Optional[Tuple[str, Optional[int], Block]]:
+    def choose_move(self, board: Block) -> Move:
         """Return a valid move by assessing multiple valid moves and choosing
         the move that results in the highest score for this player's goal (i.e.,
         disregarding penalties).
@@ -382,126 +686,300 @@ class SmartPlayer(Player):
         performed on the <board>. If no move can be found that is better than
         the current score, this player will pass.
 
-        This function does not mutate <board>.
-        """
-        if not self._proceed:
-            return None  # Do not remove
-
-        moves = []
-        scores = []
-        initial_score = self.goal.score(board)
-        i = 0
-
-        while i < self.difficulty:
-            desired_action_index = random.randint(0, len(ACTIONS) - 1)
-            # Create a copy of the board.
-            # This is the copy.
-            board_copy = board.create_copy()
-
-            max_depth = board.max_depth
-            random_block_level = random.randint(0, max_depth)
-            random_child = random.randint(0, 3)
-
-            # We get a random block from this copy.
-            random_block = get_random_block \
-                    (board_copy, random_block_level, random_child)
-
-            if desired_action_index == 0:
+        <difficulty> different legal moves other than paints, or all of them
+        if there are fewer, are sampled at random, favouring the kinds of
+        moves and levels of blocks that were the best found on earlier
+        turns. Every possible paint is also considered, since paints
+        are cheap to score.
 
-                if random_block.rotate(1):
+        The sampled moves are scored in order of how well their kind and level
+        did before, so that good scores are found early. A sampled move is only
+        scored if the goal's delta_bound says that it could beat the best
+        score found so far; the others could never be chosen, so skipping them
+        does not change the move that is returned.
 
-                    actual_block = _get_block(board, random_block.position,
-                                              random_block.level)
+        If the game is in an endgame that can be played perfectly (see
+        _endgame_move), the best move is returned. Otherwise, if this player's
+        opening book has a move for <board>, that move is returned without
+        searching.
 
-                    move = _create_move(ACTIONS[0], actual_block)
-
-                    moves.append(move)
-
-
-                    random_block.rotate(1)
-                    scores.append(self.goal.score(board_copy))
-
-                    i += 1
-
-            elif desired_action_index == 1:
-                if random_block.rotate(3):
-                    actual_block = _get_block(board, random_block.position,
-                                              random_block.level)
-                    move = _create_move(ACTIONS[1], actual_block)
-                    moves.append(move)
-
-                    random_block.rotate(3)
-                    scores.append(self.goal.score(board_copy))
-
-                    i += 1
+        This function does not mutate <board>.
+        """
+        move = _endgame_move(self.endgame, self._solver, board,
+                             self.turns_left)
+        if move is None:
+            move = _book_move(self.book, board, self.goal)
+        if move is not None:
+            return move
 
-            elif desired_action_index == 2:
-                if random_block.swap(0):
-                    actual_block = _get_block(board, random_block.position,
-                                              random_block.level)
-                    move = _create_move(ACTIONS[2], actual_block)
-                    moves.append(move)
+        self._memory.start_turn()
+        board_key = None
+        if self.cache is not None:
+            board_key = encode_board(board)
+        initial_score = _score(self.goal, board, self.cache, board_key)
+        bounds = self.goal.prepare_bounds(board)
+
+        candidates = {move for move in legal_moves(board, self.goal.colour)
+                      if (move[0], move[1]) != PAINT}
+        num_samples = min(self.difficulty, len(candidates))
+        samples = []
+        action_weights = [self._memory.action_weight(ACTIONS[i])
+                          for i in SAMPLED_ACTIONS]
+        levels = list(range(board.max_depth + 1))
+        level_weights = [self._memory.level_weight(level) for level in levels]
+        while len(samples) < num_samples:
+            action = ACTIONS[self.rng.choices(SAMPLED_ACTIONS,
+                                              action_weights)[0]]
+            random_block_level = self.rng.choices(levels, level_weights)[0]
+            move = _create_move(action, get_random_path(board,
+                                                        random_block_level,
+                                                        self.rng))
+            if move in candidates:
+                candidates.remove(move)
+                samples.append(move)
+
+        # The best score found so far, and the index in samples of the move
+        # that scored it. Passing scores the initial score and comes before
+        # every sampled move, since a move has to beat the initial score to be
+        # chosen over passing. Of the moves with the best score, the one
+        # sampled first is chosen.
+        best_score = initial_score
+        best_index = -1
+        priorities = [self._memory.priority((move[0], move[1]),
+                                            path_depth(move[2]))
+                      for move in samples]
+        order = sorted(range(len(samples)), key=lambda k: -priorities[k])
+        for k in order:
+            move = samples[k]
+            action = (move[0], move[1])
+            # Smashes are never skipped, since a smash changes the random
+            # numbers that every later move sees.
+            if action != SMASH:
+                most = initial_score + self.goal.delta_bound(
+                    bounds, action, path_region(move[2], board.max_depth))
+                if most < best_score or (most == best_score and
+                                         k > best_index):
+                    continue
+
+            score = _score_with_memory(self.goal, board, move, initial_score,
+                                       self._memory, self.cache, board_key,
+                                       self.rng)
+            if score > best_score or (score == best_score and k < best_index):
+                best_score = score
+                best_index = k
+
+        # Only the best sampled move is recorded in the history, since which
+        # of the others were scored depends on what was skipped, and the
+        # history must not.
+        move = None
+        if best_index >= 0:
+            move = samples[best_index]
+            self._memory.record((move[0], move[1]), path_depth(move[2]),
+                                best_score - initial_score)
+
+        paint_scores = self.goal.paint_scores(board)
+        if paint_scores:
+            col, row, score = max(paint_scores, key=lambda item: item[2])
+            self._memory.record(PAINT, board.max_depth, score - initial_score)
+            if score > best_score:
+                move = _create_move(PAINT, cell_path(col, row,
+                                                     board.max_depth))
+
+        if move is None:
+            return _create_move(SMART_ACTIONS[7], ROOT_PATH)
+        else:
+            return move
 
-                    random_block.swap(0)
-                    scores.append(self.goal.score(board_copy))
-                    i += 1
 
-            elif desired_action_index == 3:
-                if random_block.swap(1):
-                    actual_block = _get_block(board, random_block.position,
-                                              random_block.level)
-                    move = _create_move(ACTIONS[3], actual_block)
-                    moves.append(move)
+class BeamPlayer(ComputerPlayer):
+    """A computer player that looks several of its own moves ahead.
 
-                    random_block.swap(1)
-                    scores.append(self.goal.score(board_copy))
+    At each step of the search, every legal move is tried on each board in the
+    beam, and the <width> resulting boards with the highest score for this
+    player's goal, less the penalties of the moves that led to them, are kept
+    for the next step. After <depth> steps, the first move of the best line
+    found is played.
 
-                    i += 1
+    === Public Attributes ===
+    width:
+        The number of boards kept at each step of the search.
+    depth:
+        The number of this player's own moves that are looked ahead.
+
+    === Representation Invariants ===
+    - width >= 1
+    - depth >= 1
+    """
+    # === Private Attributes ===
+    # _memory:
+    #   What this player remembers of its searches on earlier turns.
+    # _solver:
+    #   The solver of this player's endgames.
+    width: int
+    depth: int
+    _memory: SearchMemory
+    _solver: EndgameSolver
+
+    def __init__(self, player_id: int, goal: Goal, width: int,
+                 depth: int) -> None:
+        """Initialize this BeamPlayer with the given <player_id>, <goal>,
+        beam <width> and search <depth>.
+        """
+        ComputerPlayer.__init__(self, player_id, goal)
+        self.width = width
+        self.depth = depth
+        self._memory = SearchMemory()
+        self._solver = EndgameSolver(goal)
 
-            elif desired_action_index == 4:
-                if random_block.smash():
-                    actual_block = _get_block(board, random_block.position,
-                                              random_block.level)
-                    move = _create_move(ACTIONS[4], actual_block)
-                    moves.append(move)
+    def search_memory(self) -> Optional[SearchMemory]:
+        return self._memory
 
-                    random_block.smash()
-                    scores.append(self.goal.score(board_copy))
+    def choose_move(self, board: Block) -> Move:
+        """Return the first move of the best line of moves found by a beam
+        search, where a line is worth the score for this player's goal after
+        its moves, less their penalties.
 
-                    i += 1
+        If no line is worth more than the current score, this player will
+        pass.
 
-            elif desired_action_index == 5:
-                if random_block.paint(self.goal.colour):
+        Boards are only copied for the lines that are kept, except after a
+        smash, whose result is random and so has to be kept as it was scored.
 
-                    actual_block = _get_block(board, random_block.position,
-                                              random_block.level)
-                    move = _create_move(ACTIONS[5], actual_block)
-                    moves.append(move)
+        If the game is in an endgame that can be played perfectly (see
+        _endgame_move), the best move is returned. Otherwise, if this player's
+        opening book has a move for <board>, that move is returned without
+        searching.
 
-                    random_block.paint(self.goal.colour)
-                    scores.append(self.goal.score(board_copy))
+        This function does not mutate <board>.
+        """
+        move = _endgame_move(self.endgame, self._solver, board,
+                             self.turns_left)
+        if move is None:
+            move = _book_move(self.book, board, self.goal)
+        if move is not None:
+            return move
 
-                    i += 1
+        self._memory.start_turn()
+        best_value = _score(self.goal, board, self.cache)
+        best_move = _create_move(PASS, ROOT_PATH)
+        # Each entry is (value, penalty, board, first move of the line).
+        beam = [(best_value, 0, board, None)]
+
+        for _ in range(self.depth):
+            # Each entry is (value, penalty, board the move was done on, move,
+            # board after the move or None, first move of the line).
+            candidates = []
+            for value, penalty, line_board, first_move in beam:
+                line_score = value + penalty
+                line_key = None
+                if self.cache is not None:
+                    line_key = encode_board(line_board)
+                for move in legal_moves(line_board, self.goal.colour):
+                    action = (move[0], move[1])
+                    after = None
+                    if action == SMASH:
+                        after = line_board.create_copy()
+                        apply_move(after, move, self.goal.colour, self.rng)
+                        score = _score(self.goal, after, self.cache)
+                    else:
+                        score = _score_with_memory(
+                            self.goal, line_board, move, line_score,
+                            self._memory, self.cache, line_key)
+                    self._memory.record(action, path_depth(move[2]),
+                                        score - line_score)
+                    move_penalty = penalty + ACTION_PENALTY[action]
+                    if first_move is None:
+                        first_move_of_line = move
+                    else:
+                        first_move_of_line = first_move
+                    candidates.append((score - move_penalty, move_penalty,
+                                       line_board, move, after,
+                                       first_move_of_line))
+
+            if not candidates:
+                break
+            # The sort is stable, so equally good lines keep the order in
+            # which their moves were generated.
+            candidates.sort(key=lambda candidate: candidate[0], reverse=True)
+            beam = []
+            for value, penalty, line_board, move, after, first_move in \
+                    candidates[:self.width]:
+                if after is None:
+                    after = line_board.create_copy()
+                    apply_move(after, move, self.goal.colour)
+                beam.append((value, penalty, after, first_move))
+            if beam[0][0] > best_value:
+                best_value, best_move = beam[0][0], beam[0][3]
+
+        return best_move
+
+
+class SubprocessPlayer(ComputerPlayer):
+    """A computer player whose moves are chosen by an engine: a separate
+    program that speaks the engine protocol (see the protocol module).
+
+    Each move is chosen by an engine from the pool that the process shares for
+    the player's command, so engines keep running from one move, and one game,
+    to the next. The pool is started by the first move that needs it. If the
+    engine cannot be started, takes longer than move_time, exits, or chooses a
+    move that cannot be done, the player passes.
 
-            elif desired_action_index == 6:
-                if random_block.combine():
-                    actual_block = _get_block(board, random_block.position,
-                                              random_block.level)
-                    move = _create_move(ACTIONS[6], actual_block)
-                    moves.append(move)
+    === Public Attributes ===
+    command:
+        The command that starts this player's engine.
+    move_time:
+        The number of seconds the engine has to choose each move, or None if
+        it has no time limit.
+    failures:
+        The number of moves for which the engine did not choose a move that
+        could be done, so that this player passed.
+    """
+    command: str
+    move_time: Optional[float]
+    failures: int
+
+    def __init__(self, player_id: int, goal: Goal, command: str,
+                 move_time: Optional[float] = ENGINE_MOVE_TIME) -> None:
+        """Initialize this SubprocessPlayer with the given <player_id> and
+        <goal>, to play with the engine started by <command>.
+        """
+        ComputerPlayer.__init__(self, player_id, goal)
+        self.command = command
+        self.move_time = move_time
+        self.failures = 0
 
-                    random_block.combine()
-                    scores.append(self.goal.score(board_copy))
-                    i += 1
+    def choose_move(self, board: Block) -> Move:
+        """Return the move the engine chooses on <board>, or PASS if it does
+        not choose a move that can be done in time.
 
-        best_move_index = scores.index(max(scores))
+        The engine is told this player's penalty, or 0 if the player has not
+        been told it.
 
-        if max(scores) <= initial_score:
-            self._proceed = False
-            return _create_move(SMART_ACTIONS[7], board)
-        else:
-            self._proceed = False
-            return moves[best_move_index]
+        This function does not mutate <board>.
+        """
+        position = format_position(board, self.goal, self.penalty or 0,
+                                   self.turns_left)
+        try:
+            pool = get_engine_pool(self.command)
+            engine = pool.acquire()
+        except (ConnectionError, TimeoutError, OSError):
+            self.failures += 1
+            return create_move(PASS, ROOT_PATH)
+
+        try:
+            move = engine.best_move(position, self.move_time)
+        except (ConnectionError, TimeoutError, ValueError):
+            # The engine may still send a reply later, so it cannot be used
+            # again.
+            engine.kill()
+            self.failures += 1
+            return create_move(PASS, ROOT_PATH)
+        pool.release(engine)
+
+        if not is_legal(board, move, self.goal.colour):
+            self.failures += 1
+            return create_move(PASS, ROOT_PATH)
+        return move
 
 
 if __name__ == '__main__':
@@ -511,7 +989,8 @@ if __name__ == '__main__':
         'allowed-io': ['process_event'],
         'allowed-import-modules': [
             'doctest', 'python_ta', 'random', 'typing', 'actions', 'block',
-            'goal', 'pygame', '__future__'
+            'book', 'endgame', 'evaluation', 'goal', 'moves', 'protocol',
+            'pygame', 'seeds', 'symmetry', '__future__'
         ],
         'max-attributes': 10,
         'generated-members': 'pygame.*'
@@ -0,0 +1,235 @@
+"""CSC148 Assignment 2
+
+=== CSC148 Winter 2020 ===
+Department of Computer Science,
+University of Toronto
+
+This code is provided solely for the personal and private use of
+students taking the CSC148 course at the University of Toronto.
+Copying for purposes other than this use is expressly prohibited.
+All forms of distribution of this code, whether as given or with
+any changes, are expressly prohibited.
+
+Authors: Diane Horton, David Liu, Mario Badr, Sophia Huynh, Misha Schwartz,
+and Jaisie Sin
+
+All of the files in this directory and all subdirectories are:
+Copyright (c) Diane Horton, David Liu, Mario Badr, Sophia Huynh,
+Misha Schwartz, and Jaisie Sin.
+
+=== Module Description ===
+
+This file contains the profiler of a game, which finds out where the time and
+memory of a game go, broken down by game state and by player.
+
+Every profiled call is made under a key, such as 'MainState' or 'player 1',
+and each key has a cProfile profile and a record of the memory allocated
+while it was running, found with tracemalloc. Calls can be nested: while a
+call under one key makes a call under another, only the inner key is charged.
+So the copies and flattens done by a computer player while it chooses a move
+are charged to that player, and not to the game state that asked for the move.
+
+Profiling can be started and stopped while the game is running. When it
+stops, each key's statistics are written to files in a directory: a pstats
+file that the pstats module can read, a tracemalloc snapshot that
+tracemalloc.Snapshot.load can read, and a text file of the lines that
+allocated the most memory.
+"""
+from __future__ import annotations
+from typing import Callable, Dict, List, Optional
+import cProfile
+import os
+import signal
+import tracemalloc
+
+# The number of lines listed in each text file of allocations.
+TOP_ALLOCATIONS = 25
+
+
+class StateProfiler:
+    """A profiler of the game states and the players of a game.
+
+    === Public Attributes ===
+    directory:
+        The directory that statistics are written to.
+    use_cprofile:
+        Whether time is profiled with cProfile.
+    use_tracemalloc:
+        Whether memory is profiled with tracemalloc.
+    active:
+        Whether calls are being profiled.
+    """
+    # === Private Attributes ===
+    # _profiles:
+    #   A dictionary mapping each key to its profile.
+    # _allocations:
+    #   A dictionary mapping each key to a dictionary mapping each line of
+    #   code to the number of bytes and of blocks it allocated under the key.
+    # _snapshots:
+    #   A dictionary mapping each key to the memory snapshot taken when a call
+    #   under it last stopped being charged.
+    # _stack:
+    #   The keys of the calls being made, innermost last.
+    # _last:
+    #   The memory snapshot taken when the key being charged last changed,
+    #   or None if memory is not being profiled.
+    # _started_tracing:
+    #   Whether this profiler started tracemalloc, and so should stop it.
+    directory: str
+    use_cprofile: bool
+    use_tracemalloc: bool
+    active: bool
+    _profiles: Dict[str, cProfile.Profile]
+    _allocations: Dict[str, Dict[str, List[int]]]
+    _snapshots: Dict[str, tracemalloc.Snapshot]
+    _stack: List[str]
+    _last: Optional[tracemalloc.Snapshot]
+    _started_tracing: bool
+
+    def __init__(self, directory: str, use_cprofile: bool = True,
+                 use_tracemalloc: bool = False) -> None:
+        """Initialize this profiler, which is not active yet, to write to
+        <directory>.
+        """
+        self.directory = directory
+        self.use_cprofile = use_cprofile
+        self.use_tracemalloc = use_tracemalloc
+        self.active = False
+        self._profiles = {}
+        self._allocations = {}
+        self._snapshots = {}
+        self._stack = []
+        self._last = None
+        self._started_tracing = False
+
+    def start(self) -> None:
+        """Start profiling calls, with empty statistics.
+        """
+        self._profiles = {}
+        self._allocations = {}
+        self._snapshots = {}
+        if self.use_tracemalloc:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._started_tracing = True
+            self._last = self._snapshot()
+        self.active = True
+
+    def stop(self) -> None:
+        """Stop profiling calls, and write the statistics to the directory.
+
+        A call that is still running is profiled to its end.
+        """
+        self.active = False
+        self.write()
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+        self._last = None
+
+    def toggle(self) -> None:
+        """Stop profiling if calls are being profiled, and start otherwise.
+        """
+        if self.active:
+            self.stop()
+        else:
+            self.start()
+
+    def run(self, key: str, function: Callable, *args: object) -> object:
+        """Return function(*<args>), profiled under <key> if this profiler is
+        active.
+        """
+        if not self.active:
+            return function(*args)
+        self._switch(key)
+        try:
+            return function(*args)
+        finally:
+            self._switch(None)
+
+    def _switch(self, key: Optional[str]) -> None:
+        """Stop charging the current key, and start charging <key>, which is
+        pushed onto the stack. If <key> is None, the current key is popped off
+        the stack instead, and the key under it is charged again.
+        """
+        if self._stack:
+            current = self._stack[-1]
+            if current in self._profiles:
+                self._profiles[current].disable()
+            if self._last is not None:
+                snapshot = self._snapshot()
+                allocations = self._allocations.setdefault(current, {})
+                for stat in snapshot.compare_to(self._last, 'lineno'):
+                    if stat.size_diff > 0:
+                        line = str(stat.traceback)
+                        totals = allocations.setdefault(line, [0, 0])
+                        totals[0] += stat.size_diff
+                        totals[1] += max(stat.count_diff, 0)
+                self._snapshots[current] = snapshot
+                self._last = snapshot
+
+        if key is None:
+            self._stack.pop()
+        else:
+            self._stack.append(key)
+        if self._stack and self.active and self.use_cprofile:
+            self._profiles.setdefault(self._stack[-1],
+                                      cProfile.Profile()).enable()
+
+    def _snapshot(self) -> tracemalloc.Snapshot:
+        """Return a snapshot of the memory allocated now, leaving out what
+        tracemalloc itself allocated.
+        """
+        return tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__)])
+
+    def write(self) -> None:
+        """Write the statistics of each key to files in the directory named
+        after the key: <key>.pstats, <key>.snapshot and <key>-allocations.txt.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        for key, profile in self._profiles.items():
+            profile.dump_stats(self._path(key, '.pstats'))
+        for key, snapshot in self._snapshots.items():
+            snapshot.dump(self._path(key, '.snapshot'))
+        for key, allocations in self._allocations.items():
+            lines = sorted(allocations.items(), key=lambda item: -item[1][0])
+            with open(self._path(key, '-allocations.txt'), 'w') as text_file:
+                text_file.write(f'Memory allocated under {key}\n')
+                for line, (size, count) in lines[:TOP_ALLOCATIONS]:
+                    text_file.write(f'{size:>12} bytes {count:>8} blocks  '
+                                    f'{line}\n')
+
+    def _path(self, key: str, suffix: str) -> str:
+        """Return the path of the file in the directory for <key> that ends
+        with <suffix>.
+        """
+        name = ''.join(c if c.isalnum() else '-' for c in key)
+        return os.path.join(self.directory, name + suffix)
+
+
+def install_toggle_signal(profiler: StateProfiler) -> bool:
+    """Make the process toggle <profiler> whenever it is sent SIGUSR2.
+
+    Return False if the platform has no SIGUSR2, in which case nothing is
+    done.
+    """
+    if not hasattr(signal, 'SIGUSR2'):
+        return False
+
+    def toggle(signum: int, frame: object) -> None:
+        """Toggle the profiler."""
+        profiler.toggle()
+
+    signal.signal(signal.SIGUSR2, toggle)
+    return True
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(config={
+        'allowed-import-modules': [
+            'doctest', 'python_ta', 'typing', '__future__', 'cProfile', 'os',
+            'signal', 'tracemalloc'
+        ]
+    })
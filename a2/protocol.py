@@ -0,0 +1,411 @@
+"""CSC148 Assignment 2
+
+=== CSC148 Winter 2020 ===
+Department of Computer Science,
+University of Toronto
+
+This code is provided solely for the personal and private use of
+students taking the CSC148 course at the University of Toronto.
+Copying for purposes other than this use is expressly prohibited.
+All forms of distribution of this code, whether as given or with
+any changes, are expressly prohibited.
+
+Authors: Diane Horton, David Liu, Mario Badr, Sophia Huynh, Misha Schwartz,
+and Jaisie Sin
+
+All of the files in this directory and all subdirectories are:
+Copyright (c) Diane Horton, David Liu, Mario Badr, Sophia Huynh,
+Misha Schwartz, and Jaisie Sin.
+
+=== Module Description ===
+
+This file contains the engine protocol, which lets a computer player run as a
+separate program, called an engine, in the spirit of the protocols that chess
+engines speak. The game and the engine each write one command to a line on
+the engine's standard input and output.
+
+The game sends:
+- "blocky" once the engine has started. The engine may send "id name <name>",
+  and must then send "blockyok".
+- "position board <board> goal <goal type> <colour index> penalty <penalty>
+  turnsleft <turns>", where <board> is the encode_board encoding of the board
+  in hex, the goal is given by its type's name and the index in COLOUR_LIST of
+  its colour, <penalty> is the penalty the player has had so far, and <turns>
+  is the number of turns it has left, counting the current one. The
+  "turnsleft" part is left out if the player has not been told.
+- "go movetime <milliseconds>" to ask for a move on the last position, to be
+  sent within that time, or "go" if there is no time limit.
+- "quit" when the engine is no longer needed.
+
+The engine replies to "go" with "bestmove <action> <direction> <path>", as
+described in the moves module, where <direction> is "-" for an action that has
+none. The engine ignores commands it does not know, and the game ignores any
+other lines the engine sends.
+
+An engine that does not reply in time, exits, or sends a move that cannot be
+done is stopped, and the player passes.
+"""
+from __future__ import annotations
+import atexit
+import queue
+import shlex
+import subprocess
+import sys
+import threading
+from typing import Callable, Dict, List, Optional, TextIO, Tuple
+
+from block import Block, decode_board, encode_board
+from book import GOAL_TYPES
+from goal import BlobGoal, Goal, PerimeterGoal
+from moves import MOVE_ACTIONS, Move, create_move
+from settings import BOARD_SIZE, COLOUR_LIST
+
+# The number of seconds an engine has to choose a move, unless it is given
+# another time.
+ENGINE_MOVE_TIME = 1.0
+# The number of seconds an engine has to start and reply to "blocky".
+ENGINE_START_TIMEOUT = 10.0
+# The number of seconds an engine is allowed past its move time, for the time
+# it takes to send the move.
+ENGINE_GRACE = 0.25
+# The number of seconds an engine has to exit after "quit" before it is
+# killed.
+ENGINE_QUIT_TIMEOUT = 1.0
+
+
+def format_position(board: Block, goal: Goal, penalty: int,
+                    turns_left: Optional[int]) -> str:
+    """Return the "position" command for <board>, for a player with <goal>
+    who has had <penalty> so far and has <turns_left>.
+
+    >>> board = Block((0, 0), 750, COLOUR_LIST[1], 0, 1)
+    >>> format_position(board, BlobGoal(COLOUR_LIST[2]), 3, 5)
+    'position board 011f goal BlobGoal 2 penalty 3 turnsleft 5'
+    """
+    line = f'position board {encode_board(board).hex()} goal ' \
+           f'{type(goal).__name__} {COLOUR_LIST.index(goal.colour)} ' \
+           f'penalty {penalty}'
+    if turns_left is not None:
+        line += f' turnsleft {turns_left}'
+    return line
+
+
+def parse_position(line: str) -> Tuple[Block, Goal, int, Optional[int]]:
+    """Return the board, goal, penalty and turns left in the "position"
+    command <line>.
+
+    Raise ValueError if <line> is not a "position" command.
+
+    >>> board, goal, penalty, turns_left = parse_position(
+    ...     'position board 011f goal BlobGoal 2 penalty 3 turnsleft 5')
+    >>> board.colour == COLOUR_LIST[1], goal.colour == COLOUR_LIST[2]
+    (True, True)
+    >>> penalty, turns_left
+    (3, 5)
+    """
+    words = line.split()
+    try:
+        if words[:2] != ['position', 'board'] or words[3] != 'goal' or \
+                words[6] != 'penalty':
+            raise ValueError(f'{line!r} is not a position')
+        board = decode_board(bytes.fromhex(words[2]), BOARD_SIZE)
+        goal_type = [PerimeterGoal, BlobGoal][GOAL_TYPES.index(words[4])]
+        goal = goal_type(COLOUR_LIST[int(words[5])])
+        penalty = int(words[7])
+        turns_left = None
+        if words[8:9] == ['turnsleft']:
+            turns_left = int(words[9])
+    except IndexError as error:
+        raise ValueError(f'{line!r} is not a position') from error
+    return board, goal, penalty, turns_left
+
+
+def format_move(move: Move) -> str:
+    """Return the "bestmove" reply for <move>.
+
+    >>> format_move(('pass', None, 1))
+    'bestmove pass - 1'
+    """
+    direction = '-' if move[1] is None else str(move[1])
+    return f'bestmove {move[0]} {direction} {move[2]}'
+
+
+def parse_move(line: str) -> Move:
+    """Return the move in the "bestmove" reply <line>.
+
+    Raise ValueError if <line> is not a "bestmove" reply.
+
+    >>> parse_move('bestmove rotate 1 5')
+    ('rotate', 1, 5)
+    """
+    words = line.split()
+    if len(words) != 4 or words[0] != 'bestmove':
+        raise ValueError(f'{line!r} is not a move')
+    direction = None if words[2] == '-' else int(words[2])
+    path = int(words[3])
+    if (words[1], direction) not in MOVE_ACTIONS or path < 1:
+        raise ValueError(f'{line!r} is not a move')
+    return create_move((words[1], direction), path)
+
+
+def run_engine(choose_move: Callable[[Block, Goal, Optional[int],
+                                      Optional[float]], Move],
+               name: str, stdin: TextIO = sys.stdin,
+               stdout: TextIO = sys.stdout) -> None:
+    """Speak the engine side of the protocol on <stdin> and <stdout> as the
+    engine <name>, until "quit" or the end of <stdin>.
+
+    choose_move(board, goal, turns_left, move_time) returns the move to send
+    for "go" on the last position, given the number of seconds it has to
+    choose it, or None if it has no time limit.
+    """
+    position = None
+    for line in stdin:
+        words = line.split()
+        if words == ['blocky']:
+            stdout.write(f'id name {name}\nblockyok\n')
+        elif words[:1] == ['position']:
+            try:
+                position = parse_position(line)
+            except ValueError:
+                position = None
+        elif words[:1] == ['go'] and position is not None:
+            move_time = None
+            if words[1:2] == ['movetime']:
+                move_time = int(words[2]) / 1000
+            board, goal, _, turns_left = position
+            move = choose_move(board, goal, turns_left, move_time)
+            stdout.write(format_move(move) + '\n')
+        elif words == ['quit']:
+            return
+        stdout.flush()
+
+
+class EngineProcess:
+    """A running engine.
+
+    === Public Attributes ===
+    command:
+        The command the engine was started with.
+    name:
+        The name the engine gave, or its command if it gave none.
+    """
+    # === Private Attributes ===
+    # _process:
+    #   The engine's process.
+    # _lines:
+    #   The lines the engine has sent that have not been read yet, with None
+    #   once it has closed its output.
+    command: str
+    name: str
+    _process: subprocess.Popen
+    _lines: queue.Queue
+
+    def __init__(self, command: str) -> None:
+        """Start the engine with <command>, and wait for it to be ready.
+
+        Raise TimeoutError if it is not ready within ENGINE_START_TIMEOUT
+        seconds, and ConnectionError if it exits first.
+        """
+        self.command = command
+        self.name = command
+        self._process = subprocess.Popen(
+            shlex.split(command), stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE, text=True, bufsize=1)
+        self._lines = queue.Queue()
+        # A pipe cannot be read with a timeout everywhere, so a thread reads
+        # the engine's output into _lines.
+        threading.Thread(target=self._read_output, daemon=True).start()
+        try:
+            self._send('blocky')
+            line = self._read_line(ENGINE_START_TIMEOUT)
+            while line != 'blockyok':
+                if line.startswith('id name '):
+                    self.name = line[len('id name '):]
+                line = self._read_line(ENGINE_START_TIMEOUT)
+        except (TimeoutError, ConnectionError):
+            self.kill()
+            raise
+
+    def _read_output(self) -> None:
+        """Put each line the engine sends into _lines, and then None.
+        """
+        for line in self._process.stdout:
+            self._lines.put(line.strip())
+        self._lines.put(None)
+
+    def _send(self, line: str) -> None:
+        """Send <line> to the engine.
+
+        Raise ConnectionError if the engine has exited.
+        """
+        try:
+            self._process.stdin.write(line + '\n')
+            self._process.stdin.flush()
+        except (BrokenPipeError, ValueError) as error:
+            raise ConnectionError(f'{self.name} has exited') from error
+
+    def _read_line(self, timeout: float) -> str:
+        """Return the next line the engine sends.
+
+        Raise TimeoutError if it sends none within <timeout> seconds, and
+        ConnectionError if it has closed its output.
+        """
+        try:
+            line = self._lines.get(timeout=timeout)
+        except queue.Empty as error:
+            raise TimeoutError(f'{self.name} did not reply in '
+                               f'{timeout:.2f}s') from error
+        if line is None:
+            self._lines.put(None)
+            raise ConnectionError(f'{self.name} has exited')
+        return line
+
+    def alive(self) -> bool:
+        """Return True iff the engine is still running.
+        """
+        return self._process.poll() is None
+
+    def best_move(self, position: str, move_time: Optional[float]) -> Move:
+        """Return the move the engine chooses on the "position" command
+        <position>, in <move_time> seconds, or in any time if it is None.
+
+        Raise TimeoutError if the engine takes longer than <move_time> and
+        ENGINE_GRACE together, ConnectionError if it exits, and ValueError if
+        it sends a "bestmove" reply that is not a move. The engine should be
+        killed after any of these, since it may reply late.
+        """
+        self._send(position)
+        if move_time is None:
+            self._send('go')
+            timeout = None
+        else:
+            self._send(f'go movetime {round(move_time * 1000)}')
+            timeout = move_time + ENGINE_GRACE
+        line = self._read_line(timeout)
+        while not line.startswith('bestmove'):
+            line = self._read_line(timeout)
+        return parse_move(line)
+
+    def quit(self) -> None:
+        """Tell the engine to exit, and kill it if it does not.
+        """
+        try:
+            self._send('quit')
+            self._process.wait(ENGINE_QUIT_TIMEOUT)
+        except (ConnectionError, subprocess.TimeoutExpired):
+            pass
+        self.kill()
+
+    def kill(self) -> None:
+        """Stop the engine at once.
+        """
+        if self.alive():
+            self._process.kill()
+        self._process.wait()
+        try:
+            self._process.stdin.close()
+        except BrokenPipeError:
+            pass  # What was left to send to the engine is dropped
+
+
+class EnginePool:
+    """A pool of running engines that are all started with the same command,
+    so that a move does not wait for an engine to start.
+
+    Engines are taken from the pool for a move and put back after it. The
+    pool keeps at most <size> engines waiting, and starts new ones when they
+    are all in use. It can be shared between threads.
+
+    === Public Attributes ===
+    command:
+        The command the engines are started with.
+    size:
+        The most engines kept waiting.
+    """
+    # === Private Attributes ===
+    # _idle:
+    #   The engines that are waiting to be used.
+    # _lock:
+    #   The lock held while _idle is used.
+    command: str
+    size: int
+    _idle: List[EngineProcess]
+    _lock: threading.Lock
+
+    def __init__(self, command: str, size: int = 1) -> None:
+        """Initialize this pool of engines started with <command>, and start
+        <size> of them.
+        """
+        self.command = command
+        self.size = size
+        self._lock = threading.Lock()
+        self._idle = [EngineProcess(command) for _ in range(size)]
+
+    def acquire(self) -> EngineProcess:
+        """Return a running engine for the caller to use alone, starting one
+        if none are waiting.
+        """
+        with self._lock:
+            while self._idle:
+                engine = self._idle.pop()
+                if engine.alive():
+                    return engine
+                engine.kill()
+        return EngineProcess(self.command)
+
+    def release(self, engine: EngineProcess) -> None:
+        """Put <engine> back in this pool once it is done with, or tell it to
+        exit if the pool is full.
+        """
+        with self._lock:
+            if len(self._idle) < self.size and engine.alive():
+                self._idle.append(engine)
+                return
+        engine.quit()
+
+    def close(self) -> None:
+        """Tell every waiting engine to exit.
+        """
+        with self._lock:
+            idle = self._idle
+            self._idle = []
+        for engine in idle:
+            engine.quit()
+
+
+# The pool of each command that get_engine_pool has been called with.
+_pools: Dict[str, EnginePool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_engine_pool(command: str) -> EnginePool:
+    """Return the pool of engines started with <command> that is shared by
+    everything in this process, creating it if needed.
+
+    The pools are closed when the process exits.
+    """
+    with _pools_lock:
+        if command not in _pools:
+            _pools[command] = EnginePool(command)
+        return _pools[command]
+
+
+@atexit.register
+def _close_pools() -> None:
+    """Close every pool that get_engine_pool has made.
+    """
+    for pool in _pools.values():
+        pool.close()
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(config={
+        'allowed-io': ['run_engine'],
+        'allowed-import-modules': [
+            'doctest', 'python_ta', 'atexit', 'queue', 'shlex', 'subprocess',
+            'sys', 'threading', 'typing', '__future__', 'block', 'book',
+            'goal', 'moves', 'settings'
+        ]
+    })
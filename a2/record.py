@@ -0,0 +1,317 @@
+"""CSC148 Assignment 2
+
+=== CSC148 Winter 2020 ===
+Department of Computer Science,
+University of Toronto
+
+This code is provided solely for the personal and private use of
+students taking the CSC148 course at the University of Toronto.
+Copying for purposes other than this use is expressly prohibited.
+All forms of distribution of this code, whether as given or with
+any changes, are expressly prohibited.
+
+Authors: Diane Horton, David Liu, Mario Badr, Sophia Huynh, Misha Schwartz,
+and Jaisie Sin
+
+All of the files in this directory and all subdirectories are:
+Copyright (c) Diane Horton, David Liu, Mario Badr, Sophia Huynh,
+Misha Schwartz, and Jaisie Sin.
+
+=== Module Description ===
+
+This file contains the game record: an append-only file of everything that
+happens in a game, and the replay of a record, which rebuilds the board at any
+turn without the players or the display.
+
+A record starts with RECORD_MAGIC and a header: whether the game was seeded
+and its seed, the index in GOAL_TYPES of the players' goal type and the index
+in COLOUR_LIST of each player's goal colour, and the encode_board encoding of
+the board the game started on. It is followed by one record for every move a
+player tried, in order: the player, the move packed by moves.pack_move,
+whether it was performed and, for a smash that was performed, the encoding of
+the block that the smash made. Smashes are random, so their results are kept
+rather than drawn again, and a replay needs no random numbers.
+
+Every <snapshot_every> turns the record also holds a snapshot: the board and
+each player's number of smashes, combines and paints at the start of that
+turn. A replay of a late turn starts from the last snapshot before it instead
+of from the first move.
+
+All numbers are little-endian. A record that was cut off part way through a
+move, as when the game is killed, is read up to its last whole entry.
+"""
+from __future__ import annotations
+import struct
+from typing import BinaryIO, Dict, List, Optional, Tuple
+
+from actions import SMASH, PAINT, COMBINE, ACTION_PENALTY
+from block import Block, decode_block, decode_board, encode_board
+from book import GOAL_TYPES
+from goal import BlobGoal, Goal, PerimeterGoal
+from moves import Move, apply_move, block_at_path, pack_move, unpack_move
+from settings import BOARD_SIZE, COLOUR_LIST
+
+# The first bytes of every game record file.
+RECORD_MAGIC = b'BLKYREC1'
+
+# Whether there is a seed, the seed, and the number of players.
+_HEADER = struct.Struct('<BQB')
+# The tag, the player, the packed move, whether it was performed, and the
+# length of the encoding that follows.
+_MOVE = struct.Struct('<cBQBH')
+# The tag, the turn, and the length of the encoding that follows the counts.
+_SNAPSHOT = struct.Struct('<cIH')
+# One player's number of smashes, combines and paints.
+_COUNTS = struct.Struct('<III')
+
+_MOVE_TAG = b'M'
+_SNAPSHOT_TAG = b'S'
+
+
+class GameRecorder:
+    """A writer of the record of one game.
+
+    === Public Attributes ===
+    path:
+        The path of the record file.
+    snapshot_every:
+        The number of turns between snapshots.
+
+    === Representation Invariants ===
+    - snapshot_every >= 1
+    """
+    # === Private Attributes ===
+    # _file:
+    #   The open record file.
+    path: str
+    snapshot_every: int
+    _file: BinaryIO
+
+    def __init__(self, path: str, board: Block, goals: List[Goal],
+                 seed: Optional[int], snapshot_every: int = 100,
+                 offset: Optional[int] = None) -> None:
+        """Initialize this recorder to write a new record to the file at
+        <path>, of a game that starts on <board> between players with <goals>,
+        in the order of their IDs, and that was seeded with <seed>.
+
+        If <offset> is not None, the record already in the file is continued
+        instead, as it was when it was <offset> bytes long (see size), and
+        <board>, <goals> and <seed> are not used. Anything recorded after that
+        is dropped, since a game resumed from a checkpoint plays it again.
+
+        Precondition: every goal in <goals> is of the same type.
+        """
+        self.path = path
+        self.snapshot_every = snapshot_every
+        if offset is not None:
+            self._file = open(path, 'r+b')
+            self._file.truncate(offset)
+            self._file.seek(offset)
+            return
+        self._file = open(path, 'wb')
+        initial = encode_board(board)
+        self._file.write(RECORD_MAGIC)
+        self._file.write(_HEADER.pack(int(seed is not None), seed or 0,
+                                      len(goals)))
+        self._file.write(bytes([GOAL_TYPES.index(type(goals[0]).__name__)]))
+        self._file.write(bytes([COLOUR_LIST.index(goal.colour)
+                                for goal in goals]))
+        self._file.write(len(initial).to_bytes(2, 'little') + initial)
+        self._file.flush()
+
+    def record_move(self, player_id: int, move: Move, performed: bool,
+                    outcome: bytes = b'') -> None:
+        """Record that the player with <player_id> tried <move>, and whether
+        it was <performed>.
+
+        <outcome> is the encoding of the block made by a smash that was
+        performed, and is empty for every other move.
+        """
+        self._file.write(_MOVE.pack(_MOVE_TAG, player_id, pack_move(move),
+                                    int(performed), len(outcome)) + outcome)
+        # Flushing after every move keeps the record whole up to the last move
+        # if the game is killed.
+        self._file.flush()
+
+    def record_turn(self, turn: int, board: Block,
+                    counts: List[Tuple[int, int, int]]) -> None:
+        """Record that <turn> has started on <board>, with <counts> holding
+        the number of smashes, combines and paints of each player so far.
+
+        A snapshot is only written every snapshot_every turns.
+        """
+        if turn % self.snapshot_every != 0:
+            return
+        data = encode_board(board)
+        self._file.write(_SNAPSHOT.pack(_SNAPSHOT_TAG, turn, len(data)))
+        for player_counts in counts:
+            self._file.write(_COUNTS.pack(*player_counts))
+        self._file.write(data)
+        self._file.flush()
+
+    def size(self) -> int:
+        """Return the number of bytes recorded so far.
+        """
+        return self._file.tell()
+
+    def close(self) -> None:
+        """Close the record file. Closing it again does nothing.
+        """
+        self._file.close()
+
+
+class GameReplay:
+    """The replay of a game record.
+
+    === Public Attributes ===
+    seed:
+        The seed of the recorded game, or None if it was not seeded.
+    goals:
+        The goal of each player, in the order of their IDs.
+    num_turns:
+        The number of turns that were finished in the record.
+    moves:
+        Each move that a player tried, in order, as a tuple of the player's
+        ID, the move, whether it was performed, and the encoding of the block
+        it made if it was a smash that was performed.
+
+    === Representation Invariants ===
+    - len(_turn_starts) == num_turns + 1
+    - 0 in _snapshots
+    """
+    # === Private Attributes ===
+    # _turn_starts:
+    #   The index in moves of the first move of each turn. The last entry is
+    #   the number of moves in turns that were finished.
+    # _snapshots:
+    #   A dictionary mapping each turn that has a snapshot to the encoding of
+    #   the board at its start and each player's counts of smashes, combines
+    #   and paints.
+    seed: Optional[int]
+    goals: List[Goal]
+    num_turns: int
+    moves: List[Tuple[int, Move, bool, bytes]]
+    _turn_starts: List[int]
+    _snapshots: Dict[int, Tuple[bytes, List[Tuple[int, int, int]]]]
+
+    def __init__(self, path: str) -> None:
+        """Initialize this replay with the record in the file at <path>.
+
+        Raise ValueError if the file is not a game record, or if it holds an
+        entry that is neither a move nor a snapshot.
+        """
+        with open(path, 'rb') as record_file:
+            data = record_file.read()
+        if data[:len(RECORD_MAGIC)] != RECORD_MAGIC:
+            raise ValueError(f'{path} is not a game record')
+
+        offset = len(RECORD_MAGIC)
+        has_seed, seed, num_players = _HEADER.unpack_from(data, offset)
+        offset += _HEADER.size
+        self.seed = seed if has_seed else None
+        goal_type = [PerimeterGoal, BlobGoal][data[offset]]
+        self.goals = [goal_type(COLOUR_LIST[index])
+                      for index in data[offset + 1:offset + 1 + num_players]]
+        offset += 1 + num_players
+        length = int.from_bytes(data[offset:offset + 2], 'little')
+        initial = data[offset + 2:offset + 2 + length]
+        offset += 2 + length
+
+        self.moves = []
+        self._turn_starts = [0]
+        self._snapshots = {0: (initial, [(0, 0, 0)] * num_players)}
+        while offset < len(data):
+            if data[offset:offset + 1] == _MOVE_TAG:
+                if offset + _MOVE.size > len(data):
+                    break
+                _, player_id, packed, performed, length = \
+                    _MOVE.unpack_from(data, offset)
+                end = offset + _MOVE.size + length
+                if end > len(data):
+                    break
+                self.moves.append((player_id, unpack_move(packed),
+                                   bool(performed),
+                                   data[offset + _MOVE.size:end]))
+                if performed and player_id == num_players - 1:
+                    self._turn_starts.append(len(self.moves))
+            elif data[offset:offset + 1] == _SNAPSHOT_TAG:
+                if offset + _SNAPSHOT.size > len(data):
+                    break
+                _, turn, length = _SNAPSHOT.unpack_from(data, offset)
+                start = offset + _SNAPSHOT.size
+                end = start + _COUNTS.size * num_players + length
+                if end > len(data):
+                    break
+                counts = [_COUNTS.unpack_from(data, start + _COUNTS.size * i)
+                          for i in range(num_players)]
+                self._snapshots[turn] = (data[end - length:end], counts)
+            else:
+                raise ValueError(f'{path} has an unknown entry at byte '
+                                 f'{offset}')
+            offset = end
+        self.num_turns = len(self._turn_starts) - 1
+
+    def _state_at(self, turn: int) -> Tuple[Block, List[List[int]]]:
+        """Return the board at the start of <turn>, and each player's counts
+        of smashes, combines and paints before it.
+
+        Precondition: 0 <= turn <= num_turns
+        """
+        start = max(snapshot for snapshot in self._snapshots
+                    if snapshot <= turn)
+        data, counts = self._snapshots[start]
+        board = decode_board(data, BOARD_SIZE)
+        counts = [list(player_counts) for player_counts in counts]
+        for player_id, move, performed, outcome in \
+                self.moves[self._turn_starts[start]:self._turn_starts[turn]]:
+            if not performed:
+                continue
+            action = (move[0], move[1])
+            if action == SMASH:
+                decode_block(block_at_path(board, move[2]), outcome)
+                counts[player_id][0] += 1
+            else:
+                apply_move(board, move, self.goals[player_id].colour)
+                if action == COMBINE:
+                    counts[player_id][1] += 1
+                elif action == PAINT:
+                    counts[player_id][2] += 1
+        return board, counts
+
+    def board_at(self, turn: int) -> Block:
+        """Return the board at the start of <turn>.
+
+        Raise ValueError if <turn> is not between 0 and num_turns.
+        """
+        if not 0 <= turn <= self.num_turns:
+            raise ValueError(f'The record has no turn {turn}')
+        return self._state_at(turn)[0]
+
+    def scores_at(self, turn: int) -> List[Tuple[int, int, int]]:
+        """Return the player ID, goal score and penalty of each player at the
+        start of <turn>, as GameData.final_scores does.
+
+        Raise ValueError if <turn> is not between 0 and num_turns.
+        """
+        if not 0 <= turn <= self.num_turns:
+            raise ValueError(f'The record has no turn {turn}')
+        board, counts = self._state_at(turn)
+        scores = []
+        for player_id in range(len(self.goals)):
+            smashes, combines, paints = counts[player_id]
+            penalty = smashes * ACTION_PENALTY[SMASH] + \
+                combines * ACTION_PENALTY[COMBINE] + \
+                paints * ACTION_PENALTY[PAINT]
+            scores.append((player_id, self.goals[player_id].score(board),
+                           penalty))
+        return scores
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(config={
+        'allowed-import-modules': [
+            'doctest', 'python_ta', 'struct', 'typing', '__future__',
+            'actions', 'block', 'book', 'goal', 'moves', 'settings'
+        ]
+    })
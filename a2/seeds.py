@@ -0,0 +1,75 @@
+"""CSC148 Assignment 2
+
+=== CSC148 Winter 2020 ===
+Department of Computer Science,
+University of Toronto
+
+This code is provided solely for the personal and private use of
+students taking the CSC148 course at the University of Toronto.
+Copying for purposes other than this use is expressly prohibited.
+All forms of distribution of this code, whether as given or with
+any changes, are expressly prohibited.
+
+Authors: Diane Horton, David Liu, Mario Badr, Sophia Huynh, Misha Schwartz,
+and Jaisie Sin
+
+All of the files in this directory and all subdirectories are:
+Copyright (c) Diane Horton, David Liu, Mario Badr, Sophia Huynh,
+Misha Schwartz, and Jaisie Sin.
+
+=== Module Description ===
+
+This file contains the seeding of the random number streams of a game.
+
+Every source of randomness in a game owns its own random.Random, seeded from
+the game seed and the name of the stream: the board generator, the goals, the
+smashes done on the real board, and each player. Extra random numbers drawn
+from one stream therefore never change what another stream draws, and the same
+game seed always reproduces the same game.
+
+Seeds are derived with hashlib rather than hash(), since hash() of a str is
+salted differently in every process.
+"""
+import hashlib
+import random
+
+# The names of the streams that a game draws from, other than the players'.
+BOARD_STREAM = 'board'
+GOALS_STREAM = 'goals'
+SMASH_STREAM = 'smash'
+# The name of each player's stream, which is followed by the player's id.
+PLAYER_STREAM = 'player'
+# Game seeds are saved in checkpoints and game records as unsigned 64-bit
+# numbers, so a game seed must be at least 0 and less than this.
+SEED_LIMIT = 2 ** 64
+
+
+def derive_seed(seed: int, *labels: object) -> int:
+    """Return the seed of the stream named by <labels> in the game seeded by
+    <seed>.
+
+    The result is the same in every process, and on every platform.
+
+    >>> derive_seed(148, PLAYER_STREAM, 0) == derive_seed(148, PLAYER_STREAM, 0)
+    True
+    >>> derive_seed(148, PLAYER_STREAM, 0) == derive_seed(148, PLAYER_STREAM, 1)
+    False
+    """
+    text = repr((seed,) + labels).encode('utf-8')
+    return int.from_bytes(hashlib.sha256(text).digest()[:8], 'big')
+
+
+def make_rng(seed: int, *labels: object) -> random.Random:
+    """Return a new random.Random for the stream named by <labels> in the game
+    seeded by <seed>.
+    """
+    return random.Random(derive_seed(seed, *labels))
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(config={
+        'allowed-import-modules': [
+            'doctest', 'python_ta', 'hashlib', 'random'
+        ]
+    })
@@ -0,0 +1,410 @@
+"""CSC148 Assignment 2
+
+=== CSC148 Winter 2020 ===
+Department of Computer Science,
+University of Toronto
+
+This code is provided solely for the personal and private use of
+students taking the CSC148 course at the University of Toronto.
+Copying for purposes other than this use is expressly prohibited.
+All forms of distribution of this code, whether as given or with
+any changes, are expressly prohibited.
+
+Authors: Diane Horton, David Liu, Mario Badr, Sophia Huynh, Misha Schwartz,
+and Jaisie Sin
+
+All of the files in this directory and all subdirectories are:
+Copyright (c) Diane Horton, David Liu, Mario Badr, Sophia Huynh,
+Misha Schwartz, and Jaisie Sin.
+
+=== Module Description ===
+
+This file is a script that hosts games of Blocky for remote players, such as
+bots, over TCP or Unix sockets. For example:
+
+    python server.py --port 14800 --players 2 --max-depth 3 --turns 10
+
+Players are seated in the order they connect, and a game starts as soon as
+it has a seat for every player, so any number of games are played at once on
+one asyncio event loop. The server owns each game's GameData and plays its
+turns through the engine, as the interactive game does.
+
+Messages are JSON objects, one to a line. The server sends:
+- {"type": "start", "game": <game number>, "player": <your player ID>,
+  "seed": <game seed>, "board": <board>, "goals": [[<goal type>,
+  <colour index>], ...], "turns": <number of turns>}
+  where <board> is the encode_board encoding of the board in hex, and each
+  goal is given by its type's name and the index in COLOUR_LIST of its colour,
+  in the order of player IDs.
+- {"type": "your_move", "move": <move number>, "turns_left": <turns>,
+  "timeout": <seconds>} when it is your move.
+- {"type": "move", "player": <player ID>, "move": [<action>, <direction>,
+  <path>], "outcome": <block>} to every player after each move is done. A
+  smash is random, so <block> is the encoding in hex of the block that it
+  made, as in a game record. It is "" for every other move. Doing the same
+  moves keeps a copy of the board the same as the server's.
+- {"type": "invalid", "reason": <why>} when a move cannot be done. The player
+  can try again until its time is up.
+- {"type": "end", "scores": [[<player ID>, <goal score>, <penalty>], ...],
+  "winner": <player ID>} when the game is over, after which the connection is
+  closed.
+
+A player sends {"move": <move number>, "action": <action>, "direction":
+<direction>, "path": <path>} for a move, as described in the moves module,
+where <move number> is the number it was sent in "your_move". A move with any
+other number was sent too late, and is ignored. A player that does not send a
+move that can be done within the timeout passes, and a player that has
+disconnected passes every move it has left.
+"""
+from __future__ import annotations
+import argparse
+import asyncio
+import json
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+from actions import SMASH, PASS
+from block import Block, encode_board, generate_board
+from engine import GameData, winner
+from goal import Goal, generate_goals
+from moves import MOVE_ACTIONS, ROOT_PATH, Move, block_at_path, create_move, \
+    is_legal
+from player import Player
+from seeds import BOARD_STREAM, GOALS_STREAM, derive_seed, make_rng
+from settings import BOARD_SIZE, COLOUR_LIST
+from stats import PhaseStats
+
+# The name of the random stream that game seeds are derived from.
+SERVER_STREAM = 'server'
+
+# The number of connections that may wait to be accepted. Hundreds of players
+# may connect at once, and a connection that does not fit waits for seconds
+# to be tried again.
+CONNECTION_BACKLOG = 1024
+
+
+class RemotePlayer(Player):
+    """A player in a game on the server, whose moves arrive over a connection
+    rather than being generated.
+
+    === Public Attributes ===
+    reader:
+        The stream that the player's messages are read from.
+    writer:
+        The stream that messages to the player are written to.
+    connected:
+        Whether the player is still connected.
+    """
+    reader: asyncio.StreamReader
+    writer: asyncio.StreamWriter
+    connected: bool
+
+    def __init__(self, player_id: int, goal: Goal,
+                 reader: asyncio.StreamReader,
+                 writer: asyncio.StreamWriter) -> None:
+        """Initialize this player to play over <reader> and <writer>.
+        """
+        Player.__init__(self, player_id, goal)
+        self.reader = reader
+        self.writer = writer
+        self.connected = True
+
+    def get_selected_block(self, board: Block) -> Optional[Block]:
+        return None
+
+    def process_event(self, event: object) -> None:
+        return  # A remote player has no events
+
+    def generate_move(self, board: Block) -> Optional[Move]:
+        return None  # The server reads the moves of a remote player
+
+
+def parse_move(message: object) -> Tuple[int, Move]:
+    """Return the move number and the move in <message>, a move sent by a
+    player as described in the module description.
+
+    Raise ValueError if <message> is not a move.
+
+    >>> parse_move({'move': 3, 'action': 'rotate', 'direction': 1, 'path': 5})
+    (3, ('rotate', 1, 5))
+    """
+    try:
+        number = message['move']
+        action = (message['action'], message['direction'])
+        path = message['path']
+    except (KeyError, TypeError) as error:
+        raise ValueError('A move needs a move, action, direction and '
+                         'path') from error
+    if action not in MOVE_ACTIONS:
+        raise ValueError(f'There is no action {list(action)}')
+    if not isinstance(number, int) or not isinstance(path, int) or path < 1:
+        raise ValueError('The move number and path must be integers, and the '
+                         'path must be at least 1')
+    return number, create_move(action, path)
+
+
+class GameServer:
+    """A server that seats players as they connect and plays their games.
+
+    === Public Attributes ===
+    num_players:
+        The number of players in each game.
+    max_depth:
+        The max_depth of the board of each game.
+    num_turns:
+        The number of turns in each game.
+    move_timeout:
+        The number of seconds a player has to send a move that can be done.
+    seed:
+        The seed that the seed of each game is derived from.
+    stats:
+        The timings of the server: how long players took to send their moves
+        and how long the moves took to do, and counters of the games started
+        and finished, the moves that timed out or could not be done, and the
+        players that disconnected.
+    results:
+        A dictionary mapping the number of each game that has finished to its
+        final scores, as GameData.final_scores gives them.
+
+    === Representation Invariants ===
+    - num_players >= 1
+    - len(_waiting) < num_players
+    """
+    # === Private Attributes ===
+    # _waiting:
+    #   The connections of the players waiting for their game to start, in
+    #   the order they connected.
+    # _games:
+    #   The tasks of the games being played.
+    # _next_game:
+    #   The number of the next game to start.
+    num_players: int
+    max_depth: int
+    num_turns: int
+    move_timeout: float
+    seed: int
+    stats: PhaseStats
+    results: Dict[int, List[Tuple[int, int, int]]]
+    _waiting: List[Tuple[asyncio.StreamReader, asyncio.StreamWriter]]
+    _games: Set[asyncio.Task]
+    _next_game: int
+
+    def __init__(self, num_players: int, max_depth: int, num_turns: int,
+                 move_timeout: float = 5.0, seed: int = 0) -> None:
+        """Initialize this server to play games of <num_players> players on
+        boards with <max_depth> for <num_turns> turns each.
+        """
+        self.num_players = num_players
+        self.max_depth = max_depth
+        self.num_turns = num_turns
+        self.move_timeout = move_timeout
+        self.seed = seed
+        self.stats = PhaseStats()
+        self.results = {}
+        self._waiting = []
+        self._games = set()
+        self._next_game = 0
+
+    async def start_tcp(self, host: str, port: int) -> asyncio.AbstractServer:
+        """Start accepting players on <host> and <port>, and return the
+        asyncio server. A <port> of 0 picks a free port.
+        """
+        return await asyncio.start_server(self.connect, host, port,
+                                          backlog=CONNECTION_BACKLOG)
+
+    async def start_unix(self, path: str) -> asyncio.AbstractServer:
+        """Start accepting players on the Unix socket at <path>, and return
+        the asyncio server.
+        """
+        return await asyncio.start_unix_server(self.connect, path,
+                                               backlog=CONNECTION_BACKLOG)
+
+    async def connect(self, reader: asyncio.StreamReader,
+                      writer: asyncio.StreamWriter) -> None:
+        """Seat the player on <reader> and <writer>, and start a game if it
+        has a seat for every player now.
+        """
+        self._waiting.append((reader, writer))
+        if len(self._waiting) == self.num_players:
+            connections = self._waiting
+            self._waiting = []
+            task = asyncio.get_running_loop().create_task(
+                self.play(self._next_game, connections))
+            self._next_game += 1
+            self._games.add(task)
+            task.add_done_callback(self._games.discard)
+
+    async def wait_finished(self) -> None:
+        """Wait until every game that has started is over.
+        """
+        while self._games:
+            await asyncio.gather(*self._games)
+
+    def _setup(self, number: int,
+               connections: List[Tuple[asyncio.StreamReader,
+                                       asyncio.StreamWriter]]) -> GameData:
+        """Return the data of game <number>, between the players on
+        <connections>.
+        """
+        seed = derive_seed(self.seed, SERVER_STREAM, number)
+        board = generate_board(self.max_depth, BOARD_SIZE,
+                               make_rng(seed, BOARD_STREAM))
+        goals = generate_goals(len(connections), make_rng(seed, GOALS_STREAM))
+        players = [RemotePlayer(i, goals[i], reader, writer)
+                   for i, (reader, writer) in enumerate(connections)]
+        data = GameData(board, players, seed)
+        data.max_turns = self.num_turns
+        return data
+
+    async def play(self, number: int,
+                   connections: List[Tuple[asyncio.StreamReader,
+                                           asyncio.StreamWriter]]) -> None:
+        """Play game <number> between the players on <connections>, and close
+        the connections once it is over.
+        """
+        data = self._setup(number, connections)
+        self.stats.count('games started')
+        goals = [[type(p.goal).__name__, COLOUR_LIST.index(p.goal.colour)]
+                 for p in data.players]
+        board = encode_board(data.board).hex()
+        for player in data.players:
+            await self._send(player, {
+                'type': 'start', 'game': number, 'player': player.id,
+                'seed': data.seed, 'board': board, 'goals': goals,
+                'turns': data.max_turns})
+
+        move_number = 0
+        while not data.is_over():
+            player = data.start_move()
+            start = time.perf_counter()
+            move = await self._receive_move(data, player, move_number)
+            received = time.perf_counter()
+            data.do_move(move)
+            self.stats.add('receive move', received - start)
+            self.stats.add('do_move', time.perf_counter() - received)
+            outcome = ''
+            if (move[0], move[1]) == SMASH:
+                outcome = encode_board(block_at_path(data.board,
+                                                     move[2])).hex()
+            for p in data.players:
+                await self._send(p, {'type': 'move', 'player': player.id,
+                                     'move': list(move), 'outcome': outcome})
+            move_number += 1
+
+        scores = data.final_scores()
+        self.results[number] = scores
+        self.stats.count('games finished')
+        for player in data.players:
+            await self._send(player, {'type': 'end',
+                                      'scores': [list(s) for s in scores],
+                                      'winner': winner(scores)})
+            player.writer.close()
+
+    async def _send(self, player: RemotePlayer, message: dict) -> None:
+        """Send <message> to <player>, unless it has disconnected.
+        """
+        if not player.connected:
+            return
+        try:
+            player.writer.write(json.dumps(message).encode() + b'\n')
+            await player.writer.drain()
+        except (ConnectionError, OSError):
+            self._disconnect(player)
+
+    def _disconnect(self, player: RemotePlayer) -> None:
+        """Record that <player> has disconnected.
+        """
+        if player.connected:
+            player.connected = False
+            player.writer.close()
+            self.stats.count('disconnects')
+
+    async def _receive_move(self, data: GameData, player: RemotePlayer,
+                            move_number: int) -> Move:
+        """Return the move that <player> sends as move <move_number> of the
+        game of <data>, or a pass if it does not send one that can be done
+        in time.
+        """
+        passing = create_move(PASS, ROOT_PATH)
+        await self._send(player, {'type': 'your_move', 'move': move_number,
+                                  'turns_left': player.turns_left,
+                                  'timeout': self.move_timeout})
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.move_timeout
+        while player.connected:
+            try:
+                line = await asyncio.wait_for(player.reader.readline(),
+                                              deadline - loop.time())
+            except asyncio.TimeoutError:
+                self.stats.count('timeouts')
+                return passing
+            except (ConnectionError, OSError):
+                line = b''
+            if not line.endswith(b'\n'):
+                # The connection was closed, perhaps part way through a line
+                self._disconnect(player)
+                break
+
+            try:
+                number, move = parse_move(json.loads(line))
+            except ValueError as error:
+                # json.JSONDecodeError is a ValueError too
+                reason = str(error)
+            else:
+                if number != move_number:
+                    continue  # A move sent too late for an earlier turn
+                if is_legal(data.board, move, player.goal.colour):
+                    return move
+                reason = f'The move {list(move)} cannot be done'
+            self.stats.count('invalid moves')
+            await self._send(player, {'type': 'invalid', 'reason': reason})
+        return passing
+
+
+async def serve(server: GameServer, host: Optional[str], port: int,
+                path: Optional[str]) -> None:
+    """Run <server> until the process is stopped, on the Unix socket at
+    <path> if it is not None, and on <host> and <port> otherwise.
+    """
+    if path is not None:
+        listener = await server.start_unix(path)
+    else:
+        listener = await server.start_tcp(host, port)
+    async with listener:
+        await listener.serve_forever()
+
+
+def main(args: Optional[List[str]] = None) -> None:
+    """Run the server described by the command line <args>.
+    """
+    parser = argparse.ArgumentParser(description='Host games of Blocky.')
+    parser.add_argument('--host', default='127.0.0.1',
+                        help='the address to accept players on')
+    parser.add_argument('--port', type=int, default=14800,
+                        help='the port to accept players on')
+    parser.add_argument('--unix', default=None,
+                        help='a Unix socket to accept players on instead')
+    parser.add_argument('--players', type=int, default=2,
+                        help='the number of players in each game')
+    parser.add_argument('--max-depth', type=int, default=3,
+                        help='the max_depth of the boards')
+    parser.add_argument('--turns', type=int, default=10,
+                        help='the number of turns in each game')
+    parser.add_argument('--timeout', type=float, default=5.0,
+                        help='the number of seconds a player has to move')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='the seed that game seeds are derived from')
+    options = parser.parse_args(args)
+
+    server = GameServer(options.players, options.max_depth, options.turns,
+                        options.timeout, options.seed)
+    try:
+        asyncio.run(serve(server, options.host, options.port, options.unix))
+    except KeyboardInterrupt:
+        pass
+    for summary in server.stats.summary():
+        print(json.dumps(summary))
+
+
+if __name__ == '__main__':
+    main()
@@ -55,6 +55,11 @@ HIGHLIGHT_THICKNESS = 5
 # The number of seconds a move is animated for.
 ANIMATION_DURATION = 1
 
+# The number of times a second the game is drawn.
+FRAME_RATE = 30
+# The most times a second the game is updated while it is fast-forwarded.
+TURBO_UPDATE_RATE = 1000
+
 
 def colour_name(colour: Tuple[int, int, int]) -> str:
     """Return the colour name associated with this colour value, or the empty
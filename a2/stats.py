@@ -0,0 +1,180 @@
+"""CSC148 Assignment 2
+
+=== CSC148 Winter 2020 ===
+Department of Computer Science,
+University of Toronto
+
+This code is provided solely for the personal and private use of
+students taking the CSC148 course at the University of Toronto.
+Copying for purposes other than this use is expressly prohibited.
+All forms of distribution of this code, whether as given or with
+any changes, are expressly prohibited.
+
+Authors: Diane Horton, David Liu, Mario Badr, Sophia Huynh, Misha Schwartz,
+and Jaisie Sin
+
+All of the files in this directory and all subdirectories are:
+Copyright (c) Diane Horton, David Liu, Mario Badr, Sophia Huynh,
+Misha Schwartz, and Jaisie Sin.
+
+=== Module Description ===
+
+This file contains the instrumentation of a game: timers and counters around
+each phase of the game loop, such as processing events, choosing and doing
+moves, scoring and drawing.
+
+Phases are timed with time.perf_counter, which is monotonic. Each phase keeps
+its number of timings, their total and maximum, and its most recent timings,
+from which rolling percentiles are found. The statistics can be written to a
+file as JSON lines, one per phase and one per counter, at the end of a game or
+whenever the process is sent SIGUSR1 (see install_dump_signal).
+
+Instrumentation is off unless a game is given a PhaseStats, and the code that
+is timed only checks whether it has one, so it costs next to nothing when it
+is off.
+"""
+from __future__ import annotations
+from collections import deque
+from typing import Deque, Dict, List
+import json
+import signal
+import time
+
+
+class PhaseStats:
+    """The timings of the phases of a game, and its counters.
+
+    === Public Attributes ===
+    window:
+        The number of most recent timings of each phase that percentiles are
+        found from.
+
+    === Representation Invariants ===
+    - window >= 1
+    - _counts, _totals, _maxima and _recent have the same keys
+    """
+    # === Private Attributes ===
+    # _counts:
+    #   A dictionary mapping each phase to the number of times it was timed.
+    # _totals:
+    #   A dictionary mapping each phase to its total time, in seconds.
+    # _maxima:
+    #   A dictionary mapping each phase to its longest time, in seconds.
+    # _recent:
+    #   A dictionary mapping each phase to its most recent times, in seconds,
+    #   at most window of them.
+    # _counters:
+    #   A dictionary mapping the name of each counter to its value.
+    window: int
+    _counts: Dict[str, int]
+    _totals: Dict[str, float]
+    _maxima: Dict[str, float]
+    _recent: Dict[str, Deque[float]]
+    _counters: Dict[str, int]
+
+    def __init__(self, window: int = 1000) -> None:
+        """Initialize these statistics to find percentiles from the last
+        <window> timings of each phase.
+        """
+        self.window = window
+        self._counts = {}
+        self._totals = {}
+        self._maxima = {}
+        self._recent = {}
+        self._counters = {}
+
+    def add(self, phase: str, seconds: float) -> None:
+        """Record that <phase> took <seconds>.
+        """
+        if phase not in self._counts:
+            self._counts[phase] = 0
+            self._totals[phase] = 0.0
+            self._maxima[phase] = 0.0
+            self._recent[phase] = deque(maxlen=self.window)
+        self._counts[phase] += 1
+        self._totals[phase] += seconds
+        self._maxima[phase] = max(self._maxima[phase], seconds)
+        self._recent[phase].append(seconds)
+
+    def count(self, name: str, amount: int = 1) -> None:
+        """Add <amount> to the counter <name>.
+        """
+        self._counters[name] = self._counters.get(name, 0) + amount
+
+    def percentile(self, phase: str, percent: float) -> float:
+        """Return the <percent> percentile of the recent times of <phase>, in
+        seconds, using the nearest rank.
+
+        Precondition: <phase> has been timed, and 0 <= percent <= 100.
+
+        >>> stats = PhaseStats()
+        >>> for i in range(1, 101):
+        ...     stats.add('render', i / 1000)
+        >>> stats.percentile('render', 90)
+        0.09
+        """
+        times = sorted(self._recent[phase])
+        rank = max(1, -(-len(times) * percent // 100))
+        return times[int(rank) - 1]
+
+    def summary(self) -> List[Dict[str, object]]:
+        """Return one dictionary for each phase, with its number of timings,
+        its total, mean and maximum time and its 50th, 90th and 99th recent
+        percentiles, and then one dictionary for each counter.
+
+        Times are in seconds.
+        """
+        result = []
+        for phase in sorted(self._counts):
+            result.append({
+                'phase': phase,
+                'count': self._counts[phase],
+                'total': self._totals[phase],
+                'mean': self._totals[phase] / self._counts[phase],
+                'p50': self.percentile(phase, 50),
+                'p90': self.percentile(phase, 90),
+                'p99': self.percentile(phase, 99),
+                'max': self._maxima[phase]
+            })
+        for name in sorted(self._counters):
+            result.append({'counter': name, 'value': self._counters[name]})
+        return result
+
+    def write(self, path: str, label: str = '') -> None:
+        """Append the summary of these statistics to the file at <path>, as
+        one JSON object per line, each with <label> and the time it was
+        written.
+        """
+        stamp = time.time()
+        with open(path, 'a') as stats_file:
+            for item in self.summary():
+                item = dict(item, label=label, time=stamp)
+                stats_file.write(json.dumps(item) + '\n')
+
+
+def install_dump_signal(stats: PhaseStats, path: str) -> bool:
+    """Make the process write <stats> to the file at <path> whenever it is sent
+    SIGUSR1, as for PhaseStats.write with the label 'signal'.
+
+    Return False if the platform has no SIGUSR1, in which case nothing is
+    done.
+    """
+    if not hasattr(signal, 'SIGUSR1'):
+        return False
+
+    def dump(signum: int, frame: object) -> None:
+        """Write the statistics."""
+        stats.write(path, 'signal')
+
+    signal.signal(signal.SIGUSR1, dump)
+    return True
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(config={
+        'allowed-import-modules': [
+            'doctest', 'python_ta', 'typing', '__future__', 'collections',
+            'json', 'signal', 'time'
+        ]
+    })
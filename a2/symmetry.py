@@ -0,0 +1,209 @@
+"""CSC148 Assignment 2
+
+=== CSC148 Winter 2020 ===
+Department of Computer Science,
+University of Toronto
+
+This code is provided solely for the personal and private use of
+students taking the CSC148 course at the University of Toronto.
+Copying for purposes other than this use is expressly prohibited.
+All forms of distribution of this code, whether as given or with
+any changes, are expressly prohibited.
+
+Authors: Diane Horton, David Liu, Mario Badr, Sophia Huynh, Misha Schwartz,
+and Jaisie Sin
+
+All of the files in this directory and all subdirectories are:
+Copyright (c) Diane Horton, David Liu, Mario Badr, Sophia Huynh,
+Misha Schwartz, and Jaisie Sin.
+
+=== Module Description ===
+
+This file contains the 8 symmetries of the square, and the canonical form of a
+board under them.
+
+Rotating a whole board, or reflecting it, gives a board with the same score for
+every goal. So caches and tables of scores and moves can store one entry for
+all 8 of the boards in a symmetry class, under the class's canonical form: the
+smallest of the encode_board encodings of the 8 boards.
+
+A symmetry is given by a permutation <p> of child indices: the symmetry maps a
+block to the block whose child <i> is the image of the block's child <p[i]>.
+Since the image of a board is named by its encoding, and the encoding lists the
+blocks in preorder, a symmetry is applied to a board's encoding by listing
+each block's children in the order <p> instead.
+
+The moves on a board and on its image correspond too: a move on the image does
+the same thing as the move on the board that transform_move maps to it, and a
+move's effect can be looked up for either board.
+"""
+from __future__ import annotations
+from functools import lru_cache
+from typing import List, Tuple
+
+from actions import ROTATE_CLOCKWISE, ROTATE_COUNTER_CLOCKWISE, \
+    SWAP_HORIZONTAL, SWAP_VERTICAL
+from moves import Move, ROOT_PATH, child_path, create_move, path_indices
+
+# The symmetries of the square, as permutations of child indices. The first is
+# the identity, then come the rotations by a quarter, half and three quarters
+# of a turn, then the reflections.
+SYMMETRIES = [(0, 1, 2, 3), (1, 2, 3, 0), (2, 3, 0, 1), (3, 0, 1, 2),
+              (1, 0, 3, 2), (3, 2, 1, 0), (2, 1, 0, 3), (0, 3, 2, 1)]
+
+# The permutations of children done by the moves that rearrange blocks.
+_ACTION_PERMUTATIONS = {
+    ROTATE_CLOCKWISE: (1, 2, 3, 0),
+    ROTATE_COUNTER_CLOCKWISE: (3, 0, 1, 2),
+    SWAP_HORIZONTAL: (1, 0, 3, 2),
+    SWAP_VERTICAL: (3, 2, 1, 0)
+}
+
+
+def _invert(permutation: Tuple[int, ...]) -> Tuple[int, ...]:
+    """Return the inverse of <permutation>.
+
+    >>> _invert((1, 2, 3, 0))
+    (3, 0, 1, 2)
+    """
+    inverse = [0] * len(permutation)
+    for i in range(len(permutation)):
+        inverse[permutation[i]] = i
+    return tuple(inverse)
+
+
+# For each symmetry, its inverse: where each child of a block ends up in the
+# block's image.
+_INVERSES = [_invert(symmetry) for symmetry in SYMMETRIES]
+
+
+def _conjugate_actions() -> List[dict]:
+    """Return, for each symmetry <s>, a dictionary mapping each action that
+    rearranges blocks to the action that does the same thing to the image of a
+    block under <s>.
+    """
+    by_permutation = {permutation: action
+                      for action, permutation in _ACTION_PERMUTATIONS.items()}
+    result = []
+    for s in range(len(SYMMETRIES)):
+        symmetry = SYMMETRIES[s]
+        inverse = _INVERSES[s]
+        actions = {}
+        for action, permutation in _ACTION_PERMUTATIONS.items():
+            conjugate = tuple(inverse[permutation[symmetry[i]]]
+                              for i in range(4))
+            actions[action] = by_permutation[conjugate]
+        result.append(actions)
+    return result
+
+
+_CONJUGATE_ACTIONS = _conjugate_actions()
+
+
+def inverse_symmetry(symmetry: int) -> int:
+    """Return the index in SYMMETRIES of the inverse of symmetry <symmetry>.
+
+    >>> inverse_symmetry(1)
+    3
+    >>> inverse_symmetry(4)
+    4
+    """
+    return SYMMETRIES.index(_INVERSES[symmetry])
+
+
+def _images(data: bytes) -> List[str]:
+    """Return the symbols of the encode_board encodings of the images of the
+    board whose encoding is <data> under each of SYMMETRIES, as strings of hex
+    digits without the first byte or any padding.
+
+    The images of every block are built from the images of its children, so
+    the encoding is only read once.
+    """
+    symbols = data.hex()
+    next_symbol = [2]
+
+    def images_helper() -> List[str]:
+        """Return the images of the block whose symbol is next."""
+        symbol = symbols[next_symbol[0]]
+        next_symbol[0] += 1
+        if symbol != '4':
+            return [symbol] * len(SYMMETRIES)
+        children = [images_helper() for _ in range(4)]
+        return ['4' + children[p0][s] + children[p1][s] + children[p2][s] +
+                children[p3][s]
+                for s, (p0, p1, p2, p3) in enumerate(SYMMETRIES)]
+
+    return images_helper()
+
+
+def _to_encoding(max_depth: int, symbols: str) -> bytes:
+    """Return the encode_board encoding of a board with <max_depth> whose
+    symbols are the hex digits <symbols>.
+    """
+    if len(symbols) % 2 == 1:
+        symbols += 'f'
+    return bytes([max_depth]) + bytes.fromhex(symbols)
+
+
+def transform_encoding(data: bytes, symmetry: int) -> bytes:
+    """Return the encode_board encoding of the image under symmetry
+    <symmetry> of the board whose encoding is <data>.
+
+    >>> from block import Block, encode_board
+    >>> from settings import COLOUR_LIST
+    >>> board = Block((0, 0), 750, COLOUR_LIST[0], 0, 1)
+    >>> board.smash()
+    True
+    >>> image = board.create_copy()
+    >>> image.rotate(1)
+    True
+    >>> transform_encoding(encode_board(board), 1) == encode_board(image)
+    True
+    """
+    return _to_encoding(data[0], _images(data)[symmetry])
+
+
+@lru_cache(maxsize=4096)
+def canonical_encoding(data: bytes) -> Tuple[bytes, int]:
+    """Return the canonical form of the board whose encode_board encoding is
+    <data>, and the index of a symmetry that maps the board to it.
+
+    The canonical form is the smallest encoding of the images of the board
+    under SYMMETRIES, so every board in a symmetry class has the same one.
+    """
+    images = _images(data)
+    symmetry = min(range(len(images)), key=images.__getitem__)
+    return _to_encoding(data[0], images[symmetry]), symmetry
+
+
+def transform_path(path: int, symmetry: int) -> int:
+    """Return the path in the image under symmetry <symmetry> of a board of the
+    image of the block at <path> in the board.
+
+    >>> transform_path(child_path(ROOT_PATH, 1), 1) == child_path(ROOT_PATH, 0)
+    True
+    """
+    inverse = _INVERSES[symmetry]
+    result = ROOT_PATH
+    for index in path_indices(path):
+        result = child_path(result, inverse[index])
+    return result
+
+
+def transform_move(move: Move, symmetry: int) -> Move:
+    """Return the move on the image under symmetry <symmetry> of a board that
+    does the same thing as <move> does on the board.
+    """
+    action = (move[0], move[1])
+    action = _CONJUGATE_ACTIONS[symmetry].get(action, action)
+    return create_move(action, transform_path(move[2], symmetry))
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(config={
+        'allowed-import-modules': [
+            'doctest', 'python_ta', 'typing', '__future__', 'functools',
+            'actions', 'moves'
+        ]
+    })
@@ -0,0 +1,302 @@
+"""CSC148 Assignment 2
+
+=== CSC148 Winter 2020 ===
+Department of Computer Science,
+University of Toronto
+
+This code is provided solely for the personal and private use of
+students taking the CSC148 course at the University of Toronto.
+Copying for purposes other than this use is expressly prohibited.
+All forms of distribution of this code, whether as given or with
+any changes, are expressly prohibited.
+
+Authors: Diane Horton, David Liu, Mario Badr, Sophia Huynh, Misha Schwartz,
+and Jaisie Sin
+
+All of the files in this directory and all subdirectories are:
+Copyright (c) Diane Horton, David Liu, Mario Badr, Sophia Huynh,
+Misha Schwartz, and Jaisie Sin.
+
+=== Module Description ===
+
+This file is a script that plays a tournament of headless games (see the engine
+module) across a pool of processes, and reports how often each player won.
+
+A lineup names the players in a game, separated by commas: "random" for a
+RandomPlayer, "smart:<difficulty>" for a SmartPlayer,
+"beam:<width>x<depth>" for a BeamPlayer and "engine:<command>" for a
+SubprocessPlayer whose engine is started by <command> (see the protocol
+module). Players always take their seats in the order that create_players
+gives them: random players, then smart players, then beam players, then
+engine players. For example:
+
+    python tournament.py --lineup random,smart:5 --lineup smart:5,smart:10 \
+        --max-depth 2 3 --games 100 --output results.jsonl
+
+Every lineup plays game <g> at every max_depth from the same game seed, so
+lineups are compared on the same boards.
+
+Each game's result is written to the output file, one JSON object per line, as
+soon as it is finished. If the output file already has results, the games they
+are for are not played again, so an interrupted tournament can be resumed by
+running the same command.
+"""
+from __future__ import annotations
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+from engine import run_game, setup_game
+from seeds import derive_seed
+
+# The name of the random stream that game seeds are derived from.
+TOURNAMENT_STREAM = 'tournament'
+
+# A game to play: its key, max_depth, lineup, game seed and number of turns.
+Job = Tuple[str, int, str, int, int]
+
+
+def parse_lineup(lineup: str) \
+        -> Tuple[int, List[int], List[Tuple[int, int]], List[str], List[str]]:
+    """Return the number of random players, the difficulties of the smart
+    players, the widths and depths of the beam players and the commands of the
+    engine players in <lineup>, and the name of the player in each seat.
+
+    Raise ValueError if <lineup> is not a valid lineup.
+
+    >>> parse_lineup('smart:5,random,beam:2x1')
+    (1, [5], [(2, 1)], [], ['random', 'smart:5', 'beam:2x1'])
+    >>> parse_lineup('engine:python bot.py random,random')[3]
+    ['python bot.py random']
+    """
+    num_random = 0
+    smart_players = []
+    beam_players = []
+    engine_players = []
+    for name in lineup.split(','):
+        kind, _, level = name.strip().partition(':')
+        if kind == 'random' and level == '':
+            num_random += 1
+        elif kind == 'smart' and level.isdigit():
+            smart_players.append(int(level))
+        elif kind == 'beam' and len(level.split('x')) == 2 and \
+                all(part.isdigit() for part in level.split('x')):
+            width, depth = level.split('x')
+            beam_players.append((int(width), int(depth)))
+        elif kind == 'engine' and level.strip() != '':
+            engine_players.append(level.strip())
+        else:
+            raise ValueError(f'{name!r} is not a player')
+
+    names = ['random'] * num_random + \
+        [f'smart:{difficulty}' for difficulty in smart_players] + \
+        [f'beam:{width}x{depth}' for width, depth in beam_players] + \
+        [f'engine:{command}' for command in engine_players]
+    return num_random, smart_players, beam_players, engine_players, names
+
+
+def wilson_interval(wins: int, games: int, z: float = 1.96) \
+        -> Tuple[float, float]:
+    """Return the Wilson score interval for a win rate of <wins> out of
+    <games>, at the confidence level of <z> standard deviations.
+
+    >>> wilson_interval(0, 0)
+    (0.0, 1.0)
+    >>> low, high = wilson_interval(50, 100)
+    >>> round(low, 3), round(high, 3)
+    (0.404, 0.596)
+    """
+    if games == 0:
+        return 0.0, 1.0
+    rate = wins / games
+    denominator = 1 + z * z / games
+    centre = rate + z * z / (2 * games)
+    spread = z * math.sqrt(rate * (1 - rate) / games +
+                           z * z / (4 * games * games))
+    return (max(0.0, (centre - spread) / denominator),
+            min(1.0, (centre + spread) / denominator))
+
+
+def game_winner(scores: List[int], penalties: List[int]) -> Optional[int]:
+    """Return the seat of the player who won a game with final <scores> and
+    <penalties>, or None if the game was a draw.
+
+    >>> game_winner([5, 7, 3], [0, 1, 0])
+    1
+    >>> game_winner([5, 7], [1, 3]) is None
+    True
+    """
+    totals = [score - penalty for score, penalty in zip(scores, penalties)]
+    best = max(totals)
+    if totals.count(best) > 1:
+        return None
+    return totals.index(best)
+
+
+def play_job(job: Job) -> dict:
+    """Play the game of <job> and return its result.
+    """
+    key, max_depth, lineup, seed, num_turns = job
+    num_random, smart_players, beam_players, engine_players, names = \
+        parse_lineup(lineup)
+    data = setup_game(max_depth, 0, num_random, smart_players, beam_players,
+                      seed, engine_players=engine_players)
+
+    move_times = {}
+    start = time.perf_counter()
+    scores = run_game(data, num_turns, move_times)
+    wall_time = time.perf_counter() - start
+
+    return {
+        'key': key,
+        'max_depth': max_depth,
+        'lineup': lineup,
+        'seed': seed,
+        'players': names,
+        'scores': [score for _, score, _ in scores],
+        'penalties': [penalty for _, _, penalty in scores],
+        'winner': game_winner([score for _, score, _ in scores],
+                              [penalty for _, _, penalty in scores]),
+        'move_time': [round(sum(move_times.get(player_id, [])) /
+                            max(1, len(move_times.get(player_id, []))), 6)
+                      for player_id, _, _ in scores],
+        'wall_time': round(wall_time, 4)
+    }
+
+
+def read_results(path: str) -> List[dict]:
+    """Return the results in the output file at <path>, or [] if there is no
+    such file.
+
+    A last line that is not a whole result, because the tournament was
+    interrupted while writing it, is removed from the file. Any other line
+    that is not a result is skipped, so its game is played again.
+    """
+    if not os.path.exists(path):
+        return []
+
+    results = []
+    with open(path, 'rb') as result_file:
+        data = result_file.read()
+    lines = data.split(b'\n')
+    complete = len(lines) - 1
+    for line in lines[:complete]:
+        try:
+            result = json.loads(line)
+        except ValueError:
+            continue
+        if isinstance(result, dict) and 'key' in result:
+            results.append(result)
+    if lines[complete]:
+        # The file does not end with a newline, so the last line was cut off.
+        with open(path, 'wb') as result_file:
+            result_file.write(data[:len(data) - len(lines[complete])])
+    return results
+
+
+def make_jobs(lineups: List[str], max_depths: List[int], games: int,
+              num_turns: int, seed: int) -> List[Job]:
+    """Return the jobs of a tournament of <games> games of <num_turns> turns
+    for each of <lineups> at each of <max_depths>, seeded by <seed>.
+    """
+    jobs = []
+    for game in range(games):
+        game_seed = derive_seed(seed, TOURNAMENT_STREAM, game)
+        for max_depth in max_depths:
+            for lineup in lineups:
+                key = f'{max_depth}|{lineup}|{num_turns}|{game_seed}'
+                jobs.append((key, max_depth, lineup, game_seed, num_turns))
+    return jobs
+
+
+def summarize(results: List[dict]) -> List[str]:
+    """Return the lines of a report of the win rate of each seat in each
+    lineup and max_depth of <results>, with 95% confidence intervals.
+
+    A draw is a win for no seat, and the number of draws is reported for each
+    lineup. Draws are found from the scores, so results written when draws
+    were counted as wins for the first seat are reported the same way.
+    """
+    groups = {}
+    for result in results:
+        groups.setdefault((result['max_depth'], result['lineup']),
+                          []).append(result)
+
+    lines = []
+    for (max_depth, lineup), group in sorted(groups.items()):
+        winners = [game_winner(result['scores'], result['penalties'])
+                   for result in group]
+        lines.append(f'max_depth {max_depth}, {lineup}: {len(group)} games, '
+                     f'{winners.count(None)} draws')
+        names = group[0]['players']
+        for seat in range(len(names)):
+            wins = winners.count(seat)
+            low, high = wilson_interval(wins, len(group))
+            score = sum(result['scores'][seat] - result['penalties'][seat]
+                        for result in group) / len(group)
+            move_time = sum(result['move_time'][seat]
+                            for result in group) / len(group)
+            lines.append(f'  {seat} {names[seat]:<12} '
+                         f'wins {wins / len(group):6.1%} '
+                         f'[{low:.1%}, {high:.1%}]  score {score:6.2f}  '
+                         f'{move_time * 1000:.2f} ms/move')
+    return lines
+
+
+def main(args: Optional[List[str]] = None) -> List[dict]:
+    """Play the tournament described by the command line <args>, print its
+    report, and return the results of all of its games.
+    """
+    parser = argparse.ArgumentParser(description='Play a tournament.')
+    parser.add_argument('--lineup', action='append', required=True,
+                        help='the players in a game, such as random,smart:5')
+    parser.add_argument('--max-depth', type=int, nargs='+', default=[3],
+                        help='the max_depth of the boards')
+    parser.add_argument('--games', type=int, default=10,
+                        help='the number of games for each lineup and '
+                             'max_depth')
+    parser.add_argument('--turns', type=int, default=5,
+                        help='the number of turns in each game')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='the seed that game seeds are derived from')
+    parser.add_argument('--processes', type=int, default=None,
+                        help='the number of processes to play games in')
+    parser.add_argument('--output', default='tournament.jsonl',
+                        help='the file to write results to')
+    options = parser.parse_args(args)
+    for lineup in options.lineup:
+        parse_lineup(lineup)
+
+    all_jobs = make_jobs(options.lineup, options.max_depth, options.games,
+                         options.turns, options.seed)
+    keys = {job[0] for job in all_jobs}
+    # The output file may also have results of other tournaments, which are
+    # kept but not reported.
+    results = [result for result in read_results(options.output)
+               if result['key'] in keys]
+    done = {result['key'] for result in results}
+    jobs = [job for job in all_jobs if job[0] not in done]
+    print(f'{len(done)} games already played, {len(jobs)} to play')
+
+    # Workers are spawned rather than forked, since forking a process that
+    # has started threads (as pygame does) can leave a worker deadlocked.
+    context = multiprocessing.get_context('spawn')
+    with open(options.output, 'a') as result_file, \
+            context.Pool(options.processes) as pool:
+        for result in pool.imap_unordered(play_job, jobs):
+            result_file.write(json.dumps(result, separators=(',', ':')) +
+                              '\n')
+            result_file.flush()
+            results.append(result)
+
+    for line in summarize(results):
+        print(line)
+    return results
+
+
+if __name__ == '__main__':
+    main()